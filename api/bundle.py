@@ -0,0 +1,146 @@
+"""
+Tour bundle: everything the virtual tour page needs in one document.
+
+The tour page used to fetch the whole ``monastery_panoramas.json`` (with a
+cache-busting query string), the whole ``archives.json``, and then probe
+each archive card's detail URL with a ``HEAD`` request before following
+it. The bundle replaces all of that with a single response built from the
+database: the monastery's panorama views, its audio POIs and its public
+archive items with their detail URLs already resolved.
+
+Panoramas without an uploaded image (the demo data has none) cannot be
+shown, so they are left out; a monastery with no viewable panorama gets
+its views from the curated ``static/data/monastery_panoramas.json``.
+"""
+
+import os
+
+from django.conf import settings
+from django.urls import reverse
+
+from archives.models import ArchiveItem
+from core import datafiles
+from core.models import AudioPOI
+from tours.models import Panorama
+
+# Default horizontal field of view for panoramas, matching the viewer
+DEFAULT_HFOV = 110
+
+# Archive cards shown on the tour page
+TOUR_ARCHIVE_LIMIT = 12
+
+
+def curated_panoramas_path():
+    return os.path.join(settings.BASE_DIR, 'static', 'data', 'monastery_panoramas.json')
+
+
+def _file_url(field):
+    return field.url if field else None
+
+
+def _hotspots(data):
+    """Return hotspots as the list Pannellum expects.
+
+    ``hotspots_data`` is stored either as a list or as ``{"hotspots": [...]}``.
+    """
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        return data.get('hotspots', [])
+    return []
+
+
+def panorama_view(panorama):
+    """Serialize a panorama in the viewer's ``views`` format."""
+    return {
+        'id': panorama.id,
+        'title': panorama.title,
+        'description': panorama.description,
+        'url': _file_url(panorama.image),
+        'type': 'equirectangular',
+        'yaw': panorama.initial_yaw,
+        'pitch': panorama.initial_pitch,
+        'hfov': DEFAULT_HFOV,
+        'audio': bool(panorama.narration_audio),
+        'audioUrl': _file_url(panorama.narration_audio),
+        'audioDuration': panorama.audio_duration,
+        'hotspots': _hotspots(panorama.hotspots_data),
+    }
+
+
+def curated_views(monastery):
+    """Return ``monastery``'s views from the curated panorama config, or ``[]``."""
+    try:
+        curated = datafiles.load(curated_panoramas_path()).data.get('monasteries') or {}
+    except (OSError, ValueError, AttributeError):
+        return []
+    for key in (monastery.pano_id, monastery.slug):
+        entry = curated.get(key) if key else None
+        if entry:
+            return [view for view in entry.get('views', []) if view.get('url')]
+    return []
+
+
+def audio_poi(poi):
+    return {
+        'id': poi.id,
+        'title': poi.title,
+        'description': poi.description,
+        'latitude': poi.latitude,
+        'longitude': poi.longitude,
+        'audioUrl': _file_url(poi.audio_file),
+        'audioDuration': poi.audio_duration,
+        'order': poi.order,
+    }
+
+
+def archive_card(item, monastery_slug):
+    """Serialize an archive item for a tour page card."""
+    return {
+        'id': item.id,
+        'title': item.title,
+        'type': item.get_item_type_display(),
+        'century': item.estimated_age or item.historical_period,
+        'description': item.description,
+        'imageUrl': _file_url(item.image),
+        'tags': [tag for tag in (item.get_material_display(), item.language) if tag],
+        'catalogNumber': item.catalog_number,
+        # Resolved here, with the slug in hand, instead of probed by the client
+        'detailUrl': reverse(
+            'archives:item_detail',
+            kwargs={'monastery_slug': monastery_slug, 'catalog_number': item.catalog_number},
+        ),
+    }
+
+
+def build_tour_bundle(monastery):
+    """Return the tour bundle for ``monastery`` in four queries or fewer."""
+    panoramas = Panorama.objects.filter(monastery=monastery, is_active=True).order_by('order')
+    pois = AudioPOI.objects.filter(
+        monastery=monastery,
+        is_active=True,
+        latitude__isnull=False,
+        longitude__isnull=False,
+    ).order_by('order')
+    archives = ArchiveItem.objects.filter(
+        monastery=monastery,
+        is_public=True,
+    ).order_by('catalog_number')[:TOUR_ARCHIVE_LIMIT]
+
+    views = [panorama_view(panorama) for panorama in panoramas if panorama.image]
+    if not views:
+        views = curated_views(monastery)
+
+    return {
+        'monastery': {
+            'id': monastery.id,
+            'slug': monastery.slug,
+            'name': monastery.name,
+        },
+        'tour': {
+            'name': monastery.name,
+            'views': views,
+        },
+        'pois': [audio_poi(poi) for poi in pois],
+        'archives': [archive_card(item, monastery.slug) for item in archives],
+    }
@@ -0,0 +1,138 @@
+"""
+Streaming bulk export of the public Monastery360 catalog.
+
+Rows are read with ``.iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL) and written one line at a time into a ``StreamingHttpResponse``,
+optionally through an incremental gzip compressor, so memory use stays
+flat regardless of how many rows are exported.
+"""
+
+import csv
+import json
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import compress_sequence
+
+from archives.models import ArchiveItem
+from core.models import Monastery
+from events.models import Event
+
+from .fieldsets import ARCHIVE_ITEM_FIELDS, EVENT_FIELDS, MONASTERY_FIELDS
+
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class Export:
+    """A public queryset and the fieldset used to serialize it."""
+
+    def __init__(self, get_queryset, fieldset, parent_field=None):
+        self.get_queryset = get_queryset
+        self.fieldset = fieldset
+        self.parent_field = parent_field
+
+    @property
+    def field_names(self):
+        names = list(self.fieldset.profiles['full'])
+        if self.parent_field:
+            names.append(self.parent_field)
+        return names
+
+    def rows(self):
+        """Yield one serialized dict per public row, in primary key order."""
+        names = self.fieldset.profiles['full']
+        extra = [self.parent_field] if self.parent_field else []
+        queryset = self.fieldset.project(self.get_queryset(), names, extra=extra).order_by('pk')
+        for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            data = self.fieldset.serialize(obj, names)
+            if self.parent_field:
+                data[self.parent_field] = getattr(obj, self.parent_field)
+            yield data
+
+
+# One Accept-Encoding entry: a coding and its optional ``q`` weight
+ACCEPT_ENCODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;.*?\bq\s*=\s*([0-9.]+))?', re.IGNORECASE)
+
+EXPORTS = {
+    'monasteries': Export(
+        lambda: Monastery.objects.filter(is_active=True),
+        MONASTERY_FIELDS,
+    ),
+    'events': Export(
+        lambda: Event.objects.filter(is_public=True, monastery__is_active=True),
+        EVENT_FIELDS,
+        parent_field='monastery_id',
+    ),
+    'archive_items': Export(
+        lambda: ArchiveItem.objects.filter(is_public=True, monastery__is_active=True),
+        ARCHIVE_ITEM_FIELDS,
+        parent_field='monastery_id',
+    ),
+}
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Return whether an ``Accept-Encoding`` header value allows gzip.
+
+    ``GZipMiddleware``'s ``re_accepts_gzip`` only looks for the ``gzip``
+    token, which also matches ``gzip;q=0``, an explicit refusal. Here each
+    coding's weight is read: ``gzip`` must have a non-zero ``q``, and a
+    wildcard only counts when ``gzip`` is not listed on its own.
+    """
+    weights = {}
+    for entry in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_RE.match(entry)
+        if not match:
+            continue
+        coding, q = match.group(1).lower(), match.group(2)
+        try:
+            weights[coding] = float(q) if q is not None else 1.0
+        except ValueError:
+            weights[coding] = 0.0
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+def _encode(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def ndjson_lines(export):
+    """Yield one JSON document per line."""
+    for row in export.rows():
+        yield (_encode(row) + '\n').encode('utf-8')
+
+
+class _LineBuffer:
+    """File-like object whose ``write`` just returns the value for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(export):
+    """Yield a header row followed by one CSV row per record.
+
+    Nested values (locations, monastery summaries) are written as JSON.
+    """
+    writer = csv.writer(_LineBuffer())
+    names = export.field_names
+    yield writer.writerow(names).encode('utf-8')
+    for row in export.rows():
+        values = [
+            _encode(row[name]) if isinstance(row[name], (dict, list)) else row[name]
+            for name in names
+        ]
+        yield writer.writerow(values).encode('utf-8')
+
+
+def export_stream(entity, fmt, gzip=False):
+    """Return a byte iterator for ``entity`` in ``fmt``, optionally gzipped."""
+    export = EXPORTS[entity]
+    lines = ndjson_lines(export) if fmt == 'ndjson' else csv_lines(export)
+    return compress_sequence(lines) if gzip else lines
@@ -0,0 +1,391 @@
+"""
+Sparse fieldsets for Monastery360 API endpoints.
+
+Each API resource declares its output fields once, together with the model
+columns each field reads. Clients choose fields with ``?fields=a,b,c`` or a
+named ``?profile=`` (``card``, ``list``, ``full``), and the selection is
+pushed down into ``.only()`` so the database never sends the large text
+columns a widget did not ask for.
+"""
+
+from django.db.models import Count, Prefetch, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from archives.tiles import descriptor_url
+from core import counters
+from core.images import picture_sources
+from core.models import AudioPOI
+from events.models import Event
+from tours.models import Panorama
+
+
+class InvalidFields(ValueError):
+    """Raised when a client requests fields a resource does not provide."""
+
+
+class Field:
+    """
+    A single output field.
+
+    ``getter`` receives the model instance; ``columns`` lists the model
+    columns (``related__column`` for joined rows) the getter touches.
+    ``prefetch`` holds callables returning ``Prefetch`` objects and
+    ``annotations`` maps attribute names to aggregate expressions, so
+    related data is loaded in a fixed number of queries.
+    """
+
+    __slots__ = ('getter', 'columns', 'prefetch', 'annotations')
+
+    def __init__(self, getter, columns=(), prefetch=(), annotations=None):
+        self.getter = getter
+        self.columns = tuple(columns)
+        self.prefetch = tuple(prefetch)
+        self.annotations = dict(annotations or {})
+
+
+def attr(name):
+    """Field that returns a plain model attribute of the same name."""
+    return Field(lambda obj: getattr(obj, name), columns=(name,))
+
+
+def counter(name):
+    """Field that returns a counter including its unflushed increments."""
+    return Field(lambda obj: counters.current(obj, name), columns=(name,))
+
+
+def file_url(name):
+    """Field that returns the URL of a file/image field, or ``None``."""
+    def getter(obj):
+        value = getattr(obj, name)
+        return value.url if value else None
+    return Field(getter, columns=(name,))
+
+
+def image_srcset(name):
+    """
+    Field that returns ``{mime type: srcset}`` for an image's responsive
+    derivatives, or ``None`` until they have been generated.
+    """
+    def getter(obj):
+        sources = picture_sources(getattr(obj, name))
+        return {source['type']: source['srcset'] for source in sources} or None
+    return Field(getter, columns=(name,))
+
+
+def coordinates(obj):
+    """Return a ``{'latitude', 'longitude'}`` dict when both are set."""
+    if obj.latitude is None or obj.longitude is None:
+        return None
+    return {'latitude': obj.latitude, 'longitude': obj.longitude}
+
+
+class FieldSet:
+    """
+    Declared output fields and named profiles for one resource.
+
+    ``profiles`` maps a profile name to an ordered list of field names;
+    the ``full`` profile defaults to every declared field.
+    """
+
+    def __init__(self, fields, profiles=None):
+        self.fields = dict(fields)
+        self.profiles = {'full': list(self.fields)}
+        self.profiles.update(profiles or {})
+
+    def select(self, request, default_profile='full'):
+        """Return the field names requested by ``?fields=`` or ``?profile=``."""
+        requested = request.GET.get('fields', '').strip()
+        if requested:
+            names = [name.strip() for name in requested.split(',') if name.strip()]
+            unknown = [name for name in names if name not in self.fields]
+            if unknown:
+                raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+            # Preserve declaration order and drop duplicates
+            return [name for name in self.fields if name in names]
+
+        profile = request.GET.get('profile', default_profile)
+        if profile not in self.profiles:
+            raise InvalidFields(f"Unknown profile: {profile}")
+        return list(self.profiles[profile])
+
+    def columns(self, names):
+        """Return the set of model columns needed to render ``names``."""
+        columns = set()
+        for name in names:
+            columns.update(self.fields[name].columns)
+        return columns
+
+    def project(self, queryset, names, extra=()):
+        """
+        Restrict ``queryset`` to the columns needed for ``names``.
+
+        ``extra`` adds columns the view itself needs (ordering or
+        pagination keys). Related columns are joined with
+        ``select_related`` so they are loaded in the same query; declared
+        prefetches and annotations are applied once each.
+        """
+        columns = {'pk'} | self.columns(names) | set(extra)
+        related = {column.rsplit('__', 1)[0] for column in columns if '__' in column}
+        if related:
+            queryset = queryset.select_related(*sorted(related))
+
+        prefetches = {}
+        annotations = {}
+        for name in names:
+            field = self.fields[name]
+            for build in field.prefetch:
+                prefetch = build()
+                prefetches.setdefault(prefetch.prefetch_to, prefetch)
+            annotations.update(field.annotations)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches.values())
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        return queryset.only(*sorted(columns))
+
+    def serialize(self, obj, names):
+        """Render ``obj`` as a dict containing only ``names``."""
+        return {name: self.fields[name].getter(obj) for name in names}
+
+
+MONASTERY_FIELDS = FieldSet(
+    fields=[
+        ('id', attr('id')),
+        ('name', attr('name')),
+        ('slug', attr('slug')),
+        ('description', attr('description')),
+        ('short_description', attr('short_description')),
+        ('established_year', attr('established_year')),
+        ('district', attr('district')),
+        ('altitude', attr('altitude')),
+        ('location', Field(coordinates, columns=('latitude', 'longitude'))),
+        ('address', attr('address')),
+        ('visiting_hours', attr('visiting_hours')),
+        ('entry_fee', attr('entry_fee')),
+        ('phone', attr('phone')),
+        ('email', attr('email')),
+        ('website', attr('website')),
+        ('image_url', file_url('image')),
+        ('image_srcset', image_srcset('image')),
+        ('image_alt', attr('image_alt')),
+        ('url', Field(lambda m: m.get_absolute_url(), columns=('slug',))),
+        ('is_featured', attr('is_featured')),
+    ],
+    profiles={
+        'card': ['id', 'name', 'slug', 'short_description', 'location', 'image_url', 'image_srcset'],
+        'list': [
+            'id', 'name', 'slug', 'short_description', 'district', 'established_year',
+            'location', 'address', 'visiting_hours', 'entry_fee', 'image_url',
+            'image_srcset', 'url', 'is_featured',
+        ],
+    },
+)
+
+
+EVENT_FIELDS = FieldSet(
+    fields=[
+        ('id', attr('id')),
+        ('title', attr('title')),
+        ('description', attr('description')),
+        ('short_description', attr('short_description')),
+        ('event_type', attr('event_type')),
+        ('start_time', Field(lambda e: e.start_time.isoformat(), columns=('start_time',))),
+        ('end_time', Field(lambda e: e.end_time.isoformat(), columns=('end_time',))),
+        ('is_all_day', attr('is_all_day')),
+        ('location_details', attr('location_details')),
+        ('entry_fee', attr('entry_fee')),
+        ('requires_registration', attr('requires_registration')),
+        ('max_participants', attr('max_participants')),
+        ('language', attr('language')),
+        ('dress_code', attr('dress_code')),
+        ('image_url', file_url('image')),
+        ('image_srcset', image_srcset('image')),
+        ('monastery', Field(
+            lambda e: {
+                'id': e.monastery.id,
+                'name': e.monastery.name,
+                'slug': e.monastery.slug,
+                'district': e.monastery.district,
+            },
+            columns=('monastery__id', 'monastery__name', 'monastery__slug', 'monastery__district'),
+        )),
+        ('url', Field(lambda e: e.get_absolute_url(), columns=('monastery__slug',))),
+        ('status', Field(
+            lambda e: e.status,
+            columns=('is_cancelled', 'start_time', 'end_time'),
+        )),
+        ('duration_hours', Field(
+            lambda e: e.duration_hours,
+            columns=('is_all_day', 'start_time', 'end_time'),
+        )),
+    ],
+    profiles={
+        'card': ['id', 'title', 'short_description', 'event_type', 'start_time', 'url'],
+    },
+)
+
+
+ARCHIVE_ITEM_FIELDS = FieldSet(
+    fields=[
+        ('id', attr('id')),
+        ('title', attr('title')),
+        ('description', attr('description')),
+        ('item_type', attr('item_type')),
+        ('catalog_number', attr('catalog_number')),
+        ('material', attr('material')),
+        ('condition', attr('condition')),
+        ('estimated_age', attr('estimated_age')),
+        ('historical_period', attr('historical_period')),
+        ('cultural_significance', attr('cultural_significance')),
+        ('dimensions', attr('dimensions')),
+        ('language', attr('language')),
+        ('script', attr('script')),
+        ('image_url', file_url('image')),
+        ('image_srcset', image_srcset('image')),
+        ('image_alt', attr('image_alt')),
+        ('scan_url', file_url('scan')),
+        ('scan_resolution', attr('scan_resolution')),
+        ('has_high_res_scan', Field(lambda i: i.has_high_res_scan, columns=('scan',))),
+        ('tiles_url', Field(
+            descriptor_url,
+            columns=('scan', 'scan_tiles__source', 'scan_tiles__source_hash', 'scan_tiles__status'),
+        )),
+        ('iiif_manifest', Field(
+            lambda i: reverse('archives:iiif_manifest', args=[i.catalog_number]),
+            columns=('catalog_number',),
+        )),
+        ('item_type_icon', Field(lambda i: i.item_type_display_icon, columns=('item_type',))),
+        ('view_count', counter('view_count')),
+        ('url', Field(
+            lambda i: i.get_absolute_url(),
+            columns=('catalog_number', 'monastery__slug'),
+        )),
+    ],
+    profiles={
+        'card': ['id', 'title', 'item_type', 'catalog_number', 'image_url', 'image_srcset', 'url'],
+    },
+)
+
+
+AUDIO_POI_FIELDS = FieldSet(
+    fields=[
+        ('id', attr('id')),
+        ('title', attr('title')),
+        ('description', attr('description')),
+        ('location', Field(coordinates, columns=('latitude', 'longitude'))),
+        ('audio_url', file_url('audio_file')),
+        ('audio_duration', attr('audio_duration')),
+        ('order', attr('order')),
+    ],
+    profiles={
+        'card': ['id', 'title', 'location', 'audio_url', 'audio_duration'],
+    },
+)
+
+
+PANORAMA_FIELDS = FieldSet(
+    fields=[
+        ('id', attr('id')),
+        ('title', attr('title')),
+        ('description', attr('description')),
+        ('location_name', attr('location_name')),
+        ('image_url', file_url('image')),
+        ('image_srcset', image_srcset('image')),
+        ('thumbnail_url', file_url('thumbnail')),
+        ('thumbnail_srcset', image_srcset('thumbnail')),
+        ('narration_audio_url', file_url('narration_audio')),
+        ('audio_duration', attr('audio_duration')),
+        ('view_count', counter('view_count')),
+        ('order', attr('order')),
+        ('url', Field(lambda p: p.get_absolute_url(), columns=('monastery__slug',))),
+    ],
+)
+
+
+UPCOMING_EVENT_FIELDS = FieldSet(
+    fields=[
+        (name, EVENT_FIELDS.fields[name])
+        for name in (
+            'id', 'title', 'short_description', 'event_type', 'start_time',
+            'end_time', 'location_details', 'entry_fee', 'url',
+        )
+    ],
+)
+
+
+def _active_audio_pois():
+    return Prefetch(
+        'audio_pois',
+        queryset=AudioPOI.objects.filter(is_active=True).order_by('order'),
+        to_attr='active_audio_pois',
+    )
+
+
+def _active_panoramas():
+    return Prefetch(
+        'panoramas',
+        queryset=Panorama.objects.filter(is_active=True).order_by('order'),
+        to_attr='active_panoramas',
+    )
+
+
+def _upcoming_events():
+    # Built per request so the time filter is current; sliced prefetches
+    # are limited per monastery in the same query.
+    return Prefetch(
+        'events',
+        queryset=Event.objects.filter(
+            start_time__gte=timezone.now(),
+            is_public=True,
+            is_cancelled=False
+        ).order_by('start_time')[:5],
+        to_attr='upcoming_events',
+    )
+
+
+def _statistics(monastery):
+    return {
+        'total_panoramas': len(monastery.active_panoramas),
+        'total_audio_pois': len(monastery.active_audio_pois),
+        'total_archive_items': monastery.public_archive_item_count,
+        'upcoming_events_count': len(monastery.upcoming_events),
+    }
+
+
+def nested(fieldset, to_attr, prefetch):
+    """Field that serializes a prefetched related list with another fieldset."""
+    def getter(obj):
+        names = list(fieldset.fields)
+        return [fieldset.serialize(child, names) for child in getattr(obj, to_attr)]
+    return Field(getter, prefetch=(prefetch,))
+
+
+MONASTERY_DETAIL_FIELDS = FieldSet(
+    fields=list(MONASTERY_FIELDS.fields.items()) + [
+        ('audio_pois', nested(AUDIO_POI_FIELDS, 'active_audio_pois', _active_audio_pois)),
+        ('panoramas', nested(PANORAMA_FIELDS, 'active_panoramas', _active_panoramas)),
+        ('upcoming_events', nested(UPCOMING_EVENT_FIELDS, 'upcoming_events', _upcoming_events)),
+        ('statistics', Field(
+            _statistics,
+            prefetch=(_active_audio_pois, _active_panoramas, _upcoming_events),
+            annotations={
+                'public_archive_item_count': Count(
+                    'archive_items',
+                    filter=Q(archive_items__is_public=True),
+                ),
+            },
+        )),
+    ],
+    profiles={
+        'card': MONASTERY_FIELDS.profiles['card'],
+        'detail': [
+            'id', 'name', 'slug', 'description', 'short_description',
+            'established_year', 'district', 'altitude', 'location', 'address',
+            'visiting_hours', 'entry_fee', 'phone', 'email', 'website',
+            'image_url', 'image_srcset', 'image_alt', 'audio_pois', 'panoramas',
+            'upcoming_events', 'statistics',
+        ],
+    },
+)
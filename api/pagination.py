@@ -0,0 +1,150 @@
+"""
+Keyset (cursor) pagination for Monastery360 API endpoints.
+
+Pages are addressed by an opaque cursor that encodes the sort key of the
+last (or first) row already seen, so fetching page N costs the same as
+fetching page 1: the database seeks straight to the key through an index
+instead of counting and discarding OFFSET rows.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client supplies a cursor that cannot be decoded."""
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """JSON encoder that keeps full microsecond precision for datetimes.
+
+    ``DjangoJSONEncoder`` truncates to milliseconds, which would make a
+    seek on ``start_time`` skip or repeat rows.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, reverse=False):
+    """Encode a tuple of key values into an opaque, URL-safe cursor."""
+    payload = json.dumps(
+        {'k': list(values), 'r': bool(reverse)},
+        cls=CursorJSONEncoder,
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor produced by :func:`encode_cursor`.
+
+    Returns a ``(values, reverse)`` tuple with the raw JSON key values.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload['k']
+        reverse = bool(payload.get('r', False))
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+    if not isinstance(values, list):
+        raise InvalidCursor('Invalid cursor')
+    return values, reverse
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a ``limit`` query parameter, clamping it to ``1..maximum``."""
+    try:
+        size = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a unique, ascending composite key.
+
+    ``keys`` must end with a unique column (normally ``id``) so that every
+    row has a distinct position. An index covering the leading key column
+    serves both the seek predicate and the ordering.
+    """
+
+    def __init__(self, queryset, keys, page_size=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.keys = tuple(keys)
+        self.page_size = page_size
+
+    def _key_values(self, obj):
+        return [getattr(obj, key) for key in self.keys]
+
+    def _coerce(self, values):
+        """Convert raw JSON cursor values back into model field values."""
+        if len(values) != len(self.keys):
+            raise InvalidCursor('Invalid cursor')
+
+        opts = self.queryset.model._meta
+        coerced = []
+        try:
+            for key, value in zip(self.keys, values):
+                coerced.append(opts.get_field(key).to_python(value))
+        except Exception:
+            raise InvalidCursor('Invalid cursor')
+        return coerced
+
+    def _seek(self, values, reverse):
+        """Build the row-value comparison ``(k1, k2, ...) > (v1, v2, ...)``."""
+        lookup = 'lt' if reverse else 'gt'
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            term = Q(**{f'{key}__{lookup}': values[i]})
+            for prior_key, prior_value in zip(self.keys[:i], values[:i]):
+                term &= Q(**{prior_key: prior_value})
+            condition |= term
+        return condition
+
+    def paginate(self, cursor=None):
+        """
+        Return ``(items, next_cursor, prev_cursor)`` for the requested page.
+
+        ``prev_cursor`` is ``None`` on the first page and ``next_cursor`` is
+        ``None`` once the end of the result set has been reached.
+        """
+        queryset = self.queryset
+        reverse = False
+
+        if cursor:
+            raw_values, reverse = decode_cursor(cursor)
+            queryset = queryset.filter(self._seek(self._coerce(raw_values), reverse))
+
+        ordering = [f'-{key}' if reverse else key for key in self.keys]
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        items = rows[:self.page_size]
+        if reverse:
+            items.reverse()
+
+        if not items:
+            return items, None, None
+
+        # Moving forward we know whether more rows follow; moving backward we
+        # always came from a later page, so a forward cursor exists.
+        has_next = True if reverse else has_more
+        has_prev = has_more if reverse else bool(cursor)
+
+        next_cursor = encode_cursor(self._key_values(items[-1])) if has_next else None
+        prev_cursor = encode_cursor(self._key_values(items[0]), reverse=True) if has_prev else None
+        return items, next_cursor, prev_cursor
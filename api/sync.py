@@ -0,0 +1,205 @@
+"""
+Delta sync for offline Monastery360 clients.
+
+A client sends the token it received from its previous sync as ``?since=``
+and gets back only the rows created, updated or deleted after that point.
+Rows are read per entity in ``(updated_at, id)`` order, followed by the
+tombstones of deleted rows, and a page is cut after ``limit`` rows; the
+returned ``next`` token either continues the current sync (``has_more``)
+or becomes the client's ``since`` for the next one.
+
+Every page of one sync shares a fixed upper bound (``until``), so rows
+changed while a client is paging are picked up by its next sync instead
+of shifting the current one.
+
+A row's ``updated_at`` is set when it is saved, not when its transaction
+commits, so a row saved just before ``until`` may only become visible
+after the sync read past it. The next sync therefore starts
+``SYNC_OVERLAP`` before ``until``; rows in the overlap are sent again,
+which clients apply as idempotent upserts and deletes.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from archives.models import ArchiveItem
+from core.models import AudioPOI, Monastery, Tombstone
+from events.models import Event
+from tours.models import Panorama
+
+from .fieldsets import (
+    ARCHIVE_ITEM_FIELDS,
+    AUDIO_POI_FIELDS,
+    EVENT_FIELDS,
+    MONASTERY_FIELDS,
+    PANORAMA_FIELDS,
+)
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+DEFAULT_SYNC_PAGE_SIZE = 200
+MAX_SYNC_PAGE_SIZE = 1000
+
+# How long a transaction may take to commit after saving a row
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class SyncStream:
+    """One synced entity: its model, output fields and visibility rule."""
+
+    def __init__(self, name, model, fieldset, visible_field, parent_field=None):
+        self.name = name
+        self.model = model
+        self.fieldset = fieldset
+        self.visible_field = visible_field
+        self.parent_field = parent_field
+
+    @property
+    def label(self):
+        return self.model._meta.label_lower
+
+    def queryset(self):
+        names = self.fieldset.profiles['full']
+        extra = ['updated_at', self.visible_field]
+        if self.parent_field:
+            extra.append(self.parent_field)
+        return self.fieldset.project(self.model.objects.all(), names, extra=extra)
+
+    def serialize(self, obj):
+        data = self.fieldset.serialize(obj, self.fieldset.profiles['full'])
+        if self.parent_field:
+            data[self.parent_field] = getattr(obj, self.parent_field)
+        data['updated_at'] = obj.updated_at.isoformat()
+        return data
+
+
+SYNC_STREAMS = [
+    SyncStream('monasteries', Monastery, MONASTERY_FIELDS, 'is_active'),
+    SyncStream('panoramas', Panorama, PANORAMA_FIELDS, 'is_active', 'monastery_id'),
+    SyncStream('audio_pois', AudioPOI, AUDIO_POI_FIELDS, 'is_active', 'monastery_id'),
+    SyncStream('events', Event, EVENT_FIELDS, 'is_public', 'monastery_id'),
+    SyncStream('archive_items', ArchiveItem, ARCHIVE_ITEM_FIELDS, 'is_public', 'monastery_id'),
+]
+
+STREAMS_BY_LABEL = {stream.label: stream for stream in SYNC_STREAMS}
+
+# Tombstones are read after every entity stream
+TOMBSTONE_STREAM = len(SYNC_STREAMS)
+
+
+def _format(value):
+    return value.isoformat() if value else None
+
+
+def _parse(value):
+    if value is None:
+        return None
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise InvalidCursor('Invalid sync token')
+    return parsed
+
+
+def encode_sync_token(since, until=None, stream=0, last=None):
+    """Encode sync progress into an opaque token."""
+    last_time, last_id = last if last else (None, None)
+    return encode_cursor([_format(since), _format(until), stream, _format(last_time), last_id])
+
+
+def decode_sync_token(token):
+    """Decode a token from :func:`encode_sync_token`; empty means full sync."""
+    if not token:
+        return None, None, 0, None
+
+    values, _ = decode_cursor(token)
+    try:
+        since, until, stream, last_time, last_id = values
+    except ValueError:
+        raise InvalidCursor('Invalid sync token')
+    if not isinstance(stream, int) or not 0 <= stream <= TOMBSTONE_STREAM:
+        raise InvalidCursor('Invalid sync token')
+    if last_time is not None and not isinstance(last_id, int):
+        raise InvalidCursor('Invalid sync token')
+
+    last = (_parse(last_time), last_id) if last_time is not None else None
+    return _parse(since), _parse(until), stream, last
+
+
+def _window(queryset, time_field, since, until, last):
+    """Rows in ``(since, until]`` after the ``last`` key, in key order."""
+    queryset = queryset.filter(**{f'{time_field}__lte': until})
+    if since:
+        queryset = queryset.filter(**{f'{time_field}__gt': since})
+    if last:
+        last_time, last_id = last
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__gt': last_time})
+            | Q(**{time_field: last_time, 'id__gt': last_id})
+        )
+    return queryset.order_by(time_field, 'id')
+
+
+def build_delta(token, limit=DEFAULT_SYNC_PAGE_SIZE):
+    """
+    Return one page of changes since ``token``.
+
+    The payload holds ``changes`` and ``deleted`` keyed by entity name, a
+    ``has_more`` flag and the ``next`` token.
+    """
+    since, until, stream, last = decode_sync_token(token)
+    if until is None:
+        until = timezone.now()
+
+    changes = {s.name: [] for s in SYNC_STREAMS}
+    deleted = {s.name: [] for s in SYNC_STREAMS}
+    remaining = limit
+
+    # A first sync has nothing to delete on the client
+    final_stream = TOMBSTONE_STREAM if since else TOMBSTONE_STREAM - 1
+
+    while stream <= final_stream:
+        if remaining == 0:
+            return _payload(changes, deleted, True, encode_sync_token(since, until, stream))
+
+        if stream == TOMBSTONE_STREAM:
+            time_field = 'deleted_at'
+            queryset = Tombstone.objects.filter(model_label__in=STREAMS_BY_LABEL)
+        else:
+            time_field = 'updated_at'
+            queryset = SYNC_STREAMS[stream].queryset()
+
+        rows = list(_window(queryset, time_field, since, until, last)[:remaining + 1])
+        page = rows[:remaining]
+
+        for row in page:
+            if stream == TOMBSTONE_STREAM:
+                deleted[STREAMS_BY_LABEL[row.model_label].name].append(row.object_id)
+            elif getattr(row, SYNC_STREAMS[stream].visible_field):
+                changes[SYNC_STREAMS[stream].name].append(SYNC_STREAMS[stream].serialize(row))
+            else:
+                # Hidden rows are deletions from the client's point of view
+                deleted[SYNC_STREAMS[stream].name].append(row.id)
+
+        if len(rows) > remaining:
+            last_row = page[-1]
+            next_token = encode_sync_token(
+                since, until, stream, (getattr(last_row, time_field), last_row.id)
+            )
+            return _payload(changes, deleted, True, next_token)
+
+        remaining -= len(page)
+        stream += 1
+        last = None
+
+    return _payload(changes, deleted, False, encode_sync_token(until - SYNC_OVERLAP))
+
+
+def _payload(changes, deleted, has_more, next_token):
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'has_more': has_more,
+        'next': next_token,
+    }
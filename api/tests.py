@@ -0,0 +1,608 @@
+"""
+Tests for the Monastery360 REST API.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from api.pagination import decode_cursor, encode_cursor
+from api.sync import SYNC_OVERLAP, decode_sync_token
+from core import counters, suggest
+from core.suggest import build_index
+from archives.models import ArchiveItem
+from core.models import AudioPOI, Monastery
+from events.models import Event
+from tours.models import Panorama
+
+
+class APITestMixin:
+    """Shared fixtures for API tests."""
+
+    def create_monastery(self, **kwargs):
+        data = {
+            'name': 'Test Monastery',
+            'established_year': 1800,
+            'description': 'A test monastery.',
+            'short_description': 'Test monastery.',
+            'latitude': 27.3389,
+            'longitude': 88.5937,
+            'address': 'Test Address',
+            'district': 'East Sikkim',
+            'image_alt': 'Test image',
+        }
+        data.update(kwargs)
+        return Monastery.objects.create(**data)
+
+    def create_event(self, monastery, start_time, **kwargs):
+        data = {
+            'monastery': monastery,
+            'title': 'Test Festival',
+            'description': 'A test festival event.',
+            'short_description': 'Test festival.',
+            'event_type': 'festival',
+            'start_time': start_time,
+            'end_time': start_time + timedelta(hours=2),
+        }
+        data.update(kwargs)
+        return Event.objects.create(**data)
+
+    def create_archive_item(self, monastery, catalog_number, **kwargs):
+        data = {
+            'monastery': monastery,
+            'title': f'Manuscript {catalog_number}',
+            'description': 'A historical manuscript.',
+            'item_type': 'manuscript',
+            'catalog_number': catalog_number,
+            'material': 'paper',
+            'image_alt': 'Manuscript image',
+        }
+        data.update(kwargs)
+        return ArchiveItem.objects.create(**data)
+
+
+class CursorEncodingTest(TestCase):
+    """Test cases for cursor encoding."""
+
+    def test_round_trip(self):
+        """Test that cursors decode to the values they encode."""
+        token = encode_cursor(['TEST001', 5], reverse=True)
+        self.assertEqual(decode_cursor(token), (['TEST001', 5], True))
+
+    def test_invalid_cursor_rejected(self):
+        """Test that malformed cursors return 400."""
+        response = self.client.get(reverse('api:event_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EventPaginationTest(APITestMixin, TestCase):
+    """Test cases for keyset pagination of the event list."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery()
+        start = timezone.now() + timedelta(days=1)
+        # Two events share a start time to exercise the id tiebreaker
+        self.events = [
+            self.create_event(self.monastery, start + timedelta(hours=i // 2), title=f'Event {i}')
+            for i in range(5)
+        ]
+
+    def test_pages_cover_all_rows_once(self):
+        """Test walking forward returns every event exactly once, in order."""
+        url = reverse('api:event_list')
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            payload = self.client.get(url, params).json()
+            seen.extend(item['id'] for item in payload['results'])
+            cursor = payload['next']
+            if not cursor:
+                break
+
+        self.assertEqual(seen, [event.id for event in self.events])
+
+    def test_prev_cursor_returns_previous_page(self):
+        """Test that following prev returns to the earlier page."""
+        url = reverse('api:event_list')
+        first = self.client.get(url, {'limit': 2}).json()
+        self.assertIsNone(first['prev'])
+
+        second = self.client.get(url, {'limit': 2, 'cursor': first['next']}).json()
+        back = self.client.get(url, {'limit': 2, 'cursor': second['prev']}).json()
+        self.assertEqual(
+            [item['id'] for item in back['results']],
+            [item['id'] for item in first['results']],
+        )
+
+
+class ArchivePaginationTest(APITestMixin, TestCase):
+    """Test cases for keyset pagination of archive listings."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery()
+        for number in ('C003', 'A001', 'B002'):
+            self.create_archive_item(self.monastery, number)
+
+    def test_ordered_by_catalog_number(self):
+        """Test archive pages are ordered by catalog number."""
+        url = reverse('api:archive_list', kwargs={'monastery_slug': self.monastery.slug})
+        first = self.client.get(url, {'limit': 2}).json()
+        second = self.client.get(url, {'limit': 2, 'cursor': first['next']}).json()
+
+        numbers = [item['catalog_number'] for item in first['results'] + second['results']]
+        self.assertEqual(numbers, ['A001', 'B002', 'C003'])
+        self.assertIsNone(second['next'])
+
+    def test_view_counts_include_pending(self):
+        """Test that listed view counts include increments not yet flushed."""
+        item = ArchiveItem.objects.get(catalog_number='A001')
+        item.increment_view_count()
+        item.increment_view_count()
+        self.addCleanup(counters.flush)
+        url = reverse('api:archive_list', kwargs={'monastery_slug': self.monastery.slug})
+        results = self.client.get(url, {'fields': 'catalog_number,view_count'}).json()['results']
+        self.assertEqual(results[0], {'catalog_number': 'A001', 'view_count': 2})
+
+
+class ArchiveFacetTest(APITestMixin, TestCase):
+    """Test cases for archive facet counts."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery()
+        other = self.create_monastery(name='Other Monastery', slug='other-monastery')
+        self.create_archive_item(self.monastery, 'A001', material='paper', language='Tibetan')
+        self.create_archive_item(self.monastery, 'A002', material='paper', language='Sanskrit')
+        self.create_archive_item(self.monastery, 'A003', material='cloth', item_type='thangka')
+        self.create_archive_item(other, 'B001', material='paper', language='Tibetan')
+
+    def counts(self, payload, name):
+        return {entry['value']: entry['count'] for entry in payload['facets'][name]}
+
+    def test_counts_in_one_query(self):
+        """Test that every facet is counted with a single query."""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api:archive_facets'))
+        payload = response.json()
+        self.assertEqual(payload['total'], 4)
+        self.assertEqual(self.counts(payload, 'material'), {'paper': 3, 'cloth': 1})
+        self.assertEqual(self.counts(payload, 'monastery'), {self.monastery.slug: 3, 'other-monastery': 1})
+        self.assertEqual(self.counts(payload, 'language'), {'Tibetan': 2, 'Sanskrit': 1})
+
+    def test_counts_are_disjunctive(self):
+        """Test that a facet's own filter does not hide its other values."""
+        payload = self.client.get(
+            reverse('api:archive_facets'), {'material': 'paper', 'monastery': self.monastery.slug},
+        ).json()
+        self.assertEqual(payload['total'], 2)
+        self.assertEqual(self.counts(payload, 'material'), {'paper': 2, 'cloth': 1})
+        self.assertEqual(self.counts(payload, 'monastery'), {self.monastery.slug: 2, 'other-monastery': 1})
+        self.assertEqual(self.counts(payload, 'item_type'), {'manuscript': 2})
+
+    def test_archive_list_filters_and_facets(self):
+        """Test that the archive listing filters and reports facet counts."""
+        url = reverse('api:archive_list', kwargs={'monastery_slug': self.monastery.slug})
+        payload = self.client.get(url, {'language': 'Tibetan', 'facets': '1'}).json()
+        self.assertEqual([item['catalog_number'] for item in payload['results']], ['A001'])
+        self.assertEqual(payload['total'], 1)
+        self.assertEqual(self.counts(payload, 'language'), {'Tibetan': 1, 'Sanskrit': 1})
+        self.assertNotIn('monastery', payload['facets'])
+
+
+class SparseFieldsetTest(APITestMixin, TestCase):
+    """Test cases for ?fields= and ?profile= selection."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery()
+        self.create_archive_item(self.monastery, 'A001')
+
+    def test_fields_parameter_limits_keys(self):
+        """Test that only the requested fields are returned."""
+        response = self.client.get(reverse('api:monastery_list'), {'fields': 'name,slug'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'name': 'Test Monastery', 'slug': 'test-monastery'}])
+
+    def test_card_profile_avoids_deferred_loads(self):
+        """Test that projected rows do not lazily load deferred columns."""
+        url = reverse('api:archive_list', kwargs={'monastery_slug': self.monastery.slug})
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'profile': 'card'})
+        item = response.json()['results'][0]
+        self.assertNotIn('description', item)
+        self.assertEqual(item['catalog_number'], 'A001')
+
+    def test_unknown_field_rejected(self):
+        """Test that unknown field names return 400."""
+        response = self.client.get(reverse('api:event_list'), {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_default_profile(self):
+        """Test that the detail endpoint keeps its related sections by default."""
+        url = reverse('api:monastery_detail', kwargs={'slug': self.monastery.slug})
+        data = self.client.get(url).json()
+        self.assertEqual(data['location'], {'latitude': 27.3389, 'longitude': 88.5937})
+        self.assertEqual(data['statistics']['total_archive_items'], 1)
+
+
+class ConditionalGetTest(APITestMixin, TestCase):
+    """Test cases for ETag / Last-Modified validation."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery()
+        self.url = reverse('api:monastery_detail', kwargs={'slug': self.monastery.slug})
+
+    def test_matching_etag_returns_304(self):
+        """Test that a repeat request with If-None-Match is not re-sent."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        repeat = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_deletion_not_hidden_by_if_modified_since(self):
+        """Test that a removed row is never answered with 304 by date."""
+        item = self.create_archive_item(self.monastery, 'A001')
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        item.delete()
+
+        since = http_date(time.time() + 3600)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_related_change_invalidates_etag(self):
+        """Test that adding related rows changes the validator."""
+        etag = self.client.get(self.url)['ETag']
+        self.create_archive_item(self.monastery, 'A001')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_query_string_varies_etag(self):
+        """Test that different fieldsets get different validators."""
+        url = reverse('api:monastery_list')
+        full = self.client.get(url)['ETag']
+        card = self.client.get(url, {'profile': 'card'})['ETag']
+        self.assertNotEqual(full, card)
+
+
+class TourBundleTest(APITestMixin, TestCase):
+    """Test cases for the virtual tour bundle endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery()
+        Panorama.objects.create(
+            monastery=self.monastery,
+            title='Main Hall',
+            description='The main hall.',
+            image='tours/panoramas/main-hall.jpg',
+            image_alt='Main hall',
+            hotspots_data={'hotspots': [{'pitch': 0, 'yaw': 90, 'text': 'Altar'}]},
+        )
+        self.item = self.create_archive_item(self.monastery, 'A001')
+        self.create_archive_item(self.monastery, 'A002', is_public=False)
+        self.url = reverse('api:tour_bundle', kwargs={'slug': self.monastery.slug})
+
+    def test_bundle_contents(self):
+        """Test that views, POIs and archive detail URLs are included."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+
+        data = response.json()
+        self.assertEqual(data['monastery']['slug'], self.monastery.slug)
+        self.assertEqual([view['title'] for view in data['tour']['views']], ['Main Hall'])
+        self.assertEqual(data['tour']['views'][0]['hotspots'][0]['text'], 'Altar')
+        self.assertEqual(data['pois'], [])
+        self.assertEqual(
+            [archive['detailUrl'] for archive in data['archives']],
+            [self.item.get_absolute_url()],
+        )
+
+    def test_matching_etag_returns_304(self):
+        """Test that the bundle revalidates instead of being re-sent."""
+        etag = self.client.get(self.url)['ETag']
+        repeat = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_curated_config_edit_changes_bundle(self):
+        """Test that editing the curated panorama config changes the ETag and the cached bundle."""
+        demo = self.create_monastery(name='Curated Monastery', pano_id='curated')
+        url = reverse('api:tour_bundle', kwargs={'slug': demo.slug})
+        with tempfile.TemporaryDirectory() as base_dir, override_settings(BASE_DIR=base_dir):
+            os.makedirs(os.path.join(base_dir, 'static', 'data'))
+            path = os.path.join(base_dir, 'static', 'data', 'monastery_panoramas.json')
+
+            def write(views):
+                with open(path, 'w') as f:
+                    json.dump({'monasteries': {'curated': {'views': views}}}, f)
+
+            write([{'title': 'Old', 'url': '/old.jpg'}])
+            first = self.client.get(url)
+            self.assertEqual([view['title'] for view in first.json()['tour']['views']], ['Old'])
+
+            write([{'title': 'New', 'url': '/new.jpg'}, {'title': 'Added', 'url': '/added.jpg'}])
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(second.status_code, 200)
+            self.assertNotEqual(second['ETag'], first['ETag'])
+            self.assertEqual([view['title'] for view in second.json()['tour']['views']], ['New', 'Added'])
+
+    def test_panoramas_without_image(self):
+        """Test that image-less panoramas are left out, falling back to the curated config."""
+        Panorama.objects.create(
+            monastery=self.monastery,
+            title='Unfinished',
+            description='No image uploaded yet.',
+            image_alt='Unfinished',
+            location_name='Courtyard',
+            order=1,
+        )
+        views = self.client.get(self.url).json()['tour']['views']
+        self.assertEqual([view['title'] for view in views], ['Main Hall'])
+
+        demo = self.create_monastery(name='Demo Monastery', pano_id='rumtek')
+        Panorama.objects.create(
+            monastery=demo,
+            title='Demo Hall',
+            description='Demo data has no images.',
+            image_alt='Demo hall',
+        )
+        views = self.client.get(reverse('api:tour_bundle', kwargs={'slug': demo.slug})).json()['tour']['views']
+        self.assertTrue(views)
+        self.assertNotIn('Demo Hall', [view['title'] for view in views])
+        self.assertTrue(all(view['url'] for view in views))
+
+        other = self.create_monastery(name='Uncurated Monastery')
+        Panorama.objects.create(
+            monastery=other,
+            title='Other Hall',
+            description='No image.',
+            image_alt='Other hall',
+        )
+        bundle = self.client.get(reverse('api:tour_bundle', kwargs={'slug': other.slug})).json()
+        self.assertEqual(bundle['tour']['views'], [])
+        page = self.client.get(reverse('tours:monastery_tour', kwargs={'slug': other.slug}))
+        self.assertEqual(page.status_code, 200)
+
+    def test_inactive_monastery_not_found(self):
+        """Test that inactive monasteries have no bundle."""
+        self.monastery.is_active = False
+        self.monastery.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+class SuggestTest(APITestMixin, TestCase):
+    """Test cases for search-box autocomplete."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery(name='Rumtek Monastery')
+        self.create_archive_item(self.monastery, 'RUM-001', title='Rumtek Chronicle', view_count=5)
+        self.create_archive_item(self.monastery, 'RUM-002', title='Prayer Flags', view_count=50)
+        self.create_archive_item(self.monastery, 'RUM-003', title='Hidden', is_public=False)
+        suggest.invalidate()
+
+    def labels(self, results):
+        return [result['label'] for result in results]
+
+    def test_prefix_of_any_word_matches(self):
+        """Test that later words and catalog numbers are matched."""
+        index = build_index()
+        self.assertEqual(self.labels(index.suggest('monas')), ['Rumtek Monastery'])
+        self.assertEqual(self.labels(index.suggest('rum-00')), ['Prayer Flags', 'Rumtek Chronicle'])
+        self.assertEqual(index.suggest('hidden'), [])
+
+    def test_results_ordered_by_views(self):
+        """Test that the most viewed match comes first."""
+        index = build_index()
+        self.assertEqual(
+            self.labels(index.suggest('r')),
+            ['Prayer Flags', 'Rumtek Chronicle', 'Rumtek Monastery'],
+        )
+
+    def test_endpoint(self):
+        """Test the suggest endpoint and its limit."""
+        response = self.client.get(reverse('api:suggest'), {'q': 'rum', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.labels(response.json()['results']), ['Prayer Flags'])
+
+
+class MonasteryDetailQueryBudgetTest(APITestMixin, TestCase):
+    """Test that the monastery detail endpoint runs a fixed number of queries."""
+
+    # 5 validator aggregates + monastery with archive count + 3 prefetches
+    QUERY_BUDGET = 9
+
+    def setUp(self):
+        """Set up test data."""
+        self.small = self.create_monastery(name='Small Monastery')
+        self.large = self.create_monastery(name='Large Monastery')
+        self.populate(self.small, 1)
+        self.populate(self.large, 6)
+
+    def populate(self, monastery, size):
+        start = timezone.now() + timedelta(days=1)
+        for i in range(size):
+            AudioPOI.objects.create(
+                monastery=monastery, title=f'POI {i}', description='POI.',
+                audio_duration=60, order=i,
+            )
+            Panorama.objects.create(
+                monastery=monastery, title=f'View {i}', description='View.',
+                location_name=f'Hall {i}', image_alt='View', order=i,
+            )
+            self.create_event(monastery, start + timedelta(hours=i))
+            self.create_archive_item(monastery, f'{monastery.slug}-{i}')
+
+    def test_query_count_is_constant(self):
+        """Test the query count does not grow with related rows."""
+        for monastery, size in ((self.small, 1), (self.large, 6)):
+            url = reverse('api:monastery_detail', kwargs={'slug': monastery.slug})
+            with self.assertNumQueries(self.QUERY_BUDGET):
+                data = self.client.get(url).json()
+
+            self.assertEqual(len(data['panoramas']), size)
+            self.assertEqual(len(data['audio_pois']), size)
+            self.assertEqual(len(data['upcoming_events']), min(size, 5))
+            self.assertEqual(data['statistics'], {
+                'total_panoramas': size,
+                'total_audio_pois': size,
+                'total_archive_items': size,
+                'upcoming_events_count': min(size, 5),
+            })
+            self.assertTrue(data['panoramas'][0]['url'].startswith('/tours/panorama/'))
+
+
+class DeltaSyncTest(APITestMixin, TestCase):
+    """Test cases for the /api/sync/ endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.url = reverse('api:sync')
+        self.monastery = self.create_monastery()
+        self.items = [self.create_archive_item(self.monastery, f'A00{i}') for i in range(3)]
+        # Saved well before any sync, outside its overlap
+        earlier = timezone.now() - 2 * SYNC_OVERLAP
+        Monastery.objects.update(updated_at=earlier)
+        ArchiveItem.objects.update(updated_at=earlier)
+
+    def sync_all(self, token=None, limit=None):
+        """Follow next tokens until the sync is complete."""
+        changes, deleted = {}, {}
+        while True:
+            params = {}
+            if token:
+                params['since'] = token
+            if limit:
+                params['limit'] = limit
+            payload = self.client.get(self.url, params).json()
+            for name, rows in payload['changes'].items():
+                changes.setdefault(name, []).extend(row['id'] for row in rows)
+            for name, ids in payload['deleted'].items():
+                deleted.setdefault(name, []).extend(ids)
+            token = payload['next']
+            if not payload['has_more']:
+                return changes, deleted, token
+
+    def test_full_sync_pages_through_everything(self):
+        """Test a paged first sync returns every row once."""
+        changes, deleted, _ = self.sync_all(limit=2)
+        self.assertEqual(changes['monasteries'], [self.monastery.id])
+        self.assertEqual(changes['archive_items'], [item.id for item in self.items])
+        self.assertFalse(any(deleted.values()))
+
+    def test_incremental_sync_returns_only_changes(self):
+        """Test a follow-up sync returns updates and tombstones only."""
+        _, _, token = self.sync_all()
+
+        self.items[0].title = 'Updated title'
+        self.items[0].save()
+        deleted_id = self.items[1].id
+        self.items[1].delete()
+
+        changes, deleted, _ = self.sync_all(token)
+        self.assertEqual(changes['archive_items'], [self.items[0].id])
+        self.assertEqual(changes['monasteries'], [])
+        self.assertEqual(deleted['archive_items'], [deleted_id])
+
+    def test_hidden_rows_sync_as_deleted(self):
+        """Test that unpublishing a row tells the client to drop it."""
+        _, _, token = self.sync_all()
+        self.items[2].is_public = False
+        self.items[2].save()
+
+        changes, deleted, _ = self.sync_all(token)
+        self.assertEqual(changes['archive_items'], [])
+        self.assertEqual(deleted['archive_items'], [self.items[2].id])
+
+    def test_rows_committed_after_sync_are_not_missed(self):
+        """Test that a row saved before a sync ended but committed after it is sent next time."""
+        _, _, token = self.sync_all()
+        until = decode_sync_token(token)[0] + SYNC_OVERLAP
+
+        # Saved just before the sync's upper bound, visible only now
+        late = self.create_archive_item(self.monastery, 'A009')
+        ArchiveItem.objects.filter(pk=late.pk).update(updated_at=until - timedelta(milliseconds=1))
+
+        changes, _, _ = self.sync_all(token)
+        self.assertEqual(changes['archive_items'], [late.id])
+
+
+class ExportTest(APITestMixin, TestCase):
+    """Test cases for the streaming catalog export."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = self.create_monastery()
+        self.create_archive_item(self.monastery, 'A001')
+        self.create_archive_item(self.monastery, 'A002', is_public=False)
+
+    def export_url(self, entity, fmt):
+        return reverse('api:export', kwargs={'entity': entity, 'fmt': fmt})
+
+    def test_ndjson_export_streams_public_rows(self):
+        """Test NDJSON export contains one line per public row."""
+        response = self.client.get(self.export_url('archive_items', 'ndjson'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['catalog_number'] for row in rows], ['A001'])
+        self.assertEqual(rows[0]['monastery_id'], self.monastery.id)
+
+    def test_csv_export_has_header(self):
+        """Test CSV export starts with a header row."""
+        response = self.client.get(self.export_url('monasteries', 'csv'))
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertTrue(lines[0].startswith('id,name,slug'))
+        self.assertEqual(len(lines), 2)
+
+    def test_gzip_export(self):
+        """Test the export is gzipped when the client accepts it."""
+        response = self.client.get(
+            self.export_url('archive_items', 'ndjson'),
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'A001', body)
+
+    def test_gzip_refused_by_zero_weight(self):
+        """Test that gzip;q=0 is treated as a refusal, not an acceptance."""
+        response = self.client.get(
+            self.export_url('archive_items', 'ndjson'),
+            HTTP_ACCEPT_ENCODING='gzip;q=0, identity',
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn(b'A001', b''.join(response.streaming_content))
+
+        response = self.client.get(
+            self.export_url('archive_items', 'ndjson'),
+            HTTP_ACCEPT_ENCODING='br, *;q=0.5',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_gzip_file_download(self):
+        """Test that ?gzip=1 downloads a .gz file instead of setting Content-Encoding."""
+        response = self.client.get(self.export_url('archive_items', 'ndjson'), {'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('filename="archive_items.ndjson.gz"', response['Content-Disposition'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'A001', body)
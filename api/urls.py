@@ -2,7 +2,7 @@
 URL configuration for API endpoints.
 """
 
-from django.urls import path
+from django.urls import path, re_path
 
 from . import views
 
@@ -16,9 +16,30 @@ urlpatterns = [
     path('monasteries/', views.MonasteryListAPIView.as_view(), name='monastery_list'),
     path('monasteries/<slug:slug>/', views.MonasteryDetailAPIView.as_view(), name='monastery_detail'),
 
+    # Virtual tours
+    path('tours/<slug:slug>/bundle/', views.TourBundleAPIView.as_view(), name='tour_bundle'),
+
     # Events
     path('events/', views.EventListAPIView.as_view(), name='event_list'),
 
     # Archives
+    path('archives/facets/', views.ArchiveFacetsAPIView.as_view(), name='archive_facets'),
     path('archives/<slug:monastery_slug>/', views.ArchiveListAPIView.as_view(), name='archive_list'),
+
+    # Search autocomplete
+    path('suggest/', views.SuggestAPIView.as_view(), name='suggest'),
+
+    # Spatial lookups
+    path('nearby/', views.NearbyAPIView.as_view(), name='nearby'),
+    path('bbox/', views.BoundingBoxAPIView.as_view(), name='bbox'),
+
+    # Offline delta sync
+    path('sync/', views.SyncAPIView.as_view(), name='sync'),
+
+    # Bulk export
+    re_path(
+        r'^export/(?P<entity>monasteries|events|archive_items)\.(?P<fmt>ndjson|csv)$',
+        views.export_catalog,
+        name='export',
+    ),
 ]
@@ -4,49 +4,104 @@ API views for Monastery360.
 Provides REST API endpoints for accessing monastery data, events, and archives.
 """
 
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
+from archives.facets import FACETS, apply_filters, facet_counts, selected_filters
 from archives.models import ArchiveItem
-from core.models import Monastery
+from core.cache import cache_response
+from core.conditional import conditional_on_querysets
+from core.geo import nearest, within_bbox
+from core.models import AudioPOI, Monastery
+from core.suggest import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, suggest
 from events.models import Event
+from tours.models import Panorama
 
+from .bundle import build_tour_bundle, curated_panoramas_path
+from .export import CONTENT_TYPES, EXPORTS, accepts_gzip, export_stream
+from .fieldsets import (
+    ARCHIVE_ITEM_FIELDS,
+    AUDIO_POI_FIELDS,
+    EVENT_FIELDS,
+    MONASTERY_DETAIL_FIELDS,
+    MONASTERY_FIELDS,
+    InvalidFields,
+)
+from .pagination import InvalidCursor, KeysetPaginator, parse_page_size
+from .sync import DEFAULT_SYNC_PAGE_SIZE, MAX_SYNC_PAGE_SIZE, build_delta
 
+
+# Facets of a single monastery's archive listing
+ITEM_FACETS = [facet for facet in FACETS if facet.name != 'monastery']
+
+
+def _monastery_list_state(request):
+    return [Monastery.objects.filter(is_active=True)]
+
+
+def _monastery_detail_state(request, slug):
+    return [
+        Monastery.objects.filter(slug=slug),
+        AudioPOI.objects.filter(monastery__slug=slug),
+        Panorama.objects.filter(monastery__slug=slug),
+        Event.objects.filter(monastery__slug=slug),
+        ArchiveItem.objects.filter(monastery__slug=slug),
+    ]
+
+
+def _tour_bundle_state(request, slug):
+    return [
+        Monastery.objects.filter(slug=slug),
+        AudioPOI.objects.filter(monastery__slug=slug),
+        Panorama.objects.filter(monastery__slug=slug),
+        ArchiveItem.objects.filter(monastery__slug=slug),
+    ]
+
+
+def _event_list_state(request):
+    return [
+        Event.objects.filter(
+            start_time__gte=timezone.now(),
+            is_public=True,
+            is_cancelled=False
+        ),
+        Monastery.objects.all(),
+    ]
+
+
+@method_decorator(conditional_on_querysets(_monastery_list_state), name='get')
+@method_decorator(
+    cache_response(Monastery, namespace='api.MonasteryListAPIView'),
+    name='dispatch',
+)
 class MonasteryListAPIView(generics.ListAPIView):
     """
     API endpoint to list all active monasteries.
 
     Returns basic information about all monasteries including
-    location data for mapping applications.
+    location data for mapping applications. Supports ``?fields=`` and
+    ``?profile=`` (``card``, ``list``, ``full``) to limit the payload.
     """
 
     def get(self, request):
-        monasteries = Monastery.objects.filter(is_active=True).order_by('name')
-        data = []
-
-        for monastery in monasteries:
-            monastery_data = {
-                'id': monastery.id,
-                'name': monastery.name,
-                'slug': monastery.slug,
-                'short_description': monastery.short_description,
-                'district': monastery.district,
-                'established_year': monastery.established_year,
-                'location': {
-                    'latitude': monastery.latitude,
-                    'longitude': monastery.longitude,
-                } if monastery.location else None,
-                'address': monastery.address,
-                'visiting_hours': monastery.visiting_hours,
-                'entry_fee': monastery.entry_fee,
-                'image_url': monastery.image.url if monastery.image else None,
-                'url': monastery.get_absolute_url(),
-                'is_featured': monastery.is_featured,
-            }
-            data.append(monastery_data)
+        try:
+            fields = MONASTERY_FIELDS.select(request, default_profile='list')
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        monasteries = MONASTERY_FIELDS.project(
+            Monastery.objects.filter(is_active=True).order_by('name'),
+            fields,
+            extra=('name',),
+        )
+        data = [MONASTERY_FIELDS.serialize(monastery, fields) for monastery in monasteries]
 
         return Response({
             'count': len(data),
@@ -54,115 +109,100 @@ class MonasteryListAPIView(generics.ListAPIView):
         })
 
 
+@method_decorator(conditional_on_querysets(_monastery_detail_state), name='get')
+@method_decorator(
+    cache_response(
+        Monastery, AudioPOI, Panorama, Event, ArchiveItem,
+        namespace='api.MonasteryDetailAPIView',
+    ),
+    name='dispatch',
+)
 class MonasteryDetailAPIView(generics.RetrieveAPIView):
     """
     API endpoint to get detailed information about a specific monastery.
 
     Includes related data like audio POIs, panoramas, and recent events.
+    Related sections are only queried when they are part of the requested
+    fieldset.
     """
 
     def get(self, request, slug):
-        monastery = get_object_or_404(Monastery, slug=slug, is_active=True)
-
-        # Get related data
-        audio_pois = monastery.audio_pois.filter(is_active=True).order_by('order')
-        panoramas = monastery.panoramas.filter(is_active=True).order_by('order')
-        upcoming_events = monastery.events.filter(
-            start_time__gte=timezone.now(),
-            is_public=True,
-            is_cancelled=False
-        ).order_by('start_time')[:5]
-
-        data = {
-            'id': monastery.id,
-            'name': monastery.name,
-            'slug': monastery.slug,
-            'description': monastery.description,
-            'short_description': monastery.short_description,
-            'established_year': monastery.established_year,
-            'district': monastery.district,
-            'altitude': monastery.altitude,
-            'location': {
-                'latitude': monastery.latitude,
-                'longitude': monastery.longitude,
-            } if monastery.location else None,
-            'address': monastery.address,
-            'visiting_hours': monastery.visiting_hours,
-            'entry_fee': monastery.entry_fee,
-            'phone': monastery.phone,
-            'email': monastery.email,
-            'website': monastery.website,
-            'image_url': monastery.image.url if monastery.image else None,
-            'image_alt': monastery.image_alt,
-            'audio_pois': [
-                {
-                    'id': poi.id,
-                    'title': poi.title,
-                    'description': poi.description,
-                    'location': {
-                        'latitude': poi.latitude,
-                        'longitude': poi.longitude,
-                    } if poi.location else None,
-                    'audio_url': poi.audio_file.url if poi.audio_file else None,
-                    'audio_duration': poi.audio_duration,
-                    'order': poi.order,
-                }
-                for poi in audio_pois
-            ],
-            'panoramas': [
-                {
-                    'id': panorama.id,
-                    'title': panorama.title,
-                    'description': panorama.description,
-                    'location_name': panorama.location_name,
-                    'image_url': panorama.image.url if panorama.image else None,
-                    'thumbnail_url': panorama.thumbnail.url if panorama.thumbnail else None,
-                    'narration_audio_url': panorama.narration_audio.url if panorama.narration_audio else None,
-                    'audio_duration': panorama.audio_duration,
-                    'view_count': panorama.view_count,
-                    'order': panorama.order,
-                    'url': panorama.get_absolute_url(),
-                }
-                for panorama in panoramas
-            ],
-            'upcoming_events': [
-                {
-                    'id': event.id,
-                    'title': event.title,
-                    'short_description': event.short_description,
-                    'event_type': event.event_type,
-                    'start_time': event.start_time.isoformat(),
-                    'end_time': event.end_time.isoformat(),
-                    'location_details': event.location_details,
-                    'entry_fee': event.entry_fee,
-                    'url': event.get_absolute_url(),
-                }
-                for event in upcoming_events
-            ],
-            'statistics': {
-                'total_panoramas': panoramas.count(),
-                'total_audio_pois': audio_pois.count(),
-                'total_archive_items': monastery.archive_items.filter(is_public=True).count(),
-                'upcoming_events_count': upcoming_events.count(),
-            }
-        }
-
-        return Response(data)
+        try:
+            fields = MONASTERY_DETAIL_FIELDS.select(request, default_profile='detail')
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        monastery = get_object_or_404(
+            MONASTERY_DETAIL_FIELDS.project(Monastery.objects.all(), fields, extra=('slug',)),
+            slug=slug,
+            is_active=True,
+        )
+
+        return Response(MONASTERY_DETAIL_FIELDS.serialize(monastery, fields))
+
+
+# Browsers may reuse a bundle this long before revalidating it by ETag
+TOUR_BUNDLE_MAX_AGE = 300
+
+
+@method_decorator(
+    conditional_on_querysets(_tour_bundle_state, files=(curated_panoramas_path,)),
+    name='get',
+)
+@method_decorator(
+    cache_response(
+        Monastery, AudioPOI, Panorama, ArchiveItem,
+        namespace='api.TourBundleAPIView',
+        files=(curated_panoramas_path,),
+    ),
+    name='dispatch',
+)
+class TourBundleAPIView(generics.RetrieveAPIView):
+    """
+    API endpoint returning everything a monastery's virtual tour needs.
 
+    One document holds the panorama views, audio POIs and public archive
+    items (with resolved detail URLs), so the tour page makes a single,
+    cacheable request instead of loading the static JSON catalogs.
+    """
 
+    def get(self, request, slug):
+        monastery = get_object_or_404(
+            Monastery.objects.only('id', 'slug', 'name', 'pano_id'),
+            slug=slug,
+            is_active=True,
+        )
+
+        response = Response(build_tour_bundle(monastery))
+        patch_cache_control(response, public=True, max_age=TOUR_BUNDLE_MAX_AGE)
+        return response
+
+
+@method_decorator(conditional_on_querysets(_event_list_state), name='get')
+@method_decorator(
+    cache_response(Event, Monastery, namespace='api.EventListAPIView'),
+    name='dispatch',
+)
 class EventListAPIView(generics.ListAPIView):
     """
     API endpoint to list upcoming public events.
 
-    Returns events from all monasteries that are public and not cancelled.
+    Returns events from all monasteries that are public and not cancelled,
+    paginated by an opaque ``cursor`` keyed on ``(start_time, id)``.
+    Supports ``?fields=`` and ``?profile=`` to limit the payload.
     """
 
     def get(self, request):
+        try:
+            fields = EVENT_FIELDS.select(request)
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         events = Event.objects.filter(
             start_time__gte=timezone.now(),
             is_public=True,
             is_cancelled=False
-        ).select_related('monastery').order_by('start_time')
+        )
 
         # Optional filtering by monastery
         monastery_slug = request.GET.get('monastery')
@@ -174,112 +214,310 @@ class EventListAPIView(generics.ListAPIView):
         if event_type:
             events = events.filter(event_type=event_type)
 
-        # Limit results
-        limit = min(int(request.GET.get('limit', 20)), 100)
-        events = events[:limit]
-
-        data = []
-        for event in events:
-            event_data = {
-                'id': event.id,
-                'title': event.title,
-                'description': event.description,
-                'short_description': event.short_description,
-                'event_type': event.event_type,
-                'start_time': event.start_time.isoformat(),
-                'end_time': event.end_time.isoformat(),
-                'is_all_day': event.is_all_day,
-                'location_details': event.location_details,
-                'entry_fee': event.entry_fee,
-                'requires_registration': event.requires_registration,
-                'max_participants': event.max_participants,
-                'language': event.language,
-                'dress_code': event.dress_code,
-                'image_url': event.image.url if event.image else None,
-                'monastery': {
-                    'id': event.monastery.id,
-                    'name': event.monastery.name,
-                    'slug': event.monastery.slug,
-                    'district': event.monastery.district,
-                },
-                'url': event.get_absolute_url(),
-                'status': event.status,
-                'duration_hours': event.duration_hours,
-            }
-            data.append(event_data)
+        # Keyset pagination
+        paginator = KeysetPaginator(
+            EVENT_FIELDS.project(events, fields, extra=('start_time',)),
+            keys=('start_time', 'id'),
+            page_size=parse_page_size(request.GET.get('limit')),
+        )
+        try:
+            events, next_cursor, prev_cursor = paginator.paginate(request.GET.get('cursor'))
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = [EVENT_FIELDS.serialize(event, fields) for event in events]
 
         return Response({
             'count': len(data),
+            'next': next_cursor,
+            'prev': prev_cursor,
             'results': data
         })
 
 
+@method_decorator(
+    cache_response(ArchiveItem, Monastery, namespace='api.ArchiveListAPIView'),
+    name='dispatch',
+)
 class ArchiveListAPIView(generics.ListAPIView):
     """
     API endpoint to list archive items for a specific monastery.
 
-    Returns digital archive items that are marked as public.
+    Returns digital archive items that are marked as public, paginated by
+    an opaque ``cursor`` keyed on ``(catalog_number, id)``. Supports
+    ``?fields=`` and ``?profile=`` to limit the payload.
+
+    Filter with ``?type=``, ``?material=``, ``?condition=``, ``?language=``
+    and ``?script=`` (each repeatable). With ``?facets=1`` the response also
+    carries the counts for every facet value under the other filters.
     """
 
     def get(self, request, monastery_slug):
-        monastery = get_object_or_404(Monastery, slug=monastery_slug, is_active=True)
+        try:
+            fields = ARCHIVE_ITEM_FIELDS.select(request)
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        monastery = get_object_or_404(
+            Monastery.objects.only('id', 'name', 'slug'),
+            slug=monastery_slug,
+            is_active=True,
+        )
         archive_items = ArchiveItem.objects.filter(
             monastery=monastery,
             is_public=True
-        ).order_by('catalog_number')
-
-        # Optional filtering by item type
-        item_type = request.GET.get('type')
-        if item_type:
-            archive_items = archive_items.filter(item_type=item_type)
-
-        # Optional filtering by material
-        material = request.GET.get('material')
-        if material:
-            archive_items = archive_items.filter(material=material)
-
-        # Limit results
-        limit = min(int(request.GET.get('limit', 20)), 100)
-        archive_items = archive_items[:limit]
-
-        data = []
-        for item in archive_items:
-            item_data = {
-                'id': item.id,
-                'title': item.title,
-                'description': item.description,
-                'item_type': item.item_type,
-                'catalog_number': item.catalog_number,
-                'material': item.material,
-                'condition': item.condition,
-                'estimated_age': item.estimated_age,
-                'historical_period': item.historical_period,
-                'cultural_significance': item.cultural_significance,
-                'dimensions': item.dimensions,
-                'language': item.language,
-                'script': item.script,
-                'image_url': item.image.url if item.image else None,
-                'image_alt': item.image_alt,
-                'scan_url': item.scan.url if item.scan else None,
-                'scan_resolution': item.scan_resolution,
-                'has_high_res_scan': item.has_high_res_scan,
-                'item_type_icon': item.item_type_display_icon,
-                'view_count': item.view_count,
-                'url': item.get_absolute_url(),
-            }
-            data.append(item_data)
-
-        return Response({
+        )
+
+        # Optional filtering, and facet counts for a filter sidebar
+        selected = selected_filters(request.GET, ITEM_FACETS)
+        facets = None
+        if request.GET.get('facets') == '1':
+            facets = facet_counts(archive_items, selected, ITEM_FACETS)
+        archive_items = apply_filters(archive_items, selected)
+
+        # Keyset pagination
+        paginator = KeysetPaginator(
+            ARCHIVE_ITEM_FIELDS.project(archive_items, fields, extra=('catalog_number',)),
+            keys=('catalog_number', 'id'),
+            page_size=parse_page_size(request.GET.get('limit')),
+        )
+        try:
+            archive_items, next_cursor, prev_cursor = paginator.paginate(request.GET.get('cursor'))
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = [ARCHIVE_ITEM_FIELDS.serialize(item, fields) for item in archive_items]
+
+        payload = {
             'monastery': {
                 'id': monastery.id,
                 'name': monastery.name,
                 'slug': monastery.slug,
             },
             'count': len(data),
+            'next': next_cursor,
+            'prev': prev_cursor,
             'results': data
+        }
+        if facets is not None:
+            payload['total'] = facets['total']
+            payload['facets'] = facets['facets']
+        return Response(payload)
+
+
+@method_decorator(
+    cache_response(ArchiveItem, Monastery, namespace='api.ArchiveFacetsAPIView'),
+    name='dispatch',
+)
+class ArchiveFacetsAPIView(generics.GenericAPIView):
+    """
+    Facet counts across the archives of every active monastery.
+
+    Takes the same filters as the archive listing, plus ``?monastery=<slug>``,
+    and returns the number of matching items and, for every facet, the count
+    of each value under the other filters.
+    """
+
+    def get(self, request):
+        archive_items = ArchiveItem.objects.filter(is_public=True, monastery__is_active=True)
+        return Response(facet_counts(archive_items, selected_filters(request.GET)))
+
+
+class SyncAPIView(generics.GenericAPIView):
+    """
+    Delta sync endpoint for offline clients.
+
+    ``?since=<token>`` returns the monasteries, panoramas, audio POIs,
+    events and archive items changed or deleted since the token was
+    issued; omit it for a full sync. Follow ``next`` while ``has_more``
+    is true, then keep the final ``next`` as the token for the next sync.
+    Rows changed shortly before a sync ended are sent again by the next
+    one, so apply changes and deletions as upserts.
+    """
+
+    def get(self, request):
+        limit = parse_page_size(
+            request.GET.get('limit'),
+            default=DEFAULT_SYNC_PAGE_SIZE,
+            maximum=MAX_SYNC_PAGE_SIZE,
+        )
+        try:
+            payload = build_delta(request.GET.get('since'), limit=limit)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(payload)
+
+
+# Suggestions change rarely; let browsers reuse them between keystrokes
+SUGGEST_MAX_AGE = 60
+
+
+class SuggestAPIView(generics.GenericAPIView):
+    """
+    Autocomplete for the search box.
+
+    ``?q=`` is matched as a prefix of any word in monastery names,
+    districts, event titles, archive titles and catalog numbers; the most
+    viewed matches come first. ``?limit=`` caps the number of suggestions.
+    """
+
+    def get(self, request):
+        limit = parse_page_size(
+            request.GET.get('limit'),
+            default=DEFAULT_SUGGESTIONS,
+            maximum=MAX_SUGGESTIONS,
+        )
+        query = request.GET.get('q', '')
+        response = Response({
+            'query': query,
+            'results': suggest(query, limit),
+        })
+        patch_cache_control(response, public=True, max_age=SUGGEST_MAX_AGE)
+        return response
+
+
+# Spatial lookups: querysets and output fields per result kind
+SPATIAL_KINDS = {
+    'monasteries': (
+        lambda: Monastery.objects.filter(is_active=True),
+        MONASTERY_FIELDS,
+    ),
+    'audio_pois': (
+        lambda: AudioPOI.objects.filter(is_active=True, monastery__is_active=True),
+        AUDIO_POI_FIELDS,
+    ),
+}
+
+MAX_NEARBY_RADIUS_KM = 100.0
+
+
+def _float_param(request, name, minimum, maximum, default=None):
+    """Parse a required (or defaulted) float query parameter within bounds."""
+    raw = request.GET.get(name)
+    if raw in (None, ''):
+        if default is None:
+            raise ValueError(f"'{name}' is required")
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a number")
+    if not minimum <= value <= maximum:
+        raise ValueError(f"'{name}' must be between {minimum} and {maximum}")
+    return value
+
+
+def _spatial_kinds(request):
+    requested = request.GET.get('kind')
+    if requested and requested not in SPATIAL_KINDS:
+        raise ValueError(f"'kind' must be one of: {', '.join(SPATIAL_KINDS)}")
+    return [requested] if requested else list(SPATIAL_KINDS)
+
+
+def _spatial_queryset(kind, fields):
+    get_queryset, fieldset = SPATIAL_KINDS[kind]
+    return fieldset.project(get_queryset(), fields, extra=('latitude', 'longitude'))
+
+
+class NearbyAPIView(generics.GenericAPIView):
+    """
+    API endpoint returning monasteries and audio POIs near a point.
+
+    ``?lat=&lng=`` are required; ``radius`` is in kilometres (default 5).
+    Candidates are narrowed by geohash cell in the database and ranked by
+    great-circle distance.
+    """
+
+    def get(self, request):
+        try:
+            lat = _float_param(request, 'lat', -90, 90)
+            lng = _float_param(request, 'lng', -180, 180)
+            radius = _float_param(request, 'radius', 0, MAX_NEARBY_RADIUS_KM, default=5.0)
+            kinds = _spatial_kinds(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = parse_page_size(request.GET.get('limit'))
+        results = {}
+        for kind in kinds:
+            fieldset = SPATIAL_KINDS[kind][1]
+            fields = fieldset.profiles['card']
+            ranked = nearest(_spatial_queryset(kind, fields), lat, lng, radius, limit=limit)
+            results[kind] = [
+                dict(fieldset.serialize(obj, fields), distance_km=round(distance, 3))
+                for obj, distance in ranked
+            ]
+
+        return Response({
+            'center': {'latitude': lat, 'longitude': lng},
+            'radius_km': radius,
+            'results': results,
+        })
+
+
+class BoundingBoxAPIView(generics.GenericAPIView):
+    """
+    API endpoint returning monasteries and audio POIs inside a bounding box.
+
+    Requires ``?south=&west=&north=&east=`` in degrees, as sent by a map
+    viewport.
+    """
+
+    def get(self, request):
+        try:
+            south = _float_param(request, 'south', -90, 90)
+            west = _float_param(request, 'west', -180, 180)
+            north = _float_param(request, 'north', -90, 90)
+            east = _float_param(request, 'east', -180, 180)
+            kinds = _spatial_kinds(request)
+            if south > north or west > east:
+                raise ValueError('Bounding box must satisfy south <= north and west <= east')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = parse_page_size(request.GET.get('limit'))
+        results = {}
+        for kind in kinds:
+            fieldset = SPATIAL_KINDS[kind][1]
+            fields = fieldset.profiles['card']
+            rows = within_bbox(_spatial_queryset(kind, fields), south, west, north, east)
+            results[kind] = [fieldset.serialize(obj, fields) for obj in rows.order_by('pk')[:limit]]
+
+        return Response({
+            'bbox': {'south': south, 'west': west, 'north': north, 'east': east},
+            'results': results,
         })
 
 
+@require_GET
+def export_catalog(request, entity, fmt):
+    """
+    Stream every public row of ``entity`` as NDJSON or CSV.
+
+    The body is gzipped on the fly when the client accepts it, without
+    ever buffering the whole export. ``?gzip=1`` instead downloads a
+    ``.gz`` file (``application/gzip``), for clients that did not
+    negotiate a content encoding.
+    """
+    if entity not in EXPORTS or fmt not in CONTENT_TYPES:
+        raise Http404('Unknown export')
+
+    as_file = request.GET.get('gzip') == '1'
+    encoded = not as_file and accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+    response = StreamingHttpResponse(
+        export_stream(entity, fmt, gzip=as_file or encoded),
+        content_type='application/gzip' if as_file else CONTENT_TYPES[fmt],
+    )
+    filename = f'{entity}.{fmt}.gz' if as_file else f'{entity}.{fmt}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if encoded:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
 @api_view(['GET'])
 def api_overview(request):
     """
@@ -289,8 +527,15 @@ def api_overview(request):
         'overview': '/api/',
         'monasteries': '/api/monasteries/',
         'monastery_detail': '/api/monasteries/<slug>/',
+        'tour_bundle': '/api/tours/<slug>/bundle/',
         'events': '/api/events/',
         'archives': '/api/archives/<monastery_slug>/',
+        'archive_facets': '/api/archives/facets/',
+        'sync': '/api/sync/?since=<token>',
+        'suggest': '/api/suggest/?q=<prefix>',
+        'export': '/api/export/<monasteries|events|archive_items>.<ndjson|csv>',
+        'nearby': '/api/nearby/?lat=<lat>&lng=<lng>&radius=<km>',
+        'bbox': '/api/bbox/?south=<lat>&west=<lng>&north=<lat>&east=<lng>',
     }
 
     return Response({
@@ -11,3 +11,8 @@ class ArchivesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'archives'
     verbose_name = 'Digital Archives'
+
+    def ready(self):
+        """Import signal handlers when the app is ready."""
+        from . import signals
+        signals.connect()
@@ -0,0 +1,129 @@
+"""
+Faceted counts for archive browsing.
+
+A filter sidebar needs, for every facet (item type, material, condition,
+language, script, monastery), how many items each value would match
+under the other active filters. Rather than one aggregate query per
+facet, :func:`facet_counts` groups the items by all facet columns at once
+and tallies every facet from that single result in Python.
+
+Counts are disjunctive: selecting ``material=paper`` narrows the other
+facets but still lists the other materials with the count each would
+have instead, so a sidebar can offer them.
+"""
+
+from django.db.models import Count
+
+from .models import ArchiveItem
+
+
+class Facet:
+    """
+    A filterable column of ``ArchiveItem``.
+
+    ``param`` is the query parameter that selects values (``field`` by
+    default); ``labels`` maps values to display names, or ``label_field``
+    names a column that holds the display name.
+    """
+
+    def __init__(self, name, field, param=None, labels=None, label_field=None):
+        self.name = name
+        self.field = field
+        self.param = param or name
+        self.labels = labels or {}
+        self.label_field = label_field
+
+    def label(self, value, row_label=None):
+        return row_label or self.labels.get(value, value)
+
+
+FACETS = [
+    Facet('item_type', 'item_type', param='type', labels=dict(ArchiveItem.ITEM_TYPES)),
+    Facet('material', 'material', labels=dict(ArchiveItem.MATERIAL_CHOICES)),
+    Facet('condition', 'condition', labels=dict(ArchiveItem.CONDITION_CHOICES)),
+    Facet('language', 'language'),
+    Facet('script', 'script'),
+    Facet('monastery', 'monastery__slug', label_field='monastery__name'),
+]
+
+FACETS_BY_NAME = {facet.name: facet for facet in FACETS}
+
+
+def selected_filters(params, facets=FACETS):
+    """Return ``{facet name: set of values}`` selected in the query ``params``."""
+    selected = {}
+    for facet in facets:
+        values = {value for value in params.getlist(facet.param) if value}
+        if values:
+            selected[facet.name] = values
+    return selected
+
+
+def apply_filters(queryset, selected):
+    """Narrow ``queryset`` to items matching every selected facet."""
+    for name, values in selected.items():
+        queryset = queryset.filter(**{f'{FACETS_BY_NAME[name].field}__in': values})
+    return queryset
+
+
+def facet_counts(queryset, selected=None, facets=FACETS):
+    """
+    Count ``queryset`` by every facet under the ``selected`` filters, in one query.
+
+    ``queryset`` must not have the facet filters applied yet. Returns
+    ``{'total': n, 'facets': {name: [{'value', 'label', 'count', 'selected'}]}}``
+    with the values of each facet ordered by count, and ``total`` the number
+    of items matching every filter.
+    """
+    selected = selected or {}
+    columns = [facet.field for facet in facets]
+    label_columns = [facet.label_field for facet in facets if facet.label_field]
+    rows = queryset.order_by().values_list(*columns, *label_columns).annotate(count=Count('pk'))
+
+    total = 0
+    counts = {facet.name: {} for facet in facets}
+    labels = {}
+    for row in rows:
+        values = row[:len(facets)]
+        row_labels = dict(zip(label_columns, row[len(facets):-1]))
+        count = row[-1]
+
+        failing = [
+            facet for facet, value in zip(facets, values)
+            if facet.name in selected and value not in selected[facet.name]
+        ]
+        if not failing:
+            total += count
+            counted = list(zip(facets, values))
+        elif len(failing) == 1:
+            # Matches every filter but this facet's own
+            facet = failing[0]
+            counted = [(facet, values[facets.index(facet)])]
+        else:
+            continue
+
+        for facet, value in counted:
+            if value in ('', None):
+                continue
+            counts[facet.name][value] = counts[facet.name].get(value, 0) + count
+            if facet.label_field:
+                labels[facet.name, value] = row_labels[facet.label_field]
+
+    return {
+        'total': total,
+        'facets': {
+            facet.name: sorted(
+                (
+                    {
+                        'value': value,
+                        'label': facet.label(value, labels.get((facet.name, value))),
+                        'count': count,
+                        'selected': value in selected.get(facet.name, ()),
+                    }
+                    for value, count in counts[facet.name].items()
+                ),
+                key=lambda entry: (-entry['count'], str(entry['label'])),
+            )
+            for facet in facets
+        },
+    }
@@ -0,0 +1,550 @@
+"""
+IIIF Image API 3.0 and Presentation API 3.0 for archive scans.
+
+Partner libraries read the collection in standard viewers (Mirador,
+Universal Viewer), which speak IIIF:
+
+* the Image API serves any region of a scan at any size, mirrored,
+  rotated by multiples of 90 degrees, in colour, grey or bitonal, as JPEG,
+  PNG or WebP (compliance level 2). Images are identified by catalog
+  number; only public items whose scan has been opened by the tiler (see
+  ``archives.tiles``, which records its dimensions and hash) are served;
+* every derivative is rendered once and kept in an on-disk cache under
+  ``IIIF_CACHE_DIR``, keyed by the scan's hash and the canonical request,
+  and the least recently used files are evicted when the cache grows past
+  ``IIIF_CACHE_MAX_BYTES``;
+* a Presentation manifest per item describes the scan (with its image
+  service), the ``additional_images`` and the item's metadata, with the
+  monastery as provider; each monastery has a collection of manifests.
+"""
+
+import hashlib
+import math
+import mimetypes
+import os
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import F
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from core.cache import ModelDerived
+
+from .models import ArchiveItem, ScanTiles
+from .tiles import TILE_SIZE
+
+IMAGE_CONTEXT = 'http://iiif.io/api/image/3/context.json'
+PRESENTATION_CONTEXT = 'http://iiif.io/api/presentation/3/context.json'
+IMAGE_PROFILE = 'level2'
+IMAGE_PROFILE_URL = 'http://iiif.io/api/image/3/level2.json'
+INFO_CONTENT_TYPE = f'application/ld+json;profile="{IMAGE_CONTEXT}"'
+MANIFEST_CONTENT_TYPE = f'application/ld+json;profile="{PRESENTATION_CONTEXT}"'
+
+QUALITIES = ('default', 'color', 'gray', 'bitonal')
+FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+}
+EXTRA_FEATURES = ['mirroring', 'sizeUpscaling']
+JPEG_QUALITY = 85
+
+# Item metadata shown in manifests, as (field, label)
+METADATA_FIELDS = [
+    ('catalog_number', 'Catalog number'),
+    ('item_type', 'Type'),
+    ('material', 'Material'),
+    ('condition', 'Condition'),
+    ('estimated_age', 'Estimated age'),
+    ('historical_period', 'Historical period'),
+    ('dimensions', 'Dimensions'),
+    ('language', 'Language'),
+    ('script', 'Script'),
+    ('scan_resolution', 'Scan resolution'),
+]
+
+
+class IIIFError(ValueError):
+    """Raised for an image request the server cannot satisfy (400)."""
+
+
+class ScanImage:
+    """A scan available through the Image API."""
+
+    __slots__ = ('identifier', 'name', 'source_hash', 'width', 'height')
+
+    def __init__(self, identifier, name, source_hash, width, height):
+        self.identifier = identifier
+        self.name = name
+        self.source_hash = source_hash
+        self.width = width
+        self.height = height
+
+
+def _load_images():
+    rows = ScanTiles.objects.filter(
+        status='ready',
+        item__is_public=True,
+        source=F('item__scan'),
+    ).values_list('item__catalog_number', 'source', 'source_hash', 'width', 'height')
+    return {row[0]: ScanImage(*row) for row in rows}
+
+
+# Resolved on every image request, so kept in memory and rebuilt when an
+# item or pyramid is saved (counter writes do not bump generations)
+_images = ModelDerived([ScanTiles, ArchiveItem], _load_images)
+
+
+def get_image(identifier):
+    """Return the :class:`ScanImage` for ``identifier``, or ``None``."""
+    return _images.get().get(identifier)
+
+
+# Request parsing
+
+def _numbers(text, cast):
+    try:
+        return [cast(part) for part in text.split(',')]
+    except ValueError:
+        raise IIIFError(f'Invalid numbers: {text}')
+
+
+def parse_region(region, width, height):
+    """Return the ``(x, y, w, h)`` pixel region, clipped to the image."""
+    if region == 'full':
+        return 0, 0, width, height
+    if region == 'square':
+        side = min(width, height)
+        return (width - side) // 2, (height - side) // 2, side, side
+
+    if region.startswith('pct:'):
+        values = _numbers(region[4:], float)
+        if len(values) != 4:
+            raise IIIFError(f'Invalid region: {region}')
+        x, y, w, h = (
+            round(values[0] * width / 100), round(values[1] * height / 100),
+            round(values[2] * width / 100), round(values[3] * height / 100),
+        )
+    else:
+        values = _numbers(region, int)
+        if len(values) != 4:
+            raise IIIFError(f'Invalid region: {region}')
+        x, y, w, h = values
+
+    if x < 0 or y < 0 or w <= 0 or h <= 0 or x >= width or y >= height:
+        raise IIIFError(f'Region outside the image: {region}')
+    return x, y, min(w, width - x), min(h, height - y)
+
+
+def _max_size(width, height, upscale):
+    """Largest size allowed for a region of ``width`` x ``height``."""
+    limit = settings.IIIF_MAX_SIZE
+    scale = min(limit / width, limit / height)
+    if not upscale:
+        scale = min(scale, 1)
+    return max(1, math.floor(width * scale)), max(1, math.floor(height * scale))
+
+
+def parse_size(size, width, height):
+    """Return the ``(w, h)`` output size for a region of ``width`` x ``height``."""
+    upscale = size.startswith('^')
+    spec = size[1:] if upscale else size
+
+    if spec == 'max':
+        return _max_size(width, height, upscale)
+
+    if spec.startswith('pct:'):
+        try:
+            pct = float(spec[4:])
+        except ValueError:
+            raise IIIFError(f'Invalid size: {size}')
+        if pct <= 0:
+            raise IIIFError(f'Invalid size: {size}')
+        w, h = round(width * pct / 100), round(height * pct / 100)
+    else:
+        confined = spec.startswith('!')
+        parts = (spec[1:] if confined else spec).split(',')
+        if len(parts) != 2 or (confined and not all(parts)):
+            raise IIIFError(f'Invalid size: {size}')
+        w, h = (_numbers(part, int)[0] if part else None for part in parts)
+        if w is None and h is None:
+            raise IIIFError(f'Invalid size: {size}')
+        if confined:
+            scale = min(w / width, h / height)
+            if not upscale:
+                # As large as fits, but never larger than the region
+                scale = min(scale, 1)
+            w, h = round(width * scale), round(height * scale)
+        elif h is None:
+            h = round(height * w / width)
+        elif w is None:
+            w = round(width * h / height)
+
+    w, h = max(w, 1), max(h, 1)
+    if not upscale and (w > width or h > height):
+        raise IIIFError(f'Size larger than the region needs "^": {size}')
+    if w > settings.IIIF_MAX_SIZE or h > settings.IIIF_MAX_SIZE:
+        raise IIIFError(f'Size exceeds {settings.IIIF_MAX_SIZE} pixels: {size}')
+    return w, h
+
+
+def parse_rotation(rotation):
+    """Return ``(mirror, degrees)``; only multiples of 90 are supported."""
+    mirror = rotation.startswith('!')
+    try:
+        degrees = float(rotation[1:] if mirror else rotation)
+    except ValueError:
+        raise IIIFError(f'Invalid rotation: {rotation}')
+    if degrees % 90 or not 0 <= degrees < 360:
+        raise IIIFError(f'Unsupported rotation: {rotation}')
+    return mirror, int(degrees)
+
+
+class ImageRequest:
+    """A parsed, validated Image API request."""
+
+    def __init__(self, image, region, size, rotation, quality, format):
+        if quality not in QUALITIES:
+            raise IIIFError(f'Unsupported quality: {quality}')
+        if format not in FORMATS:
+            raise IIIFError(f'Unsupported format: {format}')
+        self.image = image
+        self.region = parse_region(region, image.width, image.height)
+        self.size = parse_size(size, *self.region[2:])
+        self.mirror, self.rotation = parse_rotation(rotation)
+        self.quality = 'color' if quality == 'default' else quality
+        self.format = format
+
+    def canonical(self):
+        """The canonical ``region/size/rotation/quality.format`` path."""
+        if self.region == (0, 0, self.image.width, self.image.height):
+            region = 'full'
+        else:
+            region = ','.join(map(str, self.region))
+        w, h = self.size
+        size = 'max' if self.size == _max_size(*self.region[2:], False) else f'{w},{h}'
+        rotation = f"{'!' if self.mirror else ''}{self.rotation}"
+        quality = 'default' if self.quality == 'color' else self.quality
+        return f'{region}/{size}/{rotation}/{quality}.{self.format}'
+
+    @property
+    def content_type(self):
+        return FORMATS[self.format][1]
+
+
+def render(storage, request):
+    """Render ``request`` from the scan in ``storage``; returns the encoded bytes."""
+    x, y, w, h = request.region
+    out_w, out_h = request.size
+    with storage.open(request.image.name, 'rb') as f, Image.open(f) as image:
+        full_w, full_h = image.size
+        scale = min(w / out_w, h / out_h)
+        if scale >= 2:
+            # Let JPEG decode at 1/2, 1/4 or 1/8 size when that is still enough
+            image.draft('RGB', (math.ceil(full_w / scale), math.ceil(full_h / scale)))
+        fx, fy = image.width / full_w, image.height / full_h
+        mode = 'L' if request.quality in ('gray', 'bitonal') else 'RGB'
+        result = image.convert(mode).resize(
+            (out_w, out_h),
+            Image.Resampling.LANCZOS,
+            box=(x * fx, y * fy, (x + w) * fx, (y + h) * fy),
+        )
+
+    if request.mirror:
+        result = ImageOps.mirror(result)
+    if request.rotation:
+        # IIIF rotates clockwise, Pillow counter-clockwise
+        result = result.rotate(-request.rotation, expand=True)
+    if request.quality == 'bitonal':
+        result = result.convert('1')
+        if request.format == 'jpg':
+            result = result.convert('L')
+
+    buffer = BytesIO()
+    pil_format = FORMATS[request.format][0]
+    options = {'quality': JPEG_QUALITY} if pil_format in ('JPEG', 'WEBP') else {}
+    result.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+# Derivative cache
+
+class DerivativeCache:
+    """
+    Rendered derivatives on disk, evicted least recently used first.
+
+    Recency is the file's modification time, bumped on every hit (atime
+    is unreliable under ``noatime``). Each process tracks an estimate of
+    the cache size and rescans the directory, deleting the oldest files
+    down to 90% of ``max_bytes``, whenever its estimate passes the limit.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.storage = FileSystemStorage(location=directory)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def name(request):
+        key = hashlib.sha256(f'{request.image.source_hash}/{request.canonical()}'.encode()).hexdigest()
+        return f'{key[:2]}/{key}.{request.format}'
+
+    def get(self, request):
+        """Return the cached file's name, or ``None``."""
+        name = self.name(request)
+        try:
+            os.utime(self.storage.path(name))
+        except FileNotFoundError:
+            return None
+        return name
+
+    def put(self, request, data):
+        """Store rendered ``data`` and return its name."""
+        name = self.name(request)
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a partial file
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self.usage()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._size = self.evict()
+        return name
+
+    def _files(self):
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def usage(self):
+        return sum(size for _, size, _ in self._files())
+
+    def evict(self):
+        """Delete the least recently used files; returns the remaining size."""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    directory = settings.IIIF_CACHE_DIR
+    if _cache is None or _cache.directory != directory or _cache.max_bytes != settings.IIIF_CACHE_MAX_BYTES:
+        _cache = DerivativeCache(directory, settings.IIIF_CACHE_MAX_BYTES)
+    return _cache
+
+
+def derivative(request):
+    """Return ``(storage, name)`` of the rendered ``request``, rendering it once."""
+    cache = get_cache()
+    name = cache.get(request)
+    if name is None:
+        name = cache.put(request, render(default_storage, request))
+    return cache.storage, name
+
+
+# Descriptions
+
+def scale_factors(width, height):
+    factors = [1]
+    while max(width, height) / factors[-1] > TILE_SIZE:
+        factors.append(factors[-1] * 2)
+    return factors
+
+
+def image_info(image, base_url):
+    """The ``info.json`` document of ``image``."""
+    max_w, max_h = _max_size(image.width, image.height, False)
+    return {
+        '@context': IMAGE_CONTEXT,
+        'id': base_url,
+        'type': 'ImageService3',
+        'protocol': 'http://iiif.io/api/image',
+        'profile': IMAGE_PROFILE,
+        'width': image.width,
+        'height': image.height,
+        'maxWidth': settings.IIIF_MAX_SIZE,
+        'maxHeight': settings.IIIF_MAX_SIZE,
+        'sizes': [{'width': max_w, 'height': max_h}],
+        'tiles': [{'width': TILE_SIZE, 'scaleFactors': scale_factors(image.width, image.height)}],
+        'extraFormats': ['webp'],
+        'extraQualities': ['color', 'gray', 'bitonal'],
+        'extraFeatures': EXTRA_FEATURES,
+    }
+
+
+def _text(value, language='en'):
+    return {language: [str(value)]}
+
+
+def _label_value(label, value):
+    return {'label': _text(label), 'value': _text(value, 'none')}
+
+
+def _display(item, field):
+    """A field's choice label, or its value."""
+    get_display = getattr(item, f'get_{field}_display', None)
+    return get_display() if get_display else getattr(item, field)
+
+
+def _image_body(url, width, height):
+    return {
+        'id': url,
+        'type': 'Image',
+        'format': mimetypes.guess_type(url)[0] or 'image/jpeg',
+        'width': width,
+        'height': height,
+    }
+
+
+def _image_size(url):
+    """``(width, height)`` of a local media image named by ``url``, or ``None``."""
+    if '://' in url:
+        return None
+    name = url[len(settings.MEDIA_URL):] if url.startswith(settings.MEDIA_URL) else url.lstrip('/')
+    try:
+        with default_storage.open(name, 'rb') as f, Image.open(f) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def _canvas(canvas_id, label, width, height, body):
+    return {
+        'id': canvas_id,
+        'type': 'Canvas',
+        'label': _text(label),
+        'width': width,
+        'height': height,
+        'items': [{
+            'id': f'{canvas_id}/page',
+            'type': 'AnnotationPage',
+            'items': [{
+                'id': f'{canvas_id}/page/image',
+                'type': 'Annotation',
+                'motivation': 'painting',
+                'body': body,
+                'target': canvas_id,
+            }],
+        }],
+    }
+
+
+def manifest(item, absolute):
+    """
+    The Presentation manifest of ``item``.
+
+    ``absolute`` turns a path into an absolute URL. Remote
+    ``additional_images`` whose size cannot be read locally are left out.
+    """
+    manifest_id = absolute(reverse('archives:iiif_manifest', args=[item.catalog_number]))
+    canvases = []
+
+    image = get_image(item.catalog_number)
+    if image is not None:
+        service = absolute(reverse('archives:iiif_image', args=[item.catalog_number]))
+        w, h = _max_size(image.width, image.height, False)
+        canvases.append(('Scan', image.width, image.height, {
+            'id': f'{service}/full/max/0/default.jpg',
+            'type': 'Image',
+            'format': 'image/jpeg',
+            'width': w,
+            'height': h,
+            'service': [{'id': service, 'type': 'ImageService3', 'profile': IMAGE_PROFILE}],
+        }))
+    elif item.image:
+        size = _image_size(item.image.name)
+        if size:
+            canvases.append((item.image_alt or item.title, *size, _image_body(absolute(item.image.url), *size)))
+
+    for number, url in enumerate(item.additional_images or [], start=1):
+        size = _image_size(url) if isinstance(url, str) else None
+        if size:
+            canvases.append((f'Image {number}', *size, _image_body(absolute(url), *size)))
+
+    monastery = item.monastery
+    monastery_url = absolute(monastery.get_absolute_url())
+    metadata = [
+        _label_value(label, _display(item, field))
+        for field, label in METADATA_FIELDS if getattr(item, field)
+    ]
+    metadata.append(_label_value('Monastery', monastery.name))
+
+    return {
+        '@context': PRESENTATION_CONTEXT,
+        'id': manifest_id,
+        'type': 'Manifest',
+        'label': _text(item.title),
+        'summary': _text(item.description),
+        'metadata': metadata,
+        'requiredStatement': _label_value('Held by', f'{monastery.name}, {monastery.district}'),
+        'homepage': [{
+            'id': absolute(item.get_absolute_url()),
+            'type': 'Text',
+            'label': _text(item.title),
+            'format': 'text/html',
+        }],
+        'provider': [{
+            'id': monastery_url,
+            'type': 'Agent',
+            'label': _text(monastery.name),
+            'homepage': [{
+                'id': monastery_url,
+                'type': 'Text',
+                'label': _text(monastery.name),
+                'format': 'text/html',
+            }],
+        }],
+        'items': [
+            _canvas(f'{manifest_id}/canvas/{index}', label, width, height, body)
+            for index, (label, width, height, body) in enumerate(canvases)
+        ],
+    }
+
+
+def collection(monastery, items, absolute):
+    """The Presentation collection of a monastery's item manifests."""
+    return {
+        '@context': PRESENTATION_CONTEXT,
+        'id': absolute(reverse('archives:iiif_collection', args=[monastery.slug])),
+        'type': 'Collection',
+        'label': _text(monastery.name),
+        'items': [
+            {
+                'id': absolute(reverse('archives:iiif_manifest', args=[item.catalog_number])),
+                'type': 'Manifest',
+                'label': _text(item.title),
+            }
+            for item in items
+        ],
+    }
@@ -0,0 +1,98 @@
+"""
+IIIF Image and Presentation API views for archive scans (see ``archives.iiif``).
+
+Every response allows cross-origin use, since IIIF viewers usually run on
+another site.
+"""
+
+import json
+
+from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from core.cache import cache_response
+from core.models import Monastery
+from core.sendfile import sendfile
+
+from . import iiif
+from .models import ArchiveItem, ScanTiles
+
+
+def _cors(response):
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def _json_ld(data, content_type):
+    return _cors(HttpResponse(json.dumps(data), content_type=content_type))
+
+
+def _get_image(identifier):
+    image = iiif.get_image(identifier)
+    if image is None:
+        raise Http404('Image not found')
+    return image
+
+
+def image_base(request, identifier):
+    """Redirect the image's base URI to its ``info.json``."""
+    _get_image(identifier)
+    response = HttpResponseRedirect(reverse('archives:iiif_info', args=[identifier]))
+    response.status_code = 303
+    return _cors(response)
+
+
+def image_info(request, identifier):
+    """The Image API ``info.json`` of a scan."""
+    image = _get_image(identifier)
+    base_url = request.build_absolute_uri(reverse('archives:iiif_image', args=[identifier]))
+    content_type = iiif.INFO_CONTENT_TYPE
+    if 'application/ld+json' not in request.META.get('HTTP_ACCEPT', ''):
+        content_type = 'application/json'
+    response = _json_ld(iiif.image_info(image, base_url), content_type)
+    response['Link'] = f'<{iiif.IMAGE_PROFILE_URL}>;rel="profile"'
+    return response
+
+
+def image_request(request, identifier, region, size, rotation, quality, format):
+    """
+    Serve ``{region}/{size}/{rotation}/{quality}.{format}`` of a scan.
+
+    Each distinct (canonical) request is rendered once and then served
+    from the derivative cache.
+    """
+    image = _get_image(identifier)
+    try:
+        iiif_request = iiif.ImageRequest(image, region, size, rotation, quality, format)
+    except iiif.IIIFError as e:
+        return _cors(HttpResponse(str(e), status=400, content_type='text/plain'))
+
+    storage, name = iiif.derivative(iiif_request)
+    response = sendfile(request, storage, name, content_type=iiif_request.content_type)
+    base_url = request.build_absolute_uri(reverse('archives:iiif_image', args=[identifier]))
+    response['Link'] = (
+        f'<{base_url}/{iiif_request.canonical()}>;rel="canonical", '
+        f'<{iiif.IMAGE_PROFILE_URL}>;rel="profile"'
+    )
+    return _cors(response)
+
+
+@cache_response(ArchiveItem, Monastery, ScanTiles)
+def manifest(request, identifier):
+    """The Presentation manifest of a public archive item."""
+    item = get_object_or_404(
+        ArchiveItem.objects.select_related('monastery'),
+        catalog_number=identifier,
+        is_public=True,
+        monastery__is_active=True,
+    )
+    return _json_ld(iiif.manifest(item, request.build_absolute_uri), iiif.MANIFEST_CONTENT_TYPE)
+
+
+@cache_response(ArchiveItem, Monastery)
+def collection(request, monastery_slug):
+    """A collection of the manifests of a monastery's public items."""
+    monastery = get_object_or_404(Monastery, slug=monastery_slug, is_active=True)
+    items = monastery.archive_items.filter(is_public=True).only('catalog_number', 'title').order_by('catalog_number')
+    return _json_ld(iiif.collection(monastery, items, request.build_absolute_uri), iiif.MANIFEST_CONTENT_TYPE)
@@ -0,0 +1,263 @@
+"""
+Bulk ingest of digitized archive scans (``manage.py ingest_archives``).
+
+A digitization batch is a directory of scans, optionally described by a
+``manifest.csv`` with a ``file`` column (relative to the manifest) and
+any of :data:`MANIFEST_FIELDS` (``monastery`` is a slug). Without a
+manifest every scan in the directory becomes an item named after its file.
+
+Scans are processed in batches:
+
+1. worker processes hash each file and read its pixel size and DPI
+   (:func:`inspect_scan`), without decoding the image;
+2. the scans are stored (a scan whose bytes are already stored only gets
+   a reference, see ``core.storage``) and the batch's rows are inserted
+   with one ``bulk_create`` in one transaction;
+3. responsive derivatives are encoded in the same worker processes.
+
+Items are keyed by catalog number and those already in the database are
+skipped, so an interrupted ingest is resumed by running it again. A
+batch that fails is rolled back as a whole, and the scans it wrote to
+storage are removed again.
+
+Raster scans double as the item's main image (sharing the stored file).
+``bulk_create`` sends no signals: the command bumps the archive item
+cache generation per batch and (with ``SNAPSHOT_AUTO_REBUILD``) rebuilds
+the archives snapshot at the end.
+"""
+
+import csv
+import hashlib
+import os
+from dataclasses import dataclass, field
+
+from django.core.files import File
+from django.db import models, transaction
+from PIL import Image, UnidentifiedImageError
+
+from core.cache import bump_generation
+from core.images import generate_derivatives
+from core.models import Monastery
+from core.storage import content_name
+
+from .models import ArchiveItem
+
+MANIFEST_NAME = 'manifest.csv'
+
+SCAN_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp', '.jp2', '.pdf'}
+
+# Manifest columns copied onto the item (converted by the model field)
+MANIFEST_FIELDS = [
+    'catalog_number', 'title', 'description', 'item_type', 'estimated_age',
+    'historical_period', 'cultural_significance', 'material', 'dimensions',
+    'weight', 'condition', 'image_alt', 'acquisition_date', 'acquisition_method',
+    'language', 'script', 'is_public', 'requires_special_handling', 'preservation_notes',
+]
+
+BOOLEANS = {'1': True, 'true': True, 'yes': True, 'y': True, '0': False, 'false': False, 'no': False, 'n': False}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class IngestError(ValueError):
+    """A manifest row that cannot be ingested."""
+
+
+@dataclass
+class ScanRow:
+    """One scan to ingest: its file and the item fields from the manifest."""
+
+    path: str
+    line: int
+    values: dict = field(default_factory=dict)
+
+    @property
+    def catalog_number(self):
+        return self.values['catalog_number']
+
+
+def inspect_scan(path):
+    """
+    Hash a scan and read its size and DPI (runs in a worker process).
+
+    Returns ``(sha256, width, height, dpi)``; the last three are ``None``
+    for files Pillow cannot open, such as PDFs. Archival scans are often
+    past Pillow's decompression bomb limit; only the header is read here,
+    so the limit is lifted while it is.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    width = height = dpi = None
+    limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, None
+    try:
+        # Opening reads the header only; the pixels are never decoded
+        with Image.open(path) as image:
+            width, height = image.size
+            dpi = image.info.get('dpi')
+    except (UnidentifiedImageError, OSError):
+        pass
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+    if dpi:
+        dpi = tuple(round(float(value)) for value in dpi)
+    return digest.hexdigest(), width, height, dpi
+
+
+def scan_resolution(width, height, dpi):
+    """Describe a scan's size for ``ArchiveItem.scan_resolution``."""
+    parts = []
+    if width and height:
+        parts.append(f'{width} × {height} px')
+    if dpi and any(dpi):
+        x, y = dpi
+        parts.append(f'{x} DPI' if x == y else f'{x} × {y} DPI')
+    return ', '.join(parts)
+
+
+def read_rows(source):
+    """
+    Return the :class:`ScanRow` list of a directory or ``manifest.csv``.
+
+    Raises ``IngestError`` for a manifest without a ``file`` column.
+    """
+    if os.path.isdir(source) and os.path.isfile(os.path.join(source, MANIFEST_NAME)):
+        source = os.path.join(source, MANIFEST_NAME)
+
+    if os.path.isdir(source):
+        rows = []
+        for directory, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() in SCAN_EXTENSIONS:
+                    rows.append(ScanRow(path=os.path.join(directory, filename), line=len(rows) + 1))
+        return rows
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        if 'file' not in (reader.fieldnames or []):
+            raise IngestError(f'{source} has no "file" column')
+        return [
+            ScanRow(
+                path=os.path.join(base, row['file'].strip()),
+                line=reader.line_num,
+                values={
+                    name: value.strip() for name, value in row.items()
+                    if name in MANIFEST_FIELDS + ['monastery'] and value and value.strip()
+                },
+            )
+            for row in reader
+        ]
+
+
+def prepare(row, monasteries, default_monastery=None, default_item_type='document'):
+    """
+    Fill in defaults and convert ``row.values`` to model values in place.
+
+    ``monasteries`` maps slugs to ids. Raises ``IngestError`` for a
+    missing file, unknown monastery or invalid value.
+    """
+    if not os.path.isfile(row.path):
+        raise IngestError(f'line {row.line}: {row.path} does not exist')
+
+    values = row.values
+    stem = os.path.splitext(os.path.basename(row.path))[0]
+    slug = values.pop('monastery', None) or default_monastery
+    if slug not in monasteries:
+        raise IngestError(f'line {row.line}: unknown monastery {slug!r}')
+    values['monastery_id'] = monasteries[slug]
+    values.setdefault('catalog_number', stem)
+    values.setdefault('title', stem.replace('_', ' ').replace('-', ' '))
+    values.setdefault('item_type', default_item_type)
+    values.setdefault('image_alt', values['title'][:200])
+
+    for name in MANIFEST_FIELDS:
+        if name not in values:
+            continue
+        model_field = ArchiveItem._meta.get_field(name)
+        value = values[name]
+        if isinstance(model_field, models.BooleanField):
+            value = BOOLEANS.get(value.lower(), value)
+        try:
+            values[name] = model_field.clean(value, None)
+        except Exception as e:
+            message = '; '.join(getattr(e, 'messages', [str(e)]))
+            raise IngestError(f'line {row.line}: {name}: {message}')
+    return row
+
+
+def store_scan(storage, path, digest):
+    """
+    Store a scan, or reference the stored copy of the same bytes.
+
+    Returns ``(name, saved)``; ``saved`` tells whether the file was written.
+    """
+    name = content_name(digest, path)
+    if storage.add_reference(name):
+        return name, False
+    with open(path, 'rb') as f:
+        return storage.save(name, File(f)), True
+
+
+def _inspect(paths, executor):
+    if executor is None:
+        return [inspect_scan(path) for path in paths]
+    return list(executor.map(inspect_scan, paths, chunksize=8))
+
+
+def ingest_batch(rows, executor=None):
+    """
+    Store and insert one batch of prepared rows.
+
+    Returns the created items; the batch is rolled back as a whole if
+    storing or inserting any of them fails, and the scans it wrote are
+    removed from storage.
+    """
+    inspected = _inspect([row.path for row in rows], executor)
+    storage = ArchiveItem._meta.get_field('scan').storage
+
+    items = []
+    saved = []
+    with transaction.atomic():
+        try:
+            for row, (digest, width, height, dpi) in zip(rows, inspected):
+                name, written = store_scan(storage, row.path, digest)
+                if written:
+                    saved.append(name)
+                image = ''
+                if width:
+                    # The image field shares the file, so it holds a reference too
+                    storage.add_reference(name)
+                    image = name
+                items.append(ArchiveItem(
+                    scan=name,
+                    image=image,
+                    scan_resolution=scan_resolution(width, height, dpi),
+                    **row.values,
+                ))
+            ArchiveItem.objects.bulk_create(items)
+        except Exception:
+            # Their StoredFile rows roll back with the batch
+            for name in saved:
+                storage.discard(name)
+            raise
+
+    bump_generation(ArchiveItem)
+    generate_derivatives([item.image for item in items if item.image], executor)
+    return items
+
+
+def monastery_ids():
+    """Map every monastery slug to its id."""
+    return dict(Monastery.objects.values_list('slug', 'id'))
+
+
+def existing_catalog_numbers(catalog_numbers):
+    """The subset of ``catalog_numbers`` already in the database."""
+    return set(
+        ArchiveItem.objects.filter(catalog_number__in=catalog_numbers)
+        .values_list('catalog_number', flat=True)
+    )
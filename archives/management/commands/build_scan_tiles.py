@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from archives.models import ArchiveItem
+from archives.tiles import build_for_item
+
+
+class Command(BaseCommand):
+    help = 'Build the deep-zoom tile pyramids of archive scans that do not have one yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'catalog_numbers',
+            nargs='*',
+            help='Items to tile (default: every item with a scan)',
+        )
+
+    def handle(self, *args, **options):
+        items = ArchiveItem.objects.exclude(scan='').order_by('pk')
+        if options['catalog_numbers']:
+            items = items.filter(catalog_number__in=options['catalog_numbers'])
+
+        counts = {'ready': 0, 'failed': 0}
+        for pk, catalog_number in items.values_list('pk', 'catalog_number'):
+            tiles = build_for_item(pk)
+            counts[tiles.status] += 1
+            if tiles.status == 'failed':
+                self.stdout.write(f'{catalog_number}: {tiles.error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. {counts['ready']} pyramids ready, {counts['failed']} scans could not be tiled."
+        ))
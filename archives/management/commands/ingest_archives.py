@@ -0,0 +1,100 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from archives.ingest import (
+    IngestError, existing_catalog_numbers, ingest_batch, monastery_ids, prepare, read_rows,
+)
+from core.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Ingest a directory of archive scans, or a manifest.csv describing them. '
+        'Items whose catalog number exists are skipped, so an interrupted run '
+        'is resumed by running it again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='Directory of scans (with an optional manifest.csv) or a manifest CSV file',
+        )
+        parser.add_argument(
+            '--monastery',
+            help='Slug of the monastery for rows without a "monastery" column',
+        )
+        parser.add_argument(
+            '--item-type',
+            default='document',
+            help='Item type for rows without an "item_type" column (default: document)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(settings.IMAGE_DERIVATIVE_WORKERS, 1),
+            help='Hashing and encoding processes; 0 works in this process '
+                 '(default: IMAGE_DERIVATIVE_WORKERS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Items inserted per transaction (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            rows = read_rows(options['source'])
+        except (OSError, IngestError) as e:
+            raise CommandError(e)
+
+        monasteries = monastery_ids()
+        if options['monastery'] and options['monastery'] not in monasteries:
+            raise CommandError(f"Unknown monastery {options['monastery']!r}")
+
+        prepared, seen, failed = [], set(), 0
+        for row in rows:
+            try:
+                prepare(row, monasteries, options['monastery'], options['item_type'])
+            except IngestError as e:
+                self.stderr.write(str(e))
+                failed += 1
+                continue
+            if row.catalog_number in seen:
+                self.stderr.write(f'line {row.line}: duplicate catalog number {row.catalog_number}')
+                failed += 1
+                continue
+            seen.add(row.catalog_number)
+            prepared.append(row)
+
+        started = time.monotonic()
+        created = skipped = 0
+        batch_size = max(options['batch_size'], 1)
+        executor = ProcessPoolExecutor(max_workers=options['workers']) if options['workers'] > 0 else None
+        try:
+            for start in range(0, len(prepared), batch_size):
+                batch = prepared[start:start + batch_size]
+                existing = existing_catalog_numbers([row.catalog_number for row in batch])
+                batch = [row for row in batch if row.catalog_number not in existing]
+                skipped += len(existing)
+                if batch:
+                    created += len(ingest_batch(batch, executor))
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{min(start + batch_size, len(prepared))}/{len(prepared)}: '
+                    f'{created} created, {skipped} already ingested '
+                    f'({created / elapsed if elapsed else 0:.1f} items/s)'
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if created and settings.SNAPSHOT_AUTO_REBUILD:
+            build_snapshots(['archives'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. {created} items created, {skipped} already ingested, {failed} rows skipped. '
+            'Run build_scan_tiles to tile the new scans.'
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0002_archiveitem_download_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archiveitem',
+            index=models.Index(fields=['updated_at', 'id'], name='archives_ar_updated_98e1b4_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0003_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanTiles',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Storage name of the scan the pyramid was built from', max_length=255)),
+                ('source_hash', models.CharField(blank=True, db_index=True, help_text="SHA-256 of the scan's bytes", max_length=64)),
+                ('width', models.PositiveIntegerField(default=0)),
+                ('height', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True, help_text='Why the pyramid could not be built')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scan_tiles', to='archives.archiveitem')),
+            ],
+            options={
+                'verbose_name_plural': 'Scan tiles',
+            },
+        ),
+    ]
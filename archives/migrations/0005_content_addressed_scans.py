@@ -0,0 +1,19 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:52
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('archives', '0004_scan_tiles'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archiveitem',
+            name='scan',
+            field=models.FileField(blank=True, help_text='High-resolution scan or document file', storage=core.storage.content_storage, upload_to='archives/scans/'),
+        ),
+    ]
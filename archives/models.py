@@ -8,7 +8,9 @@ manuscripts, artifacts, and documents.
 from django.db import models
 from django.urls import reverse
 
+from core import counters
 from core.models import Monastery
+from core.storage import content_storage
 
 
 class ArchiveItem(models.Model):
@@ -135,6 +137,7 @@ class ArchiveItem(models.Model):
     # High-resolution scan for detailed viewing
     scan = models.FileField(
         upload_to='archives/scans/',
+        storage=content_storage,
         blank=True,
         help_text="High-resolution scan or document file"
     )
@@ -206,6 +209,7 @@ class ArchiveItem(models.Model):
             models.Index(fields=['item_type']),
             models.Index(fields=['material']),
             models.Index(fields=['is_public']),
+            models.Index(fields=['updated_at', 'id']),
         ]
 
     def __str__(self):
@@ -222,17 +226,17 @@ class ArchiveItem(models.Model):
         )
 
     def increment_view_count(self):
-        """Increment the view count for analytics."""
+        """Increment the view count for analytics (buffered, see ``core.counters``)."""
+        counters.increment(self, 'view_count')
         self.view_count += 1
-        self.save(update_fields=['view_count'])
 
     def increment_download_count(self):
-        """Increment the download count for analytics."""
+        """Increment the download count for analytics (buffered, see ``core.counters``)."""
         try:
+            counters.increment(self, 'download_count')
             self.download_count += 1
-            self.save(update_fields=['download_count'])
         except Exception:
-            # best-effort: non-fatal if DB save fails
+            # best-effort: non-fatal if the counter cannot be written
             pass
 
     @property
@@ -256,3 +260,60 @@ class ArchiveItem(models.Model):
     def has_high_res_scan(self):
         """Check if this item has a high-resolution scan available."""
         return bool(self.scan)
+
+
+class ScanTiles(models.Model):
+    """
+    Deep-zoom tile pyramid of an item's scan (see ``archives.tiles``).
+
+    Pyramids are stored by the SHA-256 of the scan, so tile URLs never
+    change content and a replaced scan gets a new pyramid.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    item = models.OneToOneField(
+        ArchiveItem,
+        on_delete=models.CASCADE,
+        related_name='scan_tiles'
+    )
+    source = models.CharField(
+        max_length=255,
+        help_text="Storage name of the scan the pyramid was built from"
+    )
+    source_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the scan's bytes"
+    )
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Why the pyramid could not be built"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Scan tiles'
+
+    def __str__(self):
+        return f"Tiles for {self.item.catalog_number} ({self.status})"
+
+    @property
+    def is_ready(self):
+        return self.status == 'ready'
+
+    def get_absolute_url(self):
+        """Return the URL of the pyramid's DZI descriptor."""
+        return reverse('archives:scan_tile', kwargs={'key': self.source_hash, 'name': 'scan.dzi'})
@@ -0,0 +1,32 @@
+"""
+Signal handlers for the archives app.
+
+Schedules a deep-zoom tile pyramid build whenever an item's scan may
+have changed (see ``archives.tiles``).
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_save
+
+
+def schedule_scan_tiles(sender, instance, update_fields=None, **kwargs):
+    """Tile the item's scan in the background once it commits."""
+    if not settings.SCAN_TILES_AUTO_BUILD:
+        return
+    if update_fields is not None and 'scan' not in update_fields:
+        return
+
+    from .tiles import schedule
+
+    schedule(instance.pk)
+
+
+def connect():
+    """Connect tile building to archive item saves."""
+    from .models import ArchiveItem
+
+    post_save.connect(
+        schedule_scan_tiles,
+        sender=ArchiveItem,
+        dispatch_uid='scan-tiles-save',
+    )
@@ -2,11 +2,27 @@
 Tests for archives models and functionality.
 """
 
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from archives import iiif, iiif_views, ingest, tiles, views
 from archives.models import ArchiveItem
+from core.models import ImageDerivative, StoredFile
 
 # from django.contrib.gis.geos import Point  # Disabled for demo
+from core import counters
 from core.models import Monastery
 
 
@@ -66,5 +82,490 @@ class ArchiveItemModelTest(TestCase):
         item = ArchiveItem.objects.create(**self.archive_data)
         initial_count = item.view_count
         item.increment_view_count()
+        counters.flush()
         item.refresh_from_db()
         self.assertEqual(item.view_count, initial_count + 1)
+
+
+class ArchivesAPITest(TestCase):
+    """Test cases for the JSON archives endpoint."""
+
+    def test_conditional_get(self):
+        """Test that the JSON endpoint honours If-None-Match."""
+        url = reverse('archives:archives_api')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+
+class ArchiveIndexTest(TestCase):
+    """Test cases for the archives index page statistics."""
+
+    def test_stats_count_types_and_monasteries(self):
+        """Test that the stats come from the item type and monastery facets only."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        for number, item_type in enumerate(['manuscript', 'manuscript', 'painting']):
+            ArchiveItem.objects.create(
+                monastery=monastery,
+                title=f'Item {number}',
+                description='An archive item.',
+                item_type=item_type,
+                catalog_number=f'IDX-{number}',
+                image_alt='Item',
+            )
+
+        with mock.patch.object(views, 'render') as render:
+            views.archive_index(RequestFactory().get('/archives/'))
+        context = render.call_args.args[2]
+        self.assertNotIn('facets', context)
+        self.assertEqual(context['total_items'], 3)
+        self.assertEqual(context['total_monasteries'], 1)
+        self.assertEqual(
+            [(stat['value'], stat['count']) for stat in context['item_type_stats']],
+            [('manuscript', 2), ('painting', 1)],
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ItemDownloadTest(TestCase):
+    """Test cases for resumable scan downloads."""
+
+    content = bytes(range(256)) * 40
+
+    def setUp(self):
+        """Set up test data."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        self.item = ArchiveItem.objects.create(
+            monastery=monastery,
+            title='Scanned Manuscript',
+            description='A scanned manuscript.',
+            item_type='manuscript',
+            catalog_number='SCAN-001',
+            image_alt='Scan',
+        )
+        self.item.scan.save('scan.pdf', ContentFile(self.content))
+        self.url = reverse('archives:item_download', args=[monastery.slug, 'SCAN-001'])
+
+    def tearDown(self):
+        counters.flush()
+        shutil.rmtree(self.item.scan.storage.location, ignore_errors=True)
+
+    def downloads(self):
+        counters.flush()
+        self.item.refresh_from_db()
+        return self.item.download_count
+
+    def test_full_download(self):
+        """Test that a plain GET serves the file with validators."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('filename="SCAN-001.pdf"', response['Content-Disposition'])
+        self.assertEqual(self.downloads(), 1)
+
+    def test_resumed_range(self):
+        """Test that a resumed range is served with 206 and not counted."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-{len(self.content) - 1}/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[1000:])
+        self.assertEqual(self.downloads(), 0)
+
+    def test_first_range_counts(self):
+        """Test that a range from the first byte counts as a download."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-99')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[:100])
+        self.assertEqual(self.downloads(), 1)
+
+    def test_suffix_and_unsatisfiable_ranges(self):
+        """Test suffix ranges and ranges past the end of the file."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_if_range(self):
+        """Test that a stale If-Range validator gets the whole file."""
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified(self):
+        """Test that revalidation is answered with 304 and not counted."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.downloads(), 1)
+
+    @override_settings(SENDFILE_BACKEND='nginx')
+    def test_proxy_backend_counts_first_range(self):
+        """Test that downloads are counted the same when nginx sends the bytes."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=500-')
+        self.assertIn('X-Accel-Redirect', response)
+        self.assertEqual(self.downloads(), 0)
+
+        self.client.get(self.url)
+        self.assertEqual(self.downloads(), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ScanTilesTest(TestCase):
+    """Test cases for deep-zoom tile pyramids of scans."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        self.item = ArchiveItem.objects.create(
+            monastery=self.monastery,
+            title='Thangka',
+            description='A scanned thangka.',
+            item_type='painting',
+            catalog_number='THANGKA-001',
+            image_alt='Thangka',
+        )
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 300), (180, 40, 40)).save(buffer, 'JPEG')
+        self.item.scan.save('thangka.jpg', ContentFile(buffer.getvalue()))
+        tiles._public_pyramids.invalidate()
+
+    def tearDown(self):
+        shutil.rmtree(self.item.scan.storage.location, ignore_errors=True)
+
+    def tile_url(self, scan_tiles, name):
+        return reverse('archives:scan_tile', kwargs={'key': scan_tiles.source_hash, 'name': name})
+
+    def test_pyramid_levels_and_overlap(self):
+        """Test that every level is tiled with overlapping 256px tiles."""
+        scan_tiles = tiles.build_for_item(self.item.pk)
+        self.assertEqual((scan_tiles.status, scan_tiles.width, scan_tiles.height), ('ready', 600, 300))
+
+        storage = self.item.scan.storage
+        top = tiles.level_count(600, 300) - 1
+        self.assertEqual(top, 10)
+        with storage.open(tiles.tile_name(scan_tiles.source_hash, top, 0, 0)) as f:
+            self.assertEqual(Image.open(f).size, (257, 257))
+        with storage.open(tiles.tile_name(scan_tiles.source_hash, top, 2, 1)) as f:
+            self.assertEqual(Image.open(f).size, (89, 45))
+        with storage.open(tiles.tile_name(scan_tiles.source_hash, 0, 0, 0)) as f:
+            self.assertEqual(Image.open(f).size, (1, 1))
+        self.assertFalse(storage.exists(tiles.tile_name(scan_tiles.source_hash, top, 3, 0)))
+
+    def test_tiles_served_immutable(self):
+        """Test that the descriptor and tiles are cached for a year."""
+        scan_tiles = tiles.build_for_item(self.item.pk)
+
+        response = self.client.get(self.tile_url(scan_tiles, 'scan.dzi'))
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertIn(b'Width="600" Height="300"', b''.join(response.streaming_content))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.tile_url(scan_tiles, 'scan_files/10/1_0.jpg'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+        detail = self.client.get(reverse('archives:item_detail', args=[self.monastery.slug, 'THANGKA-001']))
+        self.assertEqual(detail.context['tiles_url'], self.tile_url(scan_tiles, 'scan.dzi'))
+
+    def test_private_items_not_served(self):
+        """Test that tiles of items that are not public are not served."""
+        scan_tiles = tiles.build_for_item(self.item.pk)
+        ArchiveItem.objects.filter(pk=self.item.pk).update(is_public=False)
+        tiles._public_pyramids.invalidate()
+
+        request = RequestFactory().get('/')
+        with self.assertRaises(Http404):
+            views.scan_tile(request, scan_tiles.source_hash, 'scan.dzi')
+
+    def test_documents_are_not_tiled(self):
+        """Test that scans Pillow cannot open are marked failed."""
+        self.item.scan.save('scan.pdf', ContentFile(b'%PDF-1.4 not an image'))
+        scan_tiles = tiles.build_for_item(self.item.pk)
+        self.assertEqual(scan_tiles.status, 'failed')
+        self.assertIsNone(tiles.descriptor_url(ArchiveItem.objects.get(pk=self.item.pk)))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IIIF_CACHE_DIR=tempfile.mkdtemp())
+class IIIFTest(TestCase):
+    """Test cases for the IIIF Image and Presentation APIs."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        self.item = ArchiveItem.objects.create(
+            monastery=self.monastery,
+            title='Thangka',
+            description='A scanned thangka.',
+            item_type='painting',
+            catalog_number='THANGKA-001',
+            image_alt='Thangka',
+            material='palm_leaf',
+        )
+        self.item.scan.save('thangka.jpg', ContentFile(self.jpeg(600, 300)))
+        default_storage.save('archives/extra/detail.png', ContentFile(self.jpeg(40, 80)))
+        self.item.additional_images = [
+            '/media/archives/extra/detail.png',
+            'https://example.org/remote.jpg',
+        ]
+        self.item.save()
+        tiles.build_for_item(self.item.pk)
+        tiles._public_pyramids.invalidate()
+        iiif._images.invalidate()
+        self.base = reverse('archives:iiif_image', args=['THANGKA-001'])
+
+    def tearDown(self):
+        shutil.rmtree(self.item.scan.storage.location, ignore_errors=True)
+        shutil.rmtree(iiif.get_cache().directory, ignore_errors=True)
+
+    def jpeg(self, width, height):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), (180, 40, 40)).save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def fetch(self, path):
+        response = self.client.get(f'{self.base}/{path}')
+        self.assertEqual(response.status_code, 200)
+        return response, Image.open(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_info(self):
+        """Test that info.json describes the scan and its tiles."""
+        response = self.client.get(reverse('archives:iiif_info', args=['THANGKA-001']))
+        info = response.json()
+        self.assertEqual((info['width'], info['height']), (600, 300))
+        self.assertEqual(info['type'], 'ImageService3')
+        self.assertEqual(info['tiles'], [{'width': 256, 'scaleFactors': [1, 2, 4]}])
+        self.assertTrue(info['id'].endswith(self.base))
+        self.assertEqual(response['Access-Control-Allow-Origin'], '*')
+
+    def test_region_size_rotation_quality(self):
+        """Test region, size, rotation and quality parameters."""
+        _, image = self.fetch('0,0,300,150/150,/0/default.jpg')
+        self.assertEqual((image.format, image.size), ('JPEG', (150, 75)))
+
+        _, image = self.fetch('full/200,/90/gray.png')
+        self.assertEqual((image.format, image.size, image.mode), ('PNG', (100, 200), 'L'))
+
+        _, image = self.fetch('square/!50,50/!0/bitonal.webp')
+        self.assertEqual((image.format, image.size), ('WEBP', (50, 50)))
+
+    def test_confined_size_not_upscaled(self):
+        """Test that !w,h larger than the region returns the region's size."""
+        self.assertEqual(iiif.parse_size('!2000,2000', 1000, 800), (1000, 800))
+        self.assertEqual(iiif.parse_size('^!2000,2000', 1000, 800), (2000, 1600))
+        _, image = self.fetch('full/!2000,2000/0/default.jpg')
+        self.assertEqual(image.size, (600, 300))
+
+    def test_equivalent_requests_share_one_derivative(self):
+        """Test that a derivative is rendered once per canonical request."""
+        response, _ = self.fetch('pct:0,0,50,50/150,75/0/color.jpg')
+        self.assertIn('/0,0,300,150/150,75/0/default.jpg>;rel="canonical"', response['Link'])
+        self.fetch('0,0,300,150/150,/0/default.jpg')
+
+        cached = [name for _, _, names in os.walk(iiif.get_cache().directory) for name in names]
+        self.assertEqual(len(cached), 1)
+
+    def test_invalid_requests(self):
+        """Test that unsupported or malformed requests get 400 and unknown images 404."""
+        for path in ('full/max/45/default.jpg', 'full/700,/0/default.jpg',
+                     '700,0,10,10/max/0/default.jpg', 'full/max/0/sepia.jpg'):
+            self.assertEqual(self.client.get(f'{self.base}/{path}').status_code, 400, path)
+
+        self.assertEqual(self.client.get(f'{self.base}/full/^700,/0/default.jpg').status_code, 200)
+
+        request = RequestFactory().get('/')
+        with self.assertRaises(Http404):
+            iiif_views.image_info(request, 'MISSING')
+
+    def test_cache_evicts_least_recently_used(self):
+        """Test that eviction removes the oldest files first."""
+        cache = iiif.DerivativeCache(tempfile.mkdtemp(), max_bytes=250)
+        paths = []
+        for index in range(3):
+            path = os.path.join(cache.directory, f'{index}.jpg')
+            with open(path, 'wb') as f:
+                f.write(b'x' * 100)
+            os.utime(path, (index, index))
+            paths.append(path)
+
+        self.assertEqual(cache.evict(), 200)
+        self.assertEqual([os.path.exists(path) for path in paths], [False, True, True])
+        shutil.rmtree(cache.directory)
+
+    def test_manifest(self):
+        """Test that the manifest has the scan, local extra images and metadata."""
+        response = self.client.get(reverse('archives:iiif_manifest', args=['THANGKA-001']))
+        manifest = response.json()
+        self.assertEqual(manifest['type'], 'Manifest')
+        self.assertEqual(manifest['label'], {'en': ['Thangka']})
+        self.assertIn({'label': {'en': ['Material']}, 'value': {'none': ['Palm Leaf']}}, manifest['metadata'])
+        self.assertEqual(manifest['provider'][0]['label'], {'en': ['Test Monastery']})
+
+        canvases = manifest['items']
+        self.assertEqual([(c['width'], c['height']) for c in canvases], [(600, 300), (40, 80)])
+        body = canvases[0]['items'][0]['items'][0]['body']
+        self.assertTrue(body['service'][0]['id'].endswith(self.base))
+
+        collection = self.client.get(reverse('archives:iiif_collection', args=[self.monastery.slug])).json()
+        self.assertEqual([m['id'] for m in collection['items']], [manifest['id']])
+
+    def test_manifest_cached_per_host(self):
+        """Test that a cached manifest keeps the URLs of the host it was requested on."""
+        url = reverse('archives:iiif_manifest', args=['THANGKA-001'])
+        internal = self.client.get(url, HTTP_HOST='127.0.0.1').json()
+        public = self.client.get(url, HTTP_HOST='localhost', secure=True).json()
+        self.assertTrue(internal['id'].startswith('http://127.0.0.1/'))
+        self.assertTrue(public['id'].startswith('https://localhost/'))
+        self.assertEqual(self.client.get(url, HTTP_HOST='127.0.0.1').json()['id'], internal['id'])
+
+
+@override_settings(
+    IMAGE_DERIVATIVE_WIDTHS=[16],
+    IMAGE_DERIVATIVE_FORMATS=['webp'],
+    SNAPSHOT_AUTO_REBUILD=False,
+)
+class IngestArchivesTest(TestCase):
+    """Test cases for the bulk archive ingest command."""
+
+    def setUp(self):
+        """Write a digitization batch."""
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.batch = tempfile.mkdtemp()
+        Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        for name, color in (('page-001.jpg', 'red'), ('page-002.jpg', 'blue')):
+            Image.new('RGB', (40, 30), color).save(os.path.join(self.batch, name), dpi=(300, 300))
+        shutil.copy(os.path.join(self.batch, 'page-001.jpg'), os.path.join(self.batch, 'page-003.jpg'))
+        with open(os.path.join(self.batch, 'notes.txt'), 'w') as f:
+            f.write('not a scan')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        shutil.rmtree(self.batch, ignore_errors=True)
+
+    def ingest(self, source, **options):
+        output = io.StringIO()
+        call_command(
+            'ingest_archives', source, monastery='test-monastery', workers=0,
+            batch_size=2, stdout=output, stderr=io.StringIO(), **options,
+        )
+        return output.getvalue()
+
+    def test_directory(self):
+        """Test that every scan in a directory becomes an item, stored once per content."""
+        output = self.ingest(self.batch)
+        self.assertIn('3 items created', output)
+
+        items = {item.catalog_number: item for item in ArchiveItem.objects.all()}
+        self.assertEqual(sorted(items), ['page-001', 'page-002', 'page-003'])
+        first = items['page-001']
+        self.assertEqual(first.scan_resolution, '40 × 30 px, 300 DPI')
+        self.assertEqual(first.title, 'page 001')
+        self.assertEqual(first.image.name, first.scan.name)
+        self.assertEqual(items['page-003'].scan.name, first.scan.name)
+        # Two scans and two images share the duplicated file
+        self.assertEqual(first.scan.storage.references(first.scan.name), 4)
+        self.assertTrue(ImageDerivative.objects.filter(source=first.image.name).exists())
+
+    def test_scans_past_the_pixel_limit_keep_their_size(self):
+        """Test that scans Pillow would refuse to decode are still measured."""
+        path = os.path.join(self.batch, 'page-001.jpg')
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 100):
+            digest, width, height, dpi = ingest.inspect_scan(path)
+            self.assertEqual(Image.MAX_IMAGE_PIXELS, 100)
+        self.assertEqual((width, height, dpi), (40, 30, (300, 300)))
+
+    def test_resume(self):
+        """Test that a second run skips the items already ingested."""
+        self.ingest(self.batch)
+        ArchiveItem.objects.filter(catalog_number='page-003').delete()
+
+        output = self.ingest(self.batch)
+        self.assertIn('1 items created, 2 already ingested', output)
+        self.assertEqual(ArchiveItem.objects.count(), 3)
+
+    def test_failed_batch_removes_its_scans(self):
+        """Test that a batch that fails to insert leaves no stored scans behind."""
+        with mock.patch.object(ArchiveItem.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.ingest(self.batch)
+        self.assertFalse(ArchiveItem.objects.exists())
+        self.assertFalse(StoredFile.objects.exists())
+        stored = [
+            name for _, _, names in os.walk(os.path.join(self.media_root, 'cas'))
+            for name in names
+        ]
+        self.assertEqual(stored, [])
+
+    def test_manifest(self):
+        """Test that manifest columns are validated and copied onto items."""
+        with open(os.path.join(self.batch, 'manifest.csv'), 'w', newline='') as f:
+            f.write(
+                'file,catalog_number,title,item_type,material,is_public\n'
+                'page-001.jpg,MS-1,Prajnaparamita folio,manuscript,palm_leaf,false\n'
+                'page-002.jpg,MS-2,Bad material,manuscript,plastic,true\n'
+                'missing.jpg,MS-3,Missing scan,manuscript,paper,true\n'
+            )
+        output = self.ingest(os.path.join(self.batch, 'manifest.csv'))
+        self.assertIn('1 items created, 0 already ingested, 2 rows skipped', output)
+
+        item = ArchiveItem.objects.get()
+        self.assertEqual(item.catalog_number, 'MS-1')
+        self.assertEqual(item.get_material_display(), 'Palm Leaf')
+        self.assertFalse(item.is_public)
@@ -0,0 +1,212 @@
+"""
+Deep-zoom tile pyramids for high-resolution archive scans.
+
+A 300-DPI thangka scan is tens of megapixels, which a phone should not
+have to download before showing anything. Each image scan is cut into a
+Deep Zoom (DZI) pyramid: level ``n`` is the scan at full size, every level
+below halves it, down to a single pixel, and each level is split into
+``TILE_SIZE`` pixel JPEG tiles overlapping by ``TILE_OVERLAP`` pixels. A
+viewer such as OpenSeadragon then fetches only the tiles in view at the
+current zoom.
+
+Pyramids are stored as ``tiles/<sha256>/scan.dzi`` and
+``tiles/<sha256>/scan_files/<level>/<col>_<row>.jpg``, keyed by the scan's
+content hash, so they are served with a one-year ``immutable`` cache, and
+an identical scan is only tiled once. The descriptor is written last: a
+pyramid without one is incomplete and is rebuilt.
+
+Pyramids are built by one background thread after an item's scan changes
+(``SCAN_TILES_AUTO_BUILD``) or by ``manage.py build_scan_tiles``. Scans
+Pillow cannot open (PDFs) are marked failed and keep their download link.
+"""
+
+import hashlib
+import io
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, UnidentifiedImageError
+
+from core.cache import ModelDerived, bump_generation
+
+from .models import ArchiveItem, ScanTiles
+
+logger = logging.getLogger('monastery360.tiles')
+
+TILE_SIZE = 256
+TILE_OVERLAP = 1
+TILE_FORMAT = 'jpg'
+TILE_QUALITY = 85
+
+TILE_ROOT = 'tiles'
+DESCRIPTOR_NAME = 'scan.dzi'
+
+DZI_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+    'Format="{format}" Overlap="{overlap}" TileSize="{tile_size}">'
+    '<Size Width="{width}" Height="{height}"/></Image>\n'
+)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def pyramid_dir(source_hash):
+    return f'{TILE_ROOT}/{source_hash}'
+
+
+def descriptor_name(source_hash):
+    return f'{pyramid_dir(source_hash)}/{DESCRIPTOR_NAME}'
+
+
+def tile_name(source_hash, level, col, row):
+    return f'{pyramid_dir(source_hash)}/scan_files/{level}/{col}_{row}.{TILE_FORMAT}'
+
+
+def file_hash(storage, name):
+    """SHA-256 of a stored file, read in chunks."""
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def level_count(width, height):
+    """Number of DZI levels: halve until the image is a single pixel."""
+    return math.ceil(math.log2(max(width, height))) + 1
+
+
+def tile_boxes(width, height):
+    """Yield ``(col, row, box)`` crop boxes for one level, with overlap."""
+    for col in range(math.ceil(width / TILE_SIZE)):
+        for row in range(math.ceil(height / TILE_SIZE)):
+            left = col * TILE_SIZE - (TILE_OVERLAP if col else 0)
+            top = row * TILE_SIZE - (TILE_OVERLAP if row else 0)
+            right = min((col + 1) * TILE_SIZE + TILE_OVERLAP, width)
+            bottom = min((row + 1) * TILE_SIZE + TILE_OVERLAP, height)
+            yield col, row, (left, top, right, bottom)
+
+
+def _save(storage, name, data):
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+
+
+def build_pyramid(image, source_hash, storage=default_storage):
+    """Write the tiles and descriptor of ``image``; returns the number of tiles."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    width, height = image.size
+    tiles = 0
+
+    level = level_count(width, height) - 1
+    while level >= 0:
+        for col, row, box in tile_boxes(*image.size):
+            buffer = io.BytesIO()
+            image.crop(box).save(buffer, 'JPEG', quality=TILE_QUALITY)
+            _save(storage, tile_name(source_hash, level, col, row), buffer.getvalue())
+            tiles += 1
+        if level:
+            # Each level is halved from the one above, rounding up as DZI does
+            size = (math.ceil(image.width / 2), math.ceil(image.height / 2))
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        level -= 1
+
+    descriptor = DZI_TEMPLATE.format(
+        format=TILE_FORMAT, overlap=TILE_OVERLAP, tile_size=TILE_SIZE, width=width, height=height,
+    )
+    _save(storage, descriptor_name(source_hash), descriptor.encode('utf-8'))
+    return tiles
+
+
+def build_for_item(item_id, storage=default_storage):
+    """
+    Build (or reuse) the pyramid of an item's current scan.
+
+    Returns the item's :class:`ScanTiles`, or ``None`` if it has no scan.
+    """
+    item = ArchiveItem.objects.filter(pk=item_id).only('scan').first()
+    if item is None or not item.scan:
+        ScanTiles.objects.filter(item_id=item_id).delete()
+        return None
+
+    tiles, _ = ScanTiles.objects.get_or_create(item=item, defaults={'source': item.scan.name})
+    if tiles.is_ready and tiles.source == item.scan.name:
+        return tiles
+
+    tiles.source = item.scan.name
+    tiles.error = ''
+    try:
+        tiles.source_hash = file_hash(item.scan.storage, item.scan.name)
+        with item.scan.storage.open(item.scan.name, 'rb') as f, Image.open(f) as image:
+            tiles.width, tiles.height = image.size
+            if not storage.exists(descriptor_name(tiles.source_hash)):
+                image.load()
+                count = build_pyramid(image, tiles.source_hash, storage)
+                logger.info('Built %d tiles for %s', count, item.scan.name)
+        tiles.status = 'ready'
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning('Cannot tile %s: %s', item.scan.name, e)
+        tiles.status = 'failed'
+        tiles.error = str(e)
+    tiles.save()
+    bump_generation(ScanTiles)
+    _public_pyramids.invalidate()
+    return tiles
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _build_in_background(item_id):
+    try:
+        build_for_item(item_id)
+    except Exception:
+        logger.exception('Tiling failed for archive item #%s', item_id)
+    finally:
+        # This thread opened its own connections; don't leak them
+        connections.close_all()
+
+
+def schedule(item_id):
+    """Tile the item's scan in the background once the transaction commits."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scan-tiles')
+    transaction.on_commit(lambda: _executor.submit(_build_in_background, item_id))
+
+
+def _load_public_pyramids():
+    return frozenset(
+        ScanTiles.objects.filter(status='ready', item__is_public=True)
+        .values_list('source_hash', flat=True)
+    )
+
+
+# Checked on every tile request, so kept in memory. Counter writes do not
+# bump generations, so it is only rebuilt when an item or pyramid is saved,
+# and unpublishing an item hides its tiles within a generation check.
+_public_pyramids = ModelDerived([ScanTiles, ArchiveItem], _load_public_pyramids)
+
+
+def is_public(source_hash):
+    """Whether ``source_hash`` is the ready pyramid of a public item."""
+    return source_hash in _public_pyramids.get()
+
+
+def descriptor_url(item):
+    """URL of ``item``'s DZI descriptor, or ``None`` until its pyramid is ready."""
+    try:
+        tiles = item.scan_tiles
+    except ScanTiles.DoesNotExist:
+        return None
+    return tiles.get_absolute_url() if tiles.is_ready and tiles.source == item.scan.name else None
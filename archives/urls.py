@@ -2,9 +2,9 @@
 URL configuration for archives app.
 """
 
-from django.urls import path
+from django.urls import path, re_path
 
-from . import views
+from . import iiif_views, views
 
 app_name = 'archives'
 
@@ -19,4 +19,21 @@ urlpatterns = [
     path('<slug:monastery_slug>/item/<str:catalog_number>/', views.item_detail, name='item_detail'),
     # download endpoint for archive scans
     path('<slug:monastery_slug>/item/<str:catalog_number>/download/', views.item_download, name='item_download'),
+    # deep-zoom pyramids of scans, addressed by the scan's SHA-256
+    re_path(
+        r'^tiles/(?P<key>[0-9a-f]{64})/(?P<name>scan\.dzi|scan_files/\d+/\d+_\d+\.jpg)$',
+        views.scan_tile,
+        name='scan_tile',
+    ),
+    # IIIF Image API 3.0 (identifier: catalog number) and Presentation API 3.0
+    path('iiif/collection/<slug:monastery_slug>', iiif_views.collection, name='iiif_collection'),
+    path('iiif/<str:identifier>', iiif_views.image_base, name='iiif_image'),
+    path('iiif/<str:identifier>/info.json', iiif_views.image_info, name='iiif_info'),
+    path('iiif/<str:identifier>/manifest', iiif_views.manifest, name='iiif_manifest'),
+    re_path(
+        r'^iiif/(?P<identifier>[^/]+)/(?P<region>[^/]+)/(?P<size>[^/]+)/(?P<rotation>[^/]+)/'
+        r'(?P<quality>\w+)\.(?P<format>\w+)$',
+        iiif_views.image_request,
+        name='iiif_image_request',
+    ),
 ]
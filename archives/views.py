@@ -4,34 +4,42 @@ Archives views for Monastery360.
 Handles digital archives portal and API endpoints.
 """
 
-import json
 import os
 
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
-from django.db.models import Count
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
 
+from core import datafiles
+from core.cache import cache_response
+from core.conditional import conditional_on_file
 from core.models import Monastery
+from core.sendfile import sendfile
 
+from . import tiles
+from .facets import FACETS_BY_NAME, facet_counts
 from .models import ArchiveItem
 
+# Facets whose counts the archives index page shows
+INDEX_FACETS = [FACETS_BY_NAME['item_type'], FACETS_BY_NAME['monastery']]
+
 
 def item_detail(request, monastery_slug, catalog_number):
     """Render a single archive item detail page."""
-    item = ArchiveItem.objects.select_related('monastery').filter(
+    item = ArchiveItem.objects.select_related('monastery', 'scan_tiles').filter(
         monastery__slug=monastery_slug,
         catalog_number=catalog_number,
         is_public=True
     ).first()
 
     if not item:
-        from django.http import Http404
         raise Http404('Archive item not found')
 
     context = {
         'item': item,
+        'tiles_url': tiles.descriptor_url(item),
         'page_title': f'{item.title} - {item.monastery.name}',
         'page_description': item.description[:160],
     }
@@ -44,10 +52,12 @@ def item_download(request, monastery_slug, catalog_number):
 
     If `?inline=1` is provided, attempt to display inline (Content-Disposition inline).
     Otherwise serve as attachment.
-    """
-    import mimetypes
 
-    from django.http import FileResponse, Http404, HttpResponse
+    Supports ``Range``/``If-Range`` so interrupted downloads can resume. Only
+    a fetch starting at the first byte counts as a download; resumed ranges
+    and conditional revalidations do not.
+    """
+    from django.http import HttpResponse
 
     item = ArchiveItem.objects.select_related('monastery').filter(
         monastery__slug=monastery_slug,
@@ -65,38 +75,45 @@ def item_download(request, monastery_slug, catalog_number):
     except Exception:
         raise Http404('File not accessible')
 
-    # increment download counter (best-effort)
-    try:
-        item.increment_download_count()
-    except Exception:
-        pass
-
-    # Determine disposition and content type
     inline = request.GET.get('inline') == '1'
-    disposition = 'inline' if inline else 'attachment'
-
-    # Get file name
-    filename = os.path.basename(item.scan.name)
-
-    # Determine content type
-    content_type, _ = mimetypes.guess_type(filename)
-    if not content_type:
-        content_type = 'application/octet-stream'
 
     try:
-        # Use FileResponse for better performance
-        response = FileResponse(
-            item.scan.open('rb'),
-            as_attachment=(not inline),
-            content_type=content_type
+        response = sendfile(
+            request,
+            item.scan.storage,
+            item.scan.name,
+            # Stored scans are named by content hash
+            filename=f'{item.catalog_number}{os.path.splitext(item.scan.name)[1]}',
+            as_attachment=not inline,
         )
-        response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
-        return response
     except Exception as e:
         # Fallback: return error message
         return HttpResponse(f'Error serving file: {str(e)}', status=500)
 
+    # increment download counter (best-effort)
+    if request.method == 'GET' and response.served_range and response.served_range[0] == 0:
+        item.increment_download_count()
+
+    return response
+
 
+def scan_tile(request, key, name):
+    """
+    Serve a file of a scan's deep-zoom pyramid: the ``scan.dzi``
+    descriptor or a tile.
+
+    Pyramids are addressed by the scan's content hash, so every response
+    may be cached for a year. Only pyramids of public items are served.
+    """
+    path = f'{tiles.pyramid_dir(key)}/{name}'
+    if not tiles.is_public(key) or not default_storage.exists(path):
+        raise Http404('Tile not found')
+
+    content_type = 'application/xml' if name == tiles.DESCRIPTOR_NAME else 'image/jpeg'
+    return sendfile(request, default_storage, path, content_type=content_type, immutable=True)
+
+
+@cache_response(ArchiveItem, Monastery)
 def archive_index(request):
     """
     Main archives page with featured items and statistics.
@@ -106,40 +123,25 @@ def archive_index(request):
         is_public=True
     ).select_related('monastery').order_by('-view_count')[:6]
 
-    # Statistics by item type
-    item_type_stats = ArchiveItem.objects.filter(
-        is_public=True
-    ).values('item_type').annotate(
-        count=Count('item_type')
-    ).order_by('-count')
-
-    # Statistics by monastery
-    monastery_stats = ArchiveItem.objects.filter(
-        is_public=True
-    ).values(
-        'monastery__name', 'monastery__slug'
-    ).annotate(
-        count=Count('monastery')
-    ).order_by('-count')[:5]
-
     # Recent additions
     recent_items = ArchiveItem.objects.filter(
         is_public=True
     ).select_related('monastery').order_by('-created_at')[:4]
 
-    total_items = ArchiveItem.objects.filter(is_public=True).count()
-    total_monasteries = Monastery.objects.filter(
-        is_active=True,
-        archive_items__is_public=True
-    ).distinct().count()
+    # Statistics by item type and monastery, and totals, in one query; the
+    # page only shows these two facets, so don't group by the others
+    facets = facet_counts(
+        ArchiveItem.objects.filter(is_public=True, monastery__is_active=True),
+        facets=INDEX_FACETS,
+    )
 
     context = {
         'featured_items': featured_items,
-        'item_type_stats': item_type_stats,
-        'monastery_stats': monastery_stats,
+        'item_type_stats': facets['facets']['item_type'],
+        'monastery_stats': facets['facets']['monastery'][:5],
         'recent_items': recent_items,
-        'total_items': total_items,
-        'total_monasteries': total_monasteries,
+        'total_items': facets['total'],
+        'total_monasteries': len(facets['facets']['monastery']),
         'page_title': 'Digital Archives Portal - Sikkim Monasteries',
         'page_description': 'Explore our comprehensive collection of digitally preserved manuscripts, artworks, and historical documents from Sikkim\'s monasteries.',
     }
@@ -154,17 +156,21 @@ def digital_portal(request):
     return render(request, 'archives/digital_portal.html')
 
 
+def _archives_json_path(request=None):
+    """Locate archives.json, preferring the collected static copy."""
+    json_path = os.path.join(settings.STATIC_ROOT or 'static', 'data', 'archives.json')
+    if not os.path.exists(json_path):
+        json_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'archives.json')
+    return json_path
+
+
+@conditional_on_file(_archives_json_path)
 def archives_api(request):
     """
     API endpoint to fetch archives data from JSON file.
     """
     try:
-        json_path = os.path.join(settings.STATIC_ROOT or 'static', 'data', 'archives.json')
-        if not os.path.exists(json_path):
-            json_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'archives.json')
-
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return JsonResponse(data)
-    except Exception as e:
+        archives = datafiles.load(_archives_json_path())
+    except (OSError, ValueError) as e:
         return JsonResponse({'error': str(e)}, status=500)
+    return HttpResponse(archives.content, content_type='application/json')
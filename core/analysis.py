@@ -0,0 +1,196 @@
+"""
+Language-aware text analysis for the in-process search index.
+
+The site is served in English, Hindi and Nepali (``settings.LANGUAGES``)
+and its content mixes Latin and Devanagari text, so each language has an
+:class:`Analyzer` that turns text into index terms:
+
+* Unicode is normalized (NFKC), zero-width joiners are dropped and text is
+  case-folded;
+* Devanagari words are folded so that spelling variants meet: the nukta is
+  removed (ज़ -> ज), candrabindu becomes anusvara, and long i/u vowels and
+  vowel signs become short (ी -> ि, ू -> ु);
+* Latin words are stemmed with a light English stemmer in every language,
+  so "festivals" finds "festival" whatever the page language;
+* Hindi and Nepali also strip common inflectional suffixes and
+  postpositions from Devanagari words, and drop their own stopwords.
+
+Queries are analyzed with the analyzer of the active language (see
+:func:`get_analyzer`), so they match the terms the index stores for it.
+
+Latin text is analyzed the same way in every language; only Devanagari
+terms differ. The database engines know nothing of either, so
+``core.fulltext`` answers Devanagari queries from the analyzed
+in-process index (see ``core.search.analyzed_language``).
+"""
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.utils.translation import get_language
+
+# Letters, digits and the combining marks of Devanagari and Tibetan (which
+# ``\w`` alone would split words on); dandas are punctuation
+TOKEN_RE = re.compile(r'[\w\u0900-\u0963\u0966-\u097f\u0f3e-\u0fbc]+')
+MIN_TOKEN_LENGTH = 2
+
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in is it its of on or that the
+    their this to was were which with
+""".split())
+
+DEVANAGARI_RE = re.compile(r'[\u0900-\u097f]')
+# Zero-width (non-)joiners and spaces, which only affect rendering
+ZERO_WIDTH_RE = re.compile(r'[\u200b-\u200d\u2060\ufeff]')
+
+# Nukta forms decompose under NFKC; the nukta itself is then dropped
+DEVANAGARI_FOLDING = str.maketrans({
+    '\u093c': None,      # nukta
+    '\u0901': '\u0902',  # candrabindu -> anusvara
+    '\u0940': '\u093f',  # vowel sign ii -> i
+    '\u0942': '\u0941',  # vowel sign uu -> u
+    '\u0908': '\u0907',  # ii -> i
+    '\u090a': '\u0909',  # uu -> u
+})
+
+HINDI_STOPWORDS = """
+    और का के की को है हैं था थे थी में से पर भी यह वह ये वे एक कि जो तो
+    लिए ने इस उस इन उन या तक साथ द्वारा
+"""
+
+# Light stemmer suffixes (after Ramanathan & Rao), longest first
+HINDI_SUFFIXES = """
+    ाएंगी ाएंगे ाऊंगी ाऊंगा ाइयाँ ाइयों ाइयां
+    ाएगी ाएगा ाओगी ाओगे एंगी ेंगी एंगे ेंगे ूंगी ूंगा ातीं नाओं नाएं ताओं ताएं ियाँ ियों ियां
+    ाकर ाइए ाईं ाया ेगी ेगा ोगी ोगे ाने ाना ाते ाती ाता तीं ाओं ाएं ुओं ुएं ुआं
+    कर ाओ िए ाई ाए ने नी ना ते ीं ती ता ाँ ां ों ें
+    ो े ू ु ी ि ा
+"""
+
+NEPALI_STOPWORDS = """
+    र को का की ले लाई मा बाट छ छन् थियो हो यो त्यो यी ती एक पनि तथा वा
+    भने गरी गर्न सँग सम्म
+"""
+
+# Postpositions and the plural marker, which attach to the noun
+NEPALI_SUFFIXES = """
+    हरूलाई हरूबाट हरूको हरूका हरूकी हरूले हरूमा हरूसँग
+    भन्दा देखि सम्म द्वारा लाई बाट सँग तिर हरू
+    को का की ले मा
+"""
+
+
+def fold_devanagari(token):
+    """Fold nukta, candrabindu and long i/u in a Devanagari word."""
+    return token.translate(DEVANAGARI_FOLDING)
+
+
+def _words(text, fold=False):
+    words = text.split()
+    return frozenset(fold_devanagari(word) for word in words) if fold else frozenset(words)
+
+
+def stem_english(token):
+    """
+    Reduce an English word to a crude stem.
+
+    Plural, -ing, -ed and -ly endings and a final "e" are removed, so that
+    "dance", "dances", "danced" and "dancing" all become "danc". Stems are
+    only compared with each other, never shown.
+    """
+    if len(token) <= 3 or not token.isascii() or not token.isalpha():
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        token = token[:-3] + 'y'
+    elif token.endswith('sses'):
+        token = token[:-2]
+    elif token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        token = token[:-1]
+
+    for suffix in ('ingly', 'edly', 'ing', 'ed', 'ly'):
+        stem = token[:-len(suffix)]
+        if token.endswith(suffix) and len(stem) >= 3 and re.search('[aeiouy]', stem):
+            token = stem
+            # running -> run, but not e.g. "fell"
+            if len(token) > 3 and token[-1] == token[-2] and token[-1] not in 'lsz':
+                token = token[:-1]
+            break
+
+    if token.endswith('e') and len(token) > 3:
+        token = token[:-1]
+    return token
+
+
+class SuffixStemmer:
+    """Strip the longest matching suffix, leaving at least ``min_stem`` characters."""
+
+    def __init__(self, suffixes, min_stem=2):
+        self.suffixes = sorted(_words(suffixes, fold=True), key=len, reverse=True)
+        self.min_stem = min_stem
+
+    def __call__(self, token):
+        for suffix in self.suffixes:
+            if token.endswith(suffix) and len(token) - len(suffix) >= self.min_stem:
+                return token[:-len(suffix)]
+        return token
+
+
+class Analyzer:
+    """
+    Text to index terms for one language.
+
+    ``stopwords`` and ``stemmer`` apply to Devanagari words; Latin words
+    always use the English stopwords and stemmer.
+    """
+
+    def __init__(self, language, stopwords='', stemmer=None):
+        self.language = language
+        self.stopwords = _words(stopwords, fold=True)
+        self.stemmer = stemmer
+
+    def __repr__(self):
+        return f'<Analyzer: {self.language}>'
+
+    def __call__(self, text):
+        text = ZERO_WIDTH_RE.sub('', unicodedata.normalize('NFKC', text or '')).casefold()
+        terms = []
+        for token in TOKEN_RE.findall(text):
+            if len(token) < MIN_TOKEN_LENGTH:
+                continue
+            if DEVANAGARI_RE.search(token):
+                token = fold_devanagari(token)
+                if token in self.stopwords:
+                    continue
+                if self.stemmer is not None:
+                    token = self.stemmer(token)
+            else:
+                if token in STOPWORDS:
+                    continue
+                token = stem_english(token)
+            terms.append(token)
+        return terms
+
+
+ANALYZERS = {
+    analyzer.language: analyzer
+    for analyzer in [
+        Analyzer('en'),
+        Analyzer('hi', HINDI_STOPWORDS, SuffixStemmer(HINDI_SUFFIXES)),
+        Analyzer('ne', NEPALI_STOPWORDS, SuffixStemmer(NEPALI_SUFFIXES)),
+    ]
+}
+
+
+def get_analyzer(language=None):
+    """
+    Return the analyzer for ``language`` (default: the active language).
+
+    Regional variants use their base language's analyzer ("hi-in" -> "hi");
+    languages without one fall back to ``LANGUAGE_CODE``'s, then English.
+    """
+    language = (language or get_language() or settings.LANGUAGE_CODE).lower()
+    for code in (language, language.split('-')[0], settings.LANGUAGE_CODE.split('-')[0]):
+        if code in ANALYZERS:
+            return ANALYZERS[code]
+    return ANALYZERS['en']
@@ -14,5 +14,5 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         """Import signal handlers when the app is ready."""
-        # Import any signals here if needed
-        pass
+        from . import signals
+        signals.connect()
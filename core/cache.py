@@ -0,0 +1,198 @@
+"""
+Versioned response cache for Monastery360 read-only views.
+
+Cache keys embed a generation counter for every model a response depends
+on. Saving or deleting any instance bumps that model's generation (see
+``core.signals``), so every dependent key changes at once and stale
+entries are simply never read again; they age out of the backend on
+their own. The backend is whatever ``CACHES['default']`` points at:
+local memory on a single node, or a file/Redis cache shared by several.
+"""
+
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.translation import get_language
+
+from core import datafiles
+
+GENERATION_PREFIX = 'gen'
+RESPONSE_PREFIX = 'resp'
+
+
+def _generation_key(model):
+    return f'{GENERATION_PREFIX}:{model._meta.label_lower}'
+
+
+def _seed():
+    # A fresh, time-based seed means a generation that was evicted from the
+    # cache can never restart at a value an older entry was stored under.
+    return int(time.time() * 1000)
+
+
+def get_generations(models):
+    """Return the current generation for each model, in one round trip."""
+    keys = [_generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    for key in missing:
+        cache.add(key, _seed(), timeout=None)
+    if missing:
+        generations.update(cache.get_many(missing))
+    return [generations.get(key, 0) for key in keys]
+
+
+def bump_generation(model):
+    """Invalidate every cached response that depends on ``model``."""
+    key = _generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _seed(), timeout=None)
+
+
+def response_cache_key(namespace, models, request, files=()):
+    """
+    Build the cache key for ``request`` under the current generations.
+
+    The key covers the scheme and host, not just the path: responses such
+    as IIIF manifests and paginated API pages embed absolute URLs. Each of
+    ``files`` (data files the response also reads) adds its mtime and
+    size, so editing one misses the entries built from the old contents.
+    """
+    generations = '.'.join(str(gen) for gen in get_generations(models))
+    versions = ''.join(f':{datafiles.version(path)}' for path in files)
+    uri = request.build_absolute_uri() + versions
+    path = hashlib.sha256(uri.encode('utf-8')).hexdigest()[:32]
+    return f'{RESPONSE_PREFIX}:{namespace}:{generations}:{get_language()}:{path}'
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    user = getattr(request, 'user', None)
+    # Rendered pages may contain per-user content; only share anonymous ones
+    return not (user and user.is_authenticated)
+
+
+def _serialize(response):
+    return {
+        'status': response.status_code,
+        'content': response.content,
+        'headers': dict(response.items()),
+    }
+
+
+def _deserialize(data):
+    response = HttpResponse(data['content'], status=data['status'])
+    for header, value in data['headers'].items():
+        response[header] = value
+    return response
+
+
+def _conditional(request, response):
+    """Answer If-None-Match/If-Modified-Since from the cached validators."""
+    last_modified = response.get('Last-Modified')
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        response=response,
+    )
+
+
+def cache_response(*models, namespace=None, timeout=None, files=()):
+    """
+    Cache a view's successful responses, keyed by ``models`` generations.
+
+    ``files`` are callables returning the paths of data files the view
+    reads besides the models; their stat is part of the key.
+
+    Works for function views and, via ``method_decorator(name='dispatch')``,
+    for DRF views (their responses are rendered before being stored; pass
+    ``namespace`` there since every ``dispatch`` shares one qualname).
+    Responses that set cookies are never stored.
+    """
+    def decorator(view_func):
+        key_namespace = namespace or f'{view_func.__module__}.{view_func.__qualname__}'
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            paths = [path_func() for path_func in files]
+            key = response_cache_key(key_namespace, models, request, paths)
+            cached = cache.get(key)
+            if cached is not None:
+                return _conditional(request, _deserialize(cached))
+
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+            ):
+                expires = settings.RESPONSE_CACHE_TIMEOUT if timeout is None else timeout
+                cache.set(key, _serialize(response), expires)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+class ModelDerived:
+    """
+    An in-process value built from model data, rebuilt when the data changes.
+
+    Changes are detected through the models' cache generations, so a save
+    in any process is noticed. Generations are checked at most every
+    ``check_interval`` seconds, and the value is rebuilt at most every
+    ``rebuild_interval`` seconds, so a burst of edits (e.g. an admin bulk
+    action) cannot keep an expensive value rebuilding.
+    """
+
+    def __init__(self, models, build, check_interval=1.0, rebuild_interval=0.0):
+        self.models = models
+        self.build = build
+        self.check_interval = check_interval
+        self.rebuild_interval = rebuild_interval
+        self._value = None
+        self._generations = None
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if self._value is not None and now - self._checked_at < self.check_interval:
+            return self._value
+
+        with self._lock:
+            self._checked_at = now
+            generations = get_generations(self.models)
+            stale = self._value is None or (
+                generations != self._generations
+                and now - self._built_at >= self.rebuild_interval
+            )
+            if stale:
+                self._value = self.build()
+                self._generations = generations
+                self._built_at = now
+            return self._value
+
+    def invalidate(self):
+        """Force a rebuild on the next :meth:`get`."""
+        with self._lock:
+            self._value = None
@@ -0,0 +1,107 @@
+"""
+Conditional GET support for Monastery360 read endpoints.
+
+Validators are derived from cheap aggregates (row count and ``updated_at``
+high-water mark) of the querysets a response is built from, or from the
+stat of a data file. They are checked by Django's ``condition`` decorator,
+so a matching ``If-None-Match``/``If-Modified-Since`` is answered with
+304 before the view runs any serialization.
+
+Queryset responses only get an ETag: deleting or hiding a row lowers the
+count but does not move the ``updated_at`` high-water mark, so a
+``Last-Modified`` built from it would answer ``If-Modified-Since`` with
+304 while the client still holds the removed row.
+"""
+
+import hashlib
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from core import datafiles
+
+
+def _digest(request, parts):
+    """Hash validator parts together with the full request path.
+
+    The path (including the query string) is part of the tag because
+    ``?fields=``, ``?cursor=`` and filters all change the representation.
+    """
+    hasher = hashlib.sha256(request.get_full_path().encode('utf-8'))
+    for part in parts:
+        hasher.update(b'\0')
+        hasher.update(str(part).encode('utf-8'))
+    return hasher.hexdigest()[:32]
+
+
+def queryset_validators(request, querysets, files=()):
+    """
+    Return the ETag for a list of querysets.
+
+    Each queryset contributes its label, row count and latest
+    ``updated_at``; a deletion changes the count and an edit moves the
+    high-water mark, so either invalidates the tag. Each path in ``files``
+    contributes its mtime and size.
+    """
+    parts = []
+    for queryset in querysets:
+        state = queryset.order_by().aggregate(count=Count('pk'), latest=Max('updated_at'))
+        parts.extend([queryset.model._meta.label, state['count'], state['latest']])
+    for path in files:
+        parts.extend([path, datafiles.version(path)])
+    return _digest(request, parts)
+
+
+def file_validators(request, path):
+    """Return ``(etag, last_modified)`` for a file on disk, or ``(None, None)``."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    last_modified = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+    return _digest(request, [path, stat.st_size, stat.st_mtime_ns]), last_modified
+
+
+def _cached(request, key, compute):
+    """Compute validators once per request; ``condition`` asks twice."""
+    cache = request.__dict__.setdefault('_conditional_validators', {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def conditional_on_querysets(querysets_func, files=()):
+    """
+    Decorate a view so it answers conditional GETs from queryset state.
+
+    ``querysets_func(request, *args, **kwargs)`` returns the querysets the
+    response is built from. Prefer a superset of the rows actually
+    rendered: anything that changes the subset then also changes the
+    superset's count or high-water mark. ``files`` are callables returning
+    the paths of data files the response also reads.
+    """
+    def etag(request, *args, **kwargs):
+        return queryset_validators(
+            request,
+            querysets_func(request, *args, **kwargs),
+            [path_func() for path_func in files],
+        )
+
+    return condition(etag_func=etag)
+
+
+def conditional_on_file(path_func):
+    """Decorate a view so it answers conditional GETs from a file's stat."""
+    def validators(request, *args, **kwargs):
+        return _cached(
+            request,
+            path_func,
+            lambda: file_validators(request, path_func(request, *args, **kwargs)),
+        )
+
+    return condition(
+        etag_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs)[0],
+        last_modified_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs)[1],
+    )
@@ -0,0 +1,242 @@
+"""
+Buffered, coalesced counters for view and download tallies.
+
+Counting a panorama view used to load the row, add one and
+``save(update_fields=...)`` it on every page view: concurrent hits lost
+increments, every view cost a write transaction, and each save
+invalidated every cached response built from the model. Instead,
+:func:`increment` adds to a buffer and :func:`flush` writes all buffered
+deltas of a model and field in a single statement::
+
+    UPDATE ... SET view_count = view_count + CASE id WHEN 1 THEN 3 WHEN 7 THEN 1 END
+    WHERE id IN (1, 7)
+
+which is atomic in the database, so nothing is lost to races.
+
+``COUNTER_BACKEND`` chooses the buffer:
+
+* ``'memory'`` (default): per process. A crash loses at most the last
+  ``COUNTER_FLUSH_INTERVAL`` seconds (and at most ``COUNTER_MAX_PENDING``
+  counters) of that process's increments;
+* ``'cache'``: deltas are kept in the shared cache, so every process sees
+  every pending delta and a crashed worker's deltas are flushed by the
+  next process that increments the same counter.
+
+Buffers are flushed ``COUNTER_FLUSH_INTERVAL`` seconds after the first
+pending increment, when ``COUNTER_MAX_PENDING`` counters are pending, and
+at interpreter exit. An interval of 0 writes every increment straight
+through (still as an atomic ``F()`` update).
+
+Counter writes do not bump cache generations, so cached responses may
+show counts up to ``RESPONSE_CACHE_TIMEOUT`` old. The ``increment_*``
+model methods also add to the instance's loaded attribute, and the API
+shows :func:`current` counts (the loaded value plus the pending delta).
+"""
+
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Case, F, Value, When
+
+logger = logging.getLogger('monastery360.counters')
+
+CACHE_PREFIX = 'counter'
+
+
+def _key(obj, field):
+    return (obj._meta.label, obj.pk, field)
+
+
+class MemoryBuffer:
+    """Pending deltas in this process."""
+
+    def __init__(self):
+        self._deltas = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, key, amount):
+        with self._lock:
+            self._deltas[key] += amount
+            return len(self._deltas)
+
+    def pending(self, key):
+        return self._deltas.get(key, 0)
+
+    def drain(self):
+        with self._lock:
+            deltas, self._deltas = dict(self._deltas), defaultdict(int)
+        return deltas
+
+
+class CacheBuffer:
+    """
+    Pending deltas in the shared cache.
+
+    Each process remembers which counters it touched and drains those:
+    it reads the shared delta and subtracts what it read, so increments
+    that race with the flush stay pending. ``incr``/``decr`` are atomic on
+    Redis and memcached.
+    """
+
+    def __init__(self):
+        self._touched = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(key):
+        label, pk, field = key
+        return f'{CACHE_PREFIX}:{label.lower()}:{pk}:{field}'
+
+    def add(self, key, amount):
+        cache_key = self.cache_key(key)
+        cache.add(cache_key, 0, timeout=None)
+        cache.incr(cache_key, amount)
+        with self._lock:
+            self._touched.add(key)
+            return len(self._touched)
+
+    def pending(self, key):
+        return cache.get(self.cache_key(key), 0)
+
+    def drain(self):
+        with self._lock:
+            keys, self._touched = self._touched, set()
+        values = cache.get_many([self.cache_key(key) for key in keys])
+        deltas = {}
+        for key in keys:
+            amount = values.get(self.cache_key(key), 0)
+            if amount:
+                cache.decr(self.cache_key(key), amount)
+                deltas[key] = amount
+        return deltas
+
+
+BUFFERS = {
+    'memory': MemoryBuffer,
+    'cache': CacheBuffer,
+}
+
+
+def apply(deltas):
+    """Write ``{(model label, pk, field): delta}`` with one UPDATE per model and field."""
+    grouped = defaultdict(dict)
+    for (label, pk, field), amount in deltas.items():
+        if amount:
+            grouped[label, field][pk] = amount
+
+    with transaction.atomic():
+        for (label, field), amounts in grouped.items():
+            model = apps.get_model(label)
+            increment = Case(
+                *(When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()),
+                default=Value(0),
+            )
+            model._default_manager.filter(pk__in=list(amounts)).update(**{field: F(field) + increment})
+
+
+class Counters:
+    """The process's counter buffer and its flush schedule."""
+
+    def __init__(self):
+        self._buffer = None
+        self._backend = None
+        self._timer = None
+        self._lock = threading.Lock()
+        atexit.register(self._flush_at_exit)
+
+    @property
+    def buffer(self):
+        if self._backend != settings.COUNTER_BACKEND:
+            self.flush()
+            self._buffer = BUFFERS[settings.COUNTER_BACKEND]()
+            self._backend = settings.COUNTER_BACKEND
+        return self._buffer
+
+    def increment(self, obj, field, amount=1):
+        if settings.COUNTER_FLUSH_INTERVAL <= 0:
+            apply({_key(obj, field): amount})
+            return
+
+        size = self.buffer.add(_key(obj, field), amount)
+        if size >= settings.COUNTER_MAX_PENDING:
+            self.flush()
+        else:
+            self._schedule()
+
+    def pending(self, obj, field):
+        if self._buffer is None:
+            return 0
+        return self.buffer.pending(_key(obj, field))
+
+    def flush(self):
+        """Write every pending delta; returns the number of counters written."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if self._buffer is None:
+            return 0
+        deltas = self._buffer.drain()
+        if not deltas:
+            return 0
+        try:
+            apply(deltas)
+        except Exception:
+            # Keep the deltas for the next flush rather than losing them
+            for key, amount in deltas.items():
+                self._buffer.add(key, amount)
+            raise
+        return len(deltas)
+
+    def _schedule(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(settings.COUNTER_FLUSH_INTERVAL, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_in_background(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Counter flush failed')
+        finally:
+            # This thread opened its own connections; don't leak them
+            connections.close_all()
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Counter flush at exit failed')
+
+
+counters = Counters()
+
+
+def increment(obj, field, amount=1):
+    """Add ``amount`` to ``obj``'s counter ``field``, buffered."""
+    counters.increment(obj, field, amount)
+
+
+def pending(obj, field):
+    """Return the not yet flushed delta of ``obj``'s counter ``field``."""
+    return counters.pending(obj, field)
+
+
+def current(obj, field):
+    """Return ``obj``'s loaded ``field`` value plus its pending delta."""
+    return getattr(obj, field) + pending(obj, field)
+
+
+def flush():
+    """Write every pending counter delta now."""
+    return counters.flush()
@@ -0,0 +1,99 @@
+"""
+In-memory cache of the JSON data files served by views.
+
+``archives_api`` used to open and ``json.load`` ``archives.json`` on every
+request only to re-encode it, and the pano detail page reloaded
+``monasteries.json`` and scanned it for a ``panoId``. :func:`load` parses a
+file once and keeps, per path and ``index`` function:
+
+* ``data``: the parsed document (treat it as read-only, it is shared);
+* ``content``: the document re-serialized once, compactly, so views can
+  return the bytes as they are;
+* ``index``: whatever the file's ``index`` function built from ``data``,
+  e.g. a ``panoId`` to monastery mapping (see :func:`keyed`).
+
+Callers loading the same path with different ``index`` functions (or
+none) each get their own entry, so pass the same function object every
+time; :func:`keyed` returns one per ``(collection, key)``.
+
+Every :func:`load` stats the file and reparses it only when its mtime or
+size changed, so a rebuilt snapshot (written by rename, see
+``core.snapshots``) is picked up by the next request.
+"""
+
+import functools
+import json
+import os
+import threading
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+DataFile = namedtuple('DataFile', ['path', 'data', 'content', 'index', 'mtime_ns', 'size'])
+
+_files = {}
+_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def keyed(collection, key):
+    """Index function mapping ``data[collection][i][key]`` to the entry."""
+    def index(data):
+        return {entry[key]: entry for entry in data[collection]}
+    return index
+
+
+def _parse(path, stat, index):
+    with open(path, 'rb') as f:
+        data = json.load(f)
+    content = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return DataFile(
+        path=path,
+        data=data,
+        content=content,
+        index=index(data) if index else None,
+        mtime_ns=stat.st_mtime_ns,
+        size=stat.st_size,
+    )
+
+
+def load(path, index=None):
+    """
+    Return the :class:`DataFile` for ``path``, reparsing it if it changed.
+
+    Raises ``OSError`` if the file cannot be read and ``ValueError`` if it
+    is not valid JSON; ``index`` errors (e.g. ``KeyError``) propagate too.
+    """
+    stat = os.stat(path)
+    entry = _files.get((path, index))
+    if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+        return entry
+
+    with _lock:
+        # Another thread may have reloaded it while we waited
+        entry = _files.get((path, index))
+        if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            return entry
+        entry = _parse(path, stat, index)
+        _files[(path, index)] = entry
+        return entry
+
+
+def version(path):
+    """
+    Return ``(mtime_ns, size)`` of ``path``, what :func:`load` reloads on.
+
+    Returns ``None`` if the file cannot be stat'ed; views that fall back
+    on a missing file still get a stable validator.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def clear():
+    """Forget every cached file."""
+    with _lock:
+        _files.clear()
@@ -0,0 +1,241 @@
+"""
+Database-native full-text search for Monastery360.
+
+One query API over the database's own full-text engine:
+
+* PostgreSQL: a generated, stored ``search_vector`` tsvector column per
+  searchable table (title-like fields weighted above descriptions) with a
+  GIN index, matched with ``@@`` and ranked with ``ts_rank_cd``;
+* SQLite: an external-content FTS5 table per searchable table, kept in
+  sync by triggers, matched with ``MATCH`` and ranked with ``bm25()``;
+* anything else: ``icontains`` over the same fields, unranked.
+
+The engines tokenize with one configuration for every language, so
+queries containing Devanagari are matched and ranked by the analyzed
+in-process index instead (``core.search.analyzed_language``), which
+folds spelling variants and strips Hindi and Nepali inflections.
+
+The searchable fields and their weights are those of
+``core.search.SEARCH_TYPES``. The columns, tables and triggers are
+vendor-specific, so they are not part of the models; :func:`install` creates
+whatever is missing after every ``migrate`` (SQLite table rebuilds drop
+triggers). Changing a type's fields means dropping its PostgreSQL
+``search_vector`` column or SQLite FTS table and migrating again.
+"""
+
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .search import SEARCH_TYPES_BY_LABEL, analyzed_language, search_index, tokenize
+
+SEARCH_VECTOR_COLUMN = 'search_vector'
+
+
+def _weight_letter(weight):
+    """Map a field weight to a PostgreSQL tsvector weight class."""
+    if weight >= 3:
+        return 'A'
+    if weight >= 2:
+        return 'B'
+    return 'C'
+
+
+def _search_type(model):
+    return SEARCH_TYPES_BY_LABEL[model._meta.label_lower]
+
+
+class ContainsBackend:
+    """Fallback for databases without a supported full-text engine."""
+
+    def install(self, connection, model, fields):
+        pass
+
+    def matching(self, model, fields, terms):
+        conditions = [
+            reduce(or_, (Q(**{f'{field}__icontains': term}) for field in fields))
+            for term in terms
+        ]
+        return model.objects.filter(*conditions).values('pk')
+
+    def rank(self, model, fields, terms):
+        return Value(0.0, output_field=FloatField())
+
+
+class PostgresBackend:
+    """Generated tsvector columns with GIN indexes."""
+
+    def _tsquery(self, terms):
+        # Every term must match; prefixes match so partially typed words work
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def install(self, connection, model, fields):
+        table = model._meta.db_table
+        config = settings.SEARCH_TEXT_CONFIG
+        vector = ' || '.join(
+            f"setweight(to_tsvector('{config}'::regconfig, coalesce({connection.ops.quote_name(field)}, '')), "
+            f"'{_weight_letter(weight)}')"
+            for field, weight in fields.items()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ALTER TABLE {connection.ops.quote_name(table)} '
+                f'ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR_COLUMN} tsvector '
+                f'GENERATED ALWAYS AS ({vector}) STORED'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {table}_{SEARCH_VECTOR_COLUMN}_gin '
+                f'ON {connection.ops.quote_name(table)} USING GIN ({SEARCH_VECTOR_COLUMN})'
+            )
+
+    def matching(self, model, fields, terms):
+        table = model._meta.db_table
+        return RawSQL(
+            f'SELECT "id" FROM "{table}" '
+            f'WHERE {SEARCH_VECTOR_COLUMN} @@ to_tsquery(%s::regconfig, %s)',
+            [settings.SEARCH_TEXT_CONFIG, self._tsquery(terms)],
+        )
+
+    def rank(self, model, fields, terms):
+        table = model._meta.db_table
+        return RawSQL(
+            f'ts_rank_cd("{table}".{SEARCH_VECTOR_COLUMN}, to_tsquery(%s::regconfig, %s))',
+            [settings.SEARCH_TEXT_CONFIG, self._tsquery(terms)],
+            output_field=FloatField(),
+        )
+
+
+class SQLiteBackend:
+    """External-content FTS5 tables maintained by triggers."""
+
+    def _fts_table(self, model):
+        return f'{model._meta.db_table}_fts'
+
+    def _match(self, terms):
+        # Terms are alphanumeric (see tokenize); quoting keeps FTS5 syntax out
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    def install(self, connection, model, fields):
+        table = model._meta.db_table
+        fts = self._fts_table(model)
+        columns = ', '.join(f'"{field}"' for field in fields)
+        new_values = ', '.join(f'new."{field}"' for field in fields)
+        old_values = ', '.join(f'old."{field}"' for field in fields)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts])
+            created = cursor.fetchone() is None
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS "{fts}" USING fts5('
+                f"{columns}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+                f'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new."id", {new_values}); END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+                f'INSERT INTO "{fts}"("{fts}", rowid, {columns}) '
+                f"VALUES ('delete', old.\"id\", {old_values}); END"
+            )
+            # Only text changes re-index a row, not e.g. view counter updates
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS "{fts}_au" AFTER UPDATE OF {columns} ON "{table}" BEGIN '
+                f'INSERT INTO "{fts}"("{fts}", rowid, {columns}) '
+                f"VALUES ('delete', old.\"id\", {old_values}); "
+                f'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new."id", {new_values}); END'
+            )
+            if not created:
+                return
+            # Index the rows that existed before the table did
+            cursor.execute(f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')')
+
+    def matching(self, model, fields, terms):
+        fts = self._fts_table(model)
+        return RawSQL(f'SELECT rowid FROM "{fts}" WHERE "{fts}" MATCH %s', [self._match(terms)])
+
+    def rank(self, model, fields, terms):
+        table = model._meta.db_table
+        fts = self._fts_table(model)
+        weights = ', '.join(str(float(weight)) for weight in fields.values())
+        # bm25() is lower-is-better; negate it so every backend sorts descending
+        return RawSQL(
+            f'(SELECT -bm25("{fts}", {weights}) FROM "{fts}" '
+            f'WHERE "{fts}" MATCH %s AND rowid = "{table}"."id")',
+            [self._match(terms)],
+            output_field=FloatField(),
+        )
+
+
+BACKENDS = {
+    'postgresql': PostgresBackend(),
+    'sqlite': SQLiteBackend(),
+}
+
+
+def get_backend(using='default'):
+    return BACKENDS.get(connections[using].vendor, ContainsBackend())
+
+
+def install(using='default'):
+    """Create the full-text columns, tables and triggers that are missing."""
+    connection = connections[using]
+    backend = get_backend(using)
+    for search_type in SEARCH_TYPES_BY_LABEL.values():
+        backend.install(connection, search_type.model, search_type.fields)
+
+
+def _analyzed_hits(queryset, query, language):
+    """Index hits for a query the database cannot match, or ``None``."""
+    language = analyzed_language(query, language)
+    if language is None:
+        return None
+    return search_index.rank(_search_type(queryset.model).name, query, language)
+
+
+def matching(queryset, query, language=None):
+    """
+    Narrow ``queryset`` to rows matching every term of ``query``.
+
+    Composes like any other filter (it is a ``pk__in`` subquery), so it can
+    be combined with ``Q`` objects or used on related models. Devanagari
+    queries are analyzed for ``language`` (default: the active one).
+    """
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+    hits = _analyzed_hits(queryset, query, language)
+    if hits is not None:
+        return queryset.filter(pk__in=[doc_id for doc_id, _ in hits])
+    search_type = _search_type(queryset.model)
+    backend = get_backend(queryset.db)
+    return queryset.filter(pk__in=backend.matching(queryset.model, search_type.fields, terms))
+
+
+def ranked(queryset, query, language=None):
+    """Filter like :func:`matching`, annotate ``search_rank`` and order best first."""
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none()
+    hits = _analyzed_hits(queryset, query, language)
+    if hits is not None:
+        if not hits:
+            return queryset.none()
+        rank = Case(
+            *(When(pk=doc_id, then=Value(score)) for doc_id, score in hits),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=[doc_id for doc_id, _ in hits]).annotate(
+            search_rank=rank,
+        ).order_by('-search_rank', 'pk')
+    search_type = _search_type(queryset.model)
+    backend = get_backend(queryset.db)
+    return matching(queryset, query, language).annotate(
+        search_rank=backend.rank(queryset.model, search_type.fields, terms),
+    ).order_by('-search_rank', 'pk')
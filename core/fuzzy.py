@@ -0,0 +1,203 @@
+"""
+Trigram fuzzy matching for "did you mean" suggestions.
+
+Names are transliterated many ways (Rumtek/Rumtech, Tashiding/Tashiding
+Gompa), so when a search finds nothing the closest monastery names,
+districts, event titles and archive titles are offered instead.
+
+Similarity is pg_trgm's: the share of three-letter sequences two strings
+have in common. On PostgreSQL with the ``pg_trgm`` extension the database
+does the matching through GIN trigram indexes; elsewhere an in-process
+trigram index is used. Either way, only rows sharing trigrams with the
+query are considered, never the whole table.
+"""
+
+import logging
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .cache import ModelDerived
+from .search import SEARCH_TYPES, TOKEN_RE
+
+logger = logging.getLogger('monastery360.fuzzy')
+
+# Fields matched per search type
+FUZZY_FIELDS = {
+    'monasteries': ['name', 'district'],
+    'events': ['title'],
+    'archive_items': ['title'],
+}
+
+DEFAULT_LIMIT = 5
+
+# Seconds between rebuilds of the in-process index
+REBUILD_INTERVAL = 5.0
+
+
+def trigrams(text):
+    """Return pg_trgm-style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in TOKEN_RE.findall(text.casefold()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """Trigram similarity of two strings, 0 to 1."""
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class TrigramIndex:
+    """
+    Trigram postings over short strings (titles, names).
+
+    Every value is indexed whole and word by word, so "tashiding gompa"
+    still finds "Tashiding Monastery" through its first word.
+    """
+
+    def __init__(self, rows):
+        self.keys = []
+        self.postings = defaultdict(list)
+        for doc_id, values in rows:
+            for value in values:
+                for key in self._keys(value):
+                    grams = trigrams(key)
+                    if not grams:
+                        continue
+                    key_id = len(self.keys)
+                    self.keys.append((doc_id, len(grams)))
+                    for gram in grams:
+                        self.postings[gram].append(key_id)
+
+    @staticmethod
+    def _keys(value):
+        words = TOKEN_RE.findall(value or '')
+        return {value or ''} | ({word for word in words if len(word) > 2} if len(words) > 1 else set())
+
+    def search(self, query, threshold, limit):
+        """Return ``[(doc_id, score), ...]`` scoring at least ``threshold``, best first."""
+        scores = {}
+        for key in self._keys(query):
+            grams = trigrams(key)
+            shared = Counter()
+            for gram in grams:
+                for key_id in self.postings.get(gram, ()):
+                    shared[key_id] += 1
+            for key_id, count in shared.items():
+                doc_id, size = self.keys[key_id]
+                score = count / (len(grams) + size - count)
+                if score >= threshold and score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def _build_indexes():
+    indexes = {}
+    for name, fields in FUZZY_FIELDS.items():
+        search_type = SEARCH_TYPES[name]
+        rows = search_type.model.objects.filter(**search_type.visible).values_list('pk', *fields)
+        indexes[name] = TrigramIndex((row[0], row[1:]) for row in rows.iterator())
+    return indexes
+
+
+_memory_indexes = ModelDerived(
+    [search_type.model for search_type in SEARCH_TYPES.values()],
+    _build_indexes,
+    rebuild_interval=REBUILD_INTERVAL,
+)
+
+
+def _has_pg_trgm(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    if not hasattr(connection, '_monastery360_pg_trgm'):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            connection._monastery360_pg_trgm = cursor.fetchone() is not None
+    return connection._monastery360_pg_trgm
+
+
+def install(using='default'):
+    """Enable pg_trgm and create trigram indexes on PostgreSQL."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        logger.warning('pg_trgm is not available; fuzzy matching will run in-process')
+        return
+    connection._monastery360_pg_trgm = True
+
+    with connection.cursor() as cursor:
+        for name, fields in FUZZY_FIELDS.items():
+            table = SEARCH_TYPES[name].model._meta.db_table
+            for field in fields:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{table}_{field}_trgm" '
+                    f'ON "{table}" USING GIN ("{field}" gin_trgm_ops)'
+                )
+
+
+def _similar_in_database(search_type, fields, query, limit):
+    table = search_type.model._meta.db_table
+    # "%" and "<%" are pg_trgm's indexable similarity operators (doubled
+    # for the DB-API); GREATEST scores the best matching field
+    condition = ' OR '.join(f'"{field}" %% %s OR %s <%% "{field}"' for field in fields)
+    score = ', '.join(
+        f'similarity("{table}"."{field}", %s), word_similarity(%s, "{table}"."{field}")'
+        for field in fields
+    )
+    params = [query, query] * len(fields)
+    return list(
+        search_type.results_queryset()
+        .filter(pk__in=RawSQL(f'SELECT "id" FROM "{table}" WHERE {condition}', params))
+        .annotate(fuzzy_score=RawSQL(f'GREATEST({score})', params, output_field=FloatField()))
+        .filter(fuzzy_score__gte=settings.FUZZY_THRESHOLD)
+        .order_by('-fuzzy_score', 'pk')[:limit]
+    )
+
+
+def similar(type_name, query, limit=DEFAULT_LIMIT):
+    """Return up to ``limit`` visible rows of ``type_name`` resembling ``query``."""
+    query = query.strip()
+    if not query:
+        return []
+
+    search_type = SEARCH_TYPES[type_name]
+    fields = FUZZY_FIELDS[type_name]
+    queryset = search_type.results_queryset()
+    if _has_pg_trgm(connections[queryset.db]):
+        return _similar_in_database(search_type, fields, query, limit)
+
+    ranked = _memory_indexes.get()[type_name].search(query, settings.FUZZY_THRESHOLD, limit)
+    objects = queryset.in_bulk([doc_id for doc_id, _ in ranked])
+    results = []
+    for doc_id, score in ranked:
+        obj = objects.get(doc_id)
+        if obj is not None:
+            obj.fuzzy_score = score
+            results.append(obj)
+    return results
+
+
+def did_you_mean(query, limit=DEFAULT_LIMIT):
+    """Return the closest matches across all types, as ``(type_name, obj)`` pairs."""
+    matches = [
+        (type_name, obj)
+        for type_name in FUZZY_FIELDS
+        for obj in similar(type_name, query, limit)
+    ]
+    matches.sort(key=lambda match: -match[1].fuzzy_score)
+    return matches[:limit]
@@ -0,0 +1,168 @@
+"""
+Lightweight spatial indexing for Monastery360 (GeoDjango is disabled).
+
+Coordinates are indexed by geohash: each row stores the geohash of its
+latitude/longitude, and a region query becomes a handful of indexed
+``geohash LIKE 'prefix%'`` lookups for the cells covering the region.
+Candidates are then ranked by exact great-circle distance, vectorized
+with numpy when it is installed.
+"""
+
+import math
+
+from django.db.models import Q
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; fall back to pure Python
+    np = None
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5 m cells, plenty for POIs within a monastery
+EARTH_RADIUS_KM = 6371.0088
+
+# Upper bound on cells per query; coarser cells are used beyond this
+MAX_COVERING_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point, or ``''`` if either coordinate is missing."""
+    if latitude is None or longitude is None:
+        return ''
+
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return ``(height_deg, width_deg)`` of a geohash cell."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return ``(south, west, north, east)`` enclosing a circle."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    lng_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (
+        max(latitude - lat_delta, -90.0),
+        max(longitude - lng_delta, -180.0),
+        min(latitude + lat_delta, 90.0),
+        min(longitude + lng_delta, 180.0),
+    )
+
+
+def covering_cells(south, west, north, east, max_cells=MAX_COVERING_CELLS):
+    """
+    Return geohash prefixes whose cells together cover the bounding box.
+
+    Picks the finest precision that needs at most ``max_cells`` cells, so
+    the database reads few rows outside the box.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = int(math.floor(north / height) - math.floor(south / height)) + 1
+        cols = int(math.floor(east / width) - math.floor(west / width)) + 1
+        if rows * cols <= max_cells:
+            break
+
+    cells = set()
+    for row in range(rows):
+        lat = min(south + row * height, north)
+        for col in range(cols):
+            lng = min(west + col * width, east)
+            cells.add(encode_geohash(lat, lng, precision))
+        cells.add(encode_geohash(lat, east, precision))
+    for col in range(cols):
+        cells.add(encode_geohash(north, min(west + col * width, east), precision))
+    cells.add(encode_geohash(north, east, precision))
+    return sorted(cells)
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Return great-circle distances (km) from one point to many."""
+    if not latitudes:
+        return []
+
+    if np is not None:
+        lat1 = np.radians(latitude)
+        lat2 = np.radians(np.asarray(latitudes, dtype=float))
+        dlat = lat2 - lat1
+        dlng = np.radians(np.asarray(longitudes, dtype=float) - longitude)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).tolist()
+
+    lat1 = math.radians(latitude)
+    distances = []
+    for lat, lng in zip(latitudes, longitudes):
+        lat2 = math.radians(lat)
+        dlat = lat2 - lat1
+        dlng = math.radians(lng - longitude)
+        a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a)))
+    return distances
+
+
+def cell_filter(cells, field='geohash'):
+    """Build a ``Q`` matching rows whose geohash starts with any cell."""
+    condition = Q()
+    for cell in cells:
+        condition |= Q(**{f'{field}__startswith': cell})
+    return condition
+
+
+def within_bbox(queryset, south, west, north, east):
+    """Narrow ``queryset`` to rows inside a bounding box using the geohash index."""
+    return queryset.filter(
+        cell_filter(covering_cells(south, west, north, east)),
+        latitude__gte=south,
+        latitude__lte=north,
+        longitude__gte=west,
+        longitude__lte=east,
+    )
+
+
+def nearest(queryset, latitude, longitude, radius_km, limit=None):
+    """
+    Return ``[(obj, distance_km), ...]`` within ``radius_km``, nearest first.
+
+    The database only returns rows from the covering cells; exact
+    distances are computed for those candidates in one vectorized pass.
+    """
+    candidates = list(within_bbox(queryset, *bounding_box(latitude, longitude, radius_km)))
+    distances = haversine_km(
+        latitude,
+        longitude,
+        [obj.latitude for obj in candidates],
+        [obj.longitude for obj in candidates],
+    )
+    ranked = sorted(
+        ((obj, distance) for obj, distance in zip(candidates, distances) if distance <= radius_km),
+        key=lambda pair: pair[1],
+    )
+    return ranked[:limit] if limit else ranked
@@ -0,0 +1,369 @@
+"""
+Responsive image derivatives for uploaded images.
+
+Uploaded images (``Monastery.image``, ``Panorama.image``/``thumbnail``,
+``Event.image``, ``ArchiveItem.image``) are served at whatever size they
+were uploaded, which is far more than a card on a phone needs. When one
+of them is saved, each width in ``IMAGE_DERIVATIVE_WIDTHS`` is generated
+in every format of ``IMAGE_DERIVATIVE_FORMATS`` that Pillow can encode
+here (AVIF needs Pillow 11.3+ or the ``pillow-avif-plugin``):
+
+* decoding, resizing and encoding run in a pool of
+  ``IMAGE_DERIVATIVE_WORKERS`` processes, driven by one background thread,
+  so neither the request nor the GIL is held while images are encoded
+  (``0`` encodes synchronously once the transaction commits). Workers
+  open the source files themselves, and only a few images per worker are
+  queued at a time, so a large batch of scans is never held in memory;
+* files are stored as ``derivatives/<aa>/<stem>-<width>w.<hash>.<ext>``
+  with a hash of the encoded bytes, so they match
+  ``MEDIA_IMMUTABLE_FILE_TEST`` and are cached for a year;
+* an image already processed under another name (the same bytes uploaded
+  twice) reuses the existing files;
+* a panorama without a hand-made thumbnail gets one from its derivatives.
+
+Rows are recorded as :class:`core.models.ImageDerivative`; templates and
+the API read them through :func:`srcset` and :func:`picture_sources`,
+which use an in-process index rebuilt when derivatives change, so
+rendering them costs no queries.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import ModelDerived, bump_generation
+from .models import ImageDerivative
+
+logger = logging.getLogger('monastery360.images')
+
+# Image fields that get derivatives, by model label
+IMAGE_FIELDS = {
+    'core.Monastery': ['image'],
+    'tours.Panorama': ['image', 'thumbnail'],
+    'events.Event': ['image'],
+    'archives.ArchiveItem': ['image'],
+}
+
+DERIVATIVE_DIR = 'derivatives'
+
+# Pillow format names and MIME types, in order of preference
+FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+# Width of the thumbnail generated for panoramas without one
+PANORAMA_THUMBNAIL_WIDTH = 640
+
+# Images queued per pool worker; the rest wait for a worker to finish
+QUEUED_PER_WORKER = 2
+
+
+def available_formats():
+    """Return the configured formats Pillow can encode, best first."""
+    Image.init()
+    configured = set(settings.IMAGE_DERIVATIVE_FORMATS)
+    return [
+        name for name, (pil_format, _) in FORMATS.items()
+        if name in configured and pil_format in Image.SAVE
+    ]
+
+
+def image_fields(model):
+    """Return the names of ``model``'s image fields that get derivatives."""
+    return IMAGE_FIELDS.get(model._meta.label, [])
+
+
+def is_derivative(name):
+    """Whether the storage ``name`` is itself a derivative."""
+    return name.startswith(DERIVATIVE_DIR + '/')
+
+
+def encode_derivatives(source, widths, formats, quality):
+    """
+    Resize and encode an image (runs in a worker process).
+
+    ``source`` is the image's path, or its bytes for storages without
+    local files.
+    Returns ``[(width, height, format, bytes)]``. Widths wider than the
+    image are skipped; an image narrower than every width is encoded at
+    its own size, so it still gets the smaller formats.
+    """
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        largest = max(widths)
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale, far faster than a full decode
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    source_width, source_height = image.size
+    targets = sorted({width for width in widths if width <= source_width}, reverse=True)
+    if not targets:
+        targets = [source_width]
+
+    results = []
+    for width in targets:
+        height = max(1, round(source_height * width / source_width))
+        if image.size != (width, height):
+            # Each size is reduced from the previous, larger one
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        for name in formats:
+            buffer = io.BytesIO()
+            image.save(buffer, FORMATS[name][0], quality=quality)
+            results.append((width, height, name, buffer.getvalue()))
+    return results
+
+
+def derivative_name(source, source_hash, width, format, data):
+    """Return the content-hashed storage name of one derivative."""
+    stem = os.path.splitext(os.path.basename(source))[0][:40] or 'image'
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    return f'{DERIVATIVE_DIR}/{source_hash[:2]}/{stem}-{width}w.{digest}.{format}'
+
+
+def _read(storage, name):
+    with storage.open(name, 'rb') as f:
+        return f.read()
+
+
+def _hash(storage, name):
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as f:
+        for chunk in f.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source(storage, name):
+    """What ``encode_derivatives`` opens: the file's path if it has one, else its bytes."""
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return _read(storage, name)
+
+
+def _save_file(storage, name, data):
+    # Names are content hashes: an existing file already holds these bytes
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(data))
+    return name
+
+
+def generate_derivatives(files, executor=None):
+    """
+    Create the missing derivatives for ``files``, a list of ``FieldFile``.
+
+    Images are encoded in ``executor`` (a process pool) when given, in
+    this process otherwise. Returns the number of derivative rows created.
+    """
+    widths = sorted(settings.IMAGE_DERIVATIVE_WIDTHS)
+    formats = available_formats()
+    if not widths or not formats:
+        return 0
+
+    names = [f.name for f in files if f and not is_derivative(f.name)]
+    done = set(
+        ImageDerivative.objects.filter(source__in=names).values_list('source', flat=True).distinct()
+    )
+    storage = ImageDerivative._meta.get_field('file').storage
+
+    rows = []
+    pending = deque()
+    # Bounds the results (and non-local sources) waiting in memory
+    max_pending = QUEUED_PER_WORKER * max(getattr(executor, '_max_workers', 1), 1)
+
+    def collect(source, source_hash, work):
+        try:
+            encoded = work.result() if executor is not None else encode_derivatives(*work)
+        except Exception:
+            logger.exception('Cannot encode derivatives of %s', source)
+            return
+        for width, height, format, data in encoded:
+            name = _save_file(storage, derivative_name(source, source_hash, width, format, data), data)
+            rows.append(ImageDerivative(
+                source=source, source_hash=source_hash, width=width,
+                height=height, format=format, file=name,
+            ))
+
+    for f in files:
+        if not f or is_derivative(f.name) or f.name in done:
+            continue
+        done.add(f.name)
+        try:
+            source_hash = _hash(f.storage, f.name)
+        except OSError:
+            logger.warning('Cannot read image %s', f.name)
+            continue
+
+        # The same bytes under another name: share its files
+        twin = ImageDerivative.objects.filter(source_hash=source_hash).exclude(source=f.name).first()
+        if twin is not None:
+            rows.extend(
+                ImageDerivative(
+                    source=f.name, source_hash=source_hash, width=copy.width,
+                    height=copy.height, format=copy.format, file=copy.file.name,
+                )
+                for copy in ImageDerivative.objects.filter(source=twin.source)
+            )
+            continue
+
+        args = (_source(f.storage, f.name), widths, formats, settings.IMAGE_DERIVATIVE_QUALITY)
+        if executor is None:
+            collect(f.name, source_hash, args)
+            continue
+        pending.append((f.name, source_hash, executor.submit(encode_derivatives, *args)))
+        if len(pending) >= max_pending:
+            collect(*pending.popleft())
+
+    while pending:
+        collect(*pending.popleft())
+
+    if rows:
+        ImageDerivative.objects.bulk_create(rows, ignore_conflicts=True)
+        bump_generation(ImageDerivative)
+        _index.invalidate()
+    return len(rows)
+
+
+def _panorama_thumbnail(panorama):
+    """Name of the derivative to use as ``panorama``'s thumbnail, if any."""
+    formats = available_formats()
+    if not panorama.image or not formats:
+        return None
+    candidates = sorted(
+        ImageDerivative.objects.filter(source=panorama.image.name, format=formats[-1])
+        .values_list('width', 'file')
+    )
+    # The widest that fits, or else the narrowest there is
+    fitting = [c for c in candidates if c[0] <= PANORAMA_THUMBNAIL_WIDTH]
+    if fitting:
+        return fitting[-1][1]
+    return candidates[0][1] if candidates else None
+
+
+def build_for_object(model, pk, executor=None):
+    """
+    Create the missing derivatives for one row's images.
+
+    Touches the row's ``updated_at`` and cache generation when anything was
+    created, so cached responses and ETags pick up the new ``srcset``.
+    """
+    obj = model._default_manager.filter(pk=pk).first()
+    if obj is None:
+        return 0
+
+    created = generate_derivatives([getattr(obj, name) for name in image_fields(model)], executor)
+
+    changes = {}
+    if 'thumbnail' in image_fields(model) and (not obj.thumbnail or is_derivative(obj.thumbnail.name)):
+        # Only fill in or refresh a generated thumbnail, never a hand-made one
+        thumbnail = _panorama_thumbnail(obj)
+        if thumbnail and thumbnail != obj.thumbnail.name:
+            changes['thumbnail'] = thumbnail
+    if created or changes:
+        model._default_manager.filter(pk=pk).update(updated_at=timezone.now(), **changes)
+        bump_generation(model)
+    return created
+
+
+_pool = None
+_coordinator = None
+_pool_lock = threading.Lock()
+
+
+def _executors():
+    global _pool, _coordinator
+    with _pool_lock:
+        if _coordinator is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_DERIVATIVE_WORKERS)
+            _coordinator = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+    return _pool, _coordinator
+
+
+def _build_in_background(label, pk, pool):
+    try:
+        build_for_object(apps.get_model(label), pk, pool)
+    except Exception:
+        logger.exception('Image derivatives failed for %s #%s', label, pk)
+    finally:
+        # This thread opened its own connections; don't leak them
+        connections.close_all()
+
+
+def schedule(model, pk):
+    """Build ``pk``'s derivatives once the current transaction commits."""
+    label = model._meta.label
+
+    def run():
+        if settings.IMAGE_DERIVATIVE_WORKERS > 0:
+            pool, coordinator = _executors()
+            coordinator.submit(_build_in_background, label, pk, pool)
+            return
+        try:
+            build_for_object(model, pk)
+        except Exception:
+            logger.exception('Image derivatives failed for %s #%s', label, pk)
+
+    transaction.on_commit(run)
+
+
+def _build_index():
+    index = {}
+    rows = ImageDerivative.objects.values_list('source', 'format', 'width', 'file').order_by('width')
+    for source, format, width, name in rows:
+        index.setdefault(source, {}).setdefault(format, []).append((width, name))
+    return index
+
+
+_index = ModelDerived([ImageDerivative], _build_index)
+
+
+def derivatives(image):
+    """Return ``{format: [(width, url)]}`` for an image field value, best format first."""
+    if not image:
+        return {}
+    by_format = _index.get().get(image.name)
+    if not by_format:
+        return {}
+    storage = ImageDerivative._meta.get_field('file').storage
+    return {
+        format: [(width, storage.url(name)) for width, name in by_format[format]]
+        for format in FORMATS if format in by_format
+    }
+
+
+def srcset(image, format=None):
+    """
+    Return the ``srcset`` attribute value for ``image``.
+
+    ``format`` defaults to the most widely supported format available
+    (WebP), which every current browser can decode.
+    """
+    available = derivatives(image)
+    if not available:
+        return ''
+    return _srcset(available.get(format, ()) if format else list(available.values())[-1])
+
+
+def picture_sources(image):
+    """Return ``[{'type', 'srcset'}]`` for a ``<picture>`` element, best format first."""
+    return [
+        {'type': FORMATS[format][1], 'srcset': _srcset(candidates)}
+        for format, candidates in derivatives(image).items()
+    ]
+
+
+def _srcset(candidates):
+    return ', '.join(f'{url} {width}w' for width, url in candidates)
@@ -0,0 +1,85 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.cache import bump_generation
+from core.images import IMAGE_FIELDS, build_for_object, generate_derivatives, image_fields
+from core.models import ImageDerivative
+
+
+class Command(BaseCommand):
+    help = 'Generate the missing responsive derivatives of uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(settings.IMAGE_DERIVATIVE_WORKERS, 1),
+            help='Encoder processes (default: IMAGE_DERIVATIVE_WORKERS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Rows whose images are encoded together (default: 50)',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Also delete derivatives of images that are no longer used',
+        )
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for label in IMAGE_FIELDS:
+                model = apps.get_model(label)
+                created = self.build(model, pool, options['batch_size'])
+                self.stdout.write(f'{label}: {created} derivatives created')
+
+        if options['prune']:
+            self.stdout.write(f'Pruned {self.prune()} unused derivatives')
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def build(self, model, pool, batch_size):
+        fields = image_fields(model)
+        has_image = Q()
+        for name in fields:
+            has_image |= ~Q(**{name: ''})
+        pks = list(model._default_manager.filter(has_image).order_by('pk').values_list('pk', flat=True))
+
+        total = 0
+        for start in range(0, len(pks), batch_size):
+            batch = list(model._default_manager.filter(pk__in=pks[start:start + batch_size]).only(*fields))
+            created = generate_derivatives([getattr(obj, name) for obj in batch for name in fields], pool)
+            if created:
+                model._default_manager.filter(pk__in=[obj.pk for obj in batch]).update(updated_at=timezone.now())
+                bump_generation(model)
+            if 'thumbnail' in fields:
+                # Generated thumbnails come from the derivatives just built
+                for obj in batch:
+                    build_for_object(model, obj.pk)
+            total += created
+        return total
+
+    def prune(self):
+        used = set()
+        for label, fields in IMAGE_FIELDS.items():
+            for values in apps.get_model(label)._default_manager.values_list(*fields):
+                used.update(name for name in values if name)
+
+        stale = ImageDerivative.objects.exclude(source__in=used)
+        files = set(stale.values_list('file', flat=True))
+        count, _ = stale.delete()
+        # Files may be shared with another source's derivatives or be a panorama thumbnail
+        files -= set(ImageDerivative.objects.values_list('file', flat=True))
+        files -= used
+        storage = ImageDerivative._meta.get_field('file').storage
+        for name in files:
+            storage.delete(name)
+        if count:
+            bump_generation(ImageDerivative)
+        return count
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.search import search_index
+
+
+class Command(BaseCommand):
+    help = 'Build the full-text search index from the database and save it to SEARCH_INDEX_PATH'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='File to write the index to (default: SEARCH_INDEX_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        search_index.build()
+        search_index.save(options['output'])
+
+        for name, index in search_index.indexes.items():
+            self.stdout.write(f'{name}: {len(index)} documents, {len(index.postings)} terms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Done. Search index built in {time.monotonic() - started:.1f}s.'
+        ))
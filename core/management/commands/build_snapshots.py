@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.snapshots import SNAPSHOTS, build_snapshots, snapshot_root
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the static/data/*.json snapshots and manifest from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help=f"Snapshots to rebuild (default: all of {', '.join(SNAPSHOTS)})",
+        )
+        parser.add_argument(
+            '--output',
+            help='Directory to write to (default: SNAPSHOT_ROOT)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(SNAPSHOTS)
+        unknown = sorted(set(names) - set(SNAPSHOTS))
+        if unknown:
+            raise CommandError(f"Unknown snapshot(s): {', '.join(unknown)}")
+
+        directory = options['output'] or snapshot_root()
+        changed = build_snapshots(names=names, directory=directory)
+
+        for name in names:
+            status = 'updated' if name in changed else 'unchanged'
+            self.stdout.write(f'{name}: {status}')
+        self.stdout.write(self.style.SUCCESS(f'Done. Snapshots written to {directory}.'))
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_feedback_contactsubmission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(help_text="App label and model name of the deleted row (e.g. 'core.monastery')", max_length=100)),
+                ('object_id', models.PositiveBigIntegerField(help_text='Primary key of the deleted row')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the row was deleted')),
+            ],
+            options={
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='audiopoi',
+            index=models.Index(fields=['updated_at', 'id'], name='core_audiop_updated_e08e28_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monastery',
+            index=models.Index(fields=['updated_at', 'id'], name='core_monast_updated_4bda2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='core_tombst_deleted_ca6dfc_idx'),
+        ),
+    ]
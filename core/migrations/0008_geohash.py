@@ -0,0 +1,34 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:13
+
+from django.db import migrations, models
+
+from core.geo import encode_geohash
+
+
+def populate_geohash(apps, schema_editor):
+    for model_name in ('Monastery', 'AudioPOI'):
+        model = apps.get_model('core', model_name)
+        for obj in model.objects.exclude(latitude=None).exclude(longitude=None).iterator():
+            obj.geohash = encode_geohash(obj.latitude, obj.longitude)
+            obj.save(update_fields=['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tombstone_and_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiopoi',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of the coordinates, maintained on save for spatial lookups', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='monastery',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of the coordinates, maintained on save for spatial lookups', max_length=12),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
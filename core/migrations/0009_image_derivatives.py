@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, help_text='Storage name of the original image', max_length=255)),
+                ('source_hash', models.CharField(db_index=True, help_text="SHA-256 of the original image's bytes", max_length=64)),
+                ('width', models.PositiveIntegerField(help_text='Width in pixels')),
+                ('height', models.PositiveIntegerField(help_text='Height in pixels')),
+                ('format', models.CharField(help_text="Image format (e.g. 'webp', 'avif')", max_length=10)),
+                ('file', models.FileField(help_text='The encoded derivative', max_length=255, upload_to='derivatives/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['source', 'format', 'width'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagederivative',
+            constraint=models.UniqueConstraint(fields=('source', 'width', 'format'), name='unique_image_derivative'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:52
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name (cas/<sha256 prefix>/<sha256>.<ext>)', max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, help_text="SHA-256 of the file's bytes", max_length=64)),
+                ('size', models.PositiveBigIntegerField(help_text='Size in bytes')),
+                ('references', models.PositiveIntegerField(default=0, help_text='Stored field values using this file; removed at 0')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='audiopoi',
+            name='audio_file',
+            field=models.FileField(help_text='Audio file for this point of interest', storage=core.storage.content_storage, upload_to='audio/pois/'),
+        ),
+    ]
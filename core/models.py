@@ -12,6 +12,9 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils.text import slugify
 
+from .geo import encode_geohash
+from .storage import content_storage
+
 
 class Monastery(models.Model):
     """
@@ -57,6 +60,13 @@ class Monastery(models.Model):
         validators=[MinValueValidator(-180), MaxValueValidator(180)],
         help_text="Longitude coordinate"
     )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Geohash of the coordinates, maintained on save for spatial lookups"
+    )
 
     # Address information
     address = models.TextField(
@@ -128,14 +138,21 @@ class Monastery(models.Model):
     class Meta:
         ordering = ['name']
         verbose_name_plural = "Monasteries"
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        """Auto-generate slug from name if not provided."""
+        """Auto-generate slug from name and refresh the geohash."""
         if not self.slug:
             self.slug = slugify(self.name)
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -179,10 +196,18 @@ class AudioPOI(models.Model):
         validators=[MinValueValidator(-180), MaxValueValidator(180)],
         help_text="Longitude coordinate of this POI"
     )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Geohash of the coordinates, maintained on save for spatial lookups"
+    )
 
     # Audio content
     audio_file = models.FileField(
         upload_to='audio/pois/',
+        storage=content_storage,
         help_text="Audio file for this point of interest"
     )
     audio_duration = models.PositiveIntegerField(
@@ -210,10 +235,21 @@ class AudioPOI(models.Model):
         ordering = ['monastery', 'order', 'title']
         verbose_name = "Audio Point of Interest"
         verbose_name_plural = "Audio Points of Interest"
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.monastery.name} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        """Refresh the geohash from the coordinates."""
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
 
 # Contact and Feedback Models
 
@@ -309,3 +345,111 @@ class Feedback(models.Model):
         if self.rating:
             return '⭐' * self.rating
         return 'No rating'
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted content row, kept so offline clients can be told
+    to drop their copy during delta sync.
+    """
+
+    model_label = models.CharField(
+        max_length=100,
+        help_text="App label and model name of the deleted row (e.g. 'core.monastery')"
+    )
+    object_id = models.PositiveBigIntegerField(
+        help_text="Primary key of the deleted row"
+    )
+    deleted_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the row was deleted"
+    )
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label}#{self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class ImageDerivative(models.Model):
+    """
+    A resized, re-encoded copy of an uploaded image (see ``core.images``).
+
+    Derivatives are keyed by the source file's storage name; the file name
+    carries a hash of the encoded bytes, so its URL never changes content.
+    """
+
+    source = models.CharField(
+        max_length=255,
+        db_index=True,
+        help_text="Storage name of the original image"
+    )
+    source_hash = models.CharField(
+        max_length=64,
+        db_index=True,
+        help_text="SHA-256 of the original image's bytes"
+    )
+    width = models.PositiveIntegerField(
+        help_text="Width in pixels"
+    )
+    height = models.PositiveIntegerField(
+        help_text="Height in pixels"
+    )
+    format = models.CharField(
+        max_length=10,
+        help_text="Image format (e.g. 'webp', 'avif')"
+    )
+    file = models.FileField(
+        upload_to='derivatives/',
+        max_length=255,
+        help_text="The encoded derivative"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['source', 'format', 'width']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'width', 'format'],
+                name='unique_image_derivative',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.width}w {self.format}"
+
+
+class StoredFile(models.Model):
+    """
+    A file kept once by ``core.storage.ContentAddressedStorage``, with the
+    number of field values referencing it.
+    """
+
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Storage name (cas/<sha256 prefix>/<sha256>.<ext>)"
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        db_index=True,
+        help_text="SHA-256 of the file's bytes"
+    )
+    size = models.PositiveBigIntegerField(
+        help_text="Size in bytes"
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        help_text="Stored field values using this file; removed at 0"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
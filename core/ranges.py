@@ -0,0 +1,189 @@
+"""
+Byte-range file responses for large downloads.
+
+Archive scans run to hundreds of megabytes and are often fetched over
+unreliable links, so a dropped transfer must be resumable. This module
+serves a stored file with:
+
+* ``ETag`` and ``Last-Modified`` validators from the file's size and
+  modification time, and 304 answers to ``If-None-Match`` /
+  ``If-Modified-Since``;
+* ``Accept-Ranges: bytes`` and 206 Partial Content for a single
+  ``Range: bytes=`` range (multiple ranges are answered with the whole
+  file, which RFC 9110 allows);
+* ``If-Range``, so a resumed download only gets the remaining bytes if the
+  file has not changed in the meantime;
+* 416 Range Not Satisfiable for ranges past the end of the file.
+
+Bodies are sent through ``FileResponse``, so under a WSGI server with a
+``wsgi.file_wrapper`` (gunicorn) the bytes, ranges included, go out with
+``os.sendfile`` instead of being copied through Python.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$', re.IGNORECASE)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised for a syntactically valid range that lies outside the file."""
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a ``Range`` header, or ``None``.
+
+    ``None`` means the header is absent, malformed or asks for several
+    ranges, and the whole file should be sent.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, (min(int(last), size - 1) if last else size - 1)
+
+
+def file_validators(storage, name, size=None):
+    """
+    Return ``(etag, last_modified)`` for a stored file.
+
+    Storages that cannot report a modification time get an ETag from the
+    name and size alone, and no ``Last-Modified``.
+    """
+    if size is None:
+        size = storage.size(name)
+    try:
+        modified = storage.get_modified_time(name)
+    except (NotImplementedError, OSError):
+        modified = None
+    parts = [name, str(size), modified.isoformat() if modified else '']
+    etag = quote_etag(hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:32])
+    last_modified = int(modified.timestamp()) if modified else None
+    return etag, last_modified
+
+
+def _if_range_matches(request, etag, last_modified):
+    """Whether the ``If-Range`` precondition (if any) allows a partial response."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/"')):
+        # Weak tags never match here (RFC 9110 13.1.5)
+        return if_range == etag
+    return last_modified is not None and parse_http_date_safe(if_range) == last_modified
+
+
+def requested_range(request, size, etag, last_modified):
+    """
+    Return the ``(start, end)`` range to serve, or ``None`` for the whole file.
+
+    Raises :class:`RangeNotSatisfiable` for a range past the end.
+    """
+    if request.method not in ('GET', 'HEAD') or not _if_range_matches(request, etag, last_modified):
+        return None
+    return parse_range(request.META.get('HTTP_RANGE'), size)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+class FileRange:
+    """
+    ``length`` bytes of an open file from ``start``, as a file-like object.
+
+    ``fileno`` is kept so that the WSGI server's file wrapper can
+    ``sendfile`` the range: it sends from the current offset up to the
+    response's ``Content-Length``.
+    """
+
+    def __init__(self, f, start, length):
+        self.file = f
+        self.remaining = length
+        f.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+class RangedFileResponse(FileResponse):
+    block_size = CHUNK_SIZE
+
+
+def ranged_file_response(request, storage, name, filename=None, as_attachment=True, content_type=None):
+    """
+    Serve the stored file ``name`` honouring conditional and range requests.
+
+    The response has a ``served_range`` attribute: the ``(start, end)``
+    bytes sent, or ``None`` if no body was sent (304, 416).
+    """
+    filename = filename or os.path.basename(name)
+    if content_type is None:
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    size = storage.size(name)
+    etag, last_modified = file_validators(storage, name, size)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified.served_range = None
+        return set_validators(not_modified, etag, last_modified)
+
+    try:
+        byte_range = requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response.served_range = None
+        return set_validators(response, etag, last_modified)
+
+    start, end = byte_range or (0, size - 1)
+    response = RangedFileResponse(
+        FileRange(storage.open(name, 'rb'), start, end - start + 1),
+        as_attachment=as_attachment,
+        filename=filename,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(end - start + 1)
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.served_range = (start, end)
+    return set_validators(response, etag, last_modified)
@@ -0,0 +1,441 @@
+"""
+Full-text search over monasteries, events and archive items.
+
+:func:`search` is the entry point; it queries either the database's
+full-text engine (``core.fulltext``) or the in-process index below,
+depending on ``SEARCH_BACKEND``.
+
+Each searchable model has an in-process inverted index (term -> postings)
+ranked with Okapi BM25, so a query only touches the postings of its own
+terms instead of scanning every row with ``icontains``. There is one index
+per site language, built with that language's analyzer (``core.analysis``);
+a query is answered from the index of the active language.
+
+With the default ``'database'`` backend, queries containing Devanagari
+are still answered from this index (see :func:`analyzed_language`): the
+database engines tokenize with one configuration (``SEARCH_TEXT_CONFIG``
+on PostgreSQL, FTS5 ``unicode61`` on SQLite) and know nothing of
+Devanagari spelling variants or Hindi and Nepali inflections.
+
+The index is built by ``manage.py build_search_index`` (which saves it to
+``SEARCH_INDEX_PATH`` for worker processes to load) or, failing that,
+from the database on first use. It is then kept current incrementally:
+
+* in the process that saves a row, ``post_save``/``post_delete`` handlers
+  re-index or drop that one row once the transaction commits;
+* every process also compares the response-cache generations (bumped by
+  the same signals in any process) before searching, and on a change
+  re-reads only the rows updated, and the tombstones recorded, since its
+  last refresh.
+"""
+
+import math
+import os
+import pickle
+import threading
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from archives.models import ArchiveItem
+from events.models import Event
+
+from .analysis import ANALYZERS, DEVANAGARI_RE, MIN_TOKEN_LENGTH, STOPWORDS, TOKEN_RE, get_analyzer
+from .cache import get_generations
+from .models import Monastery, Tombstone
+
+# Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Rows are re-read from slightly before the last refresh, so a row saved by
+# a transaction that committed late is still picked up; re-indexing is
+# idempotent
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+INDEX_CHUNK_SIZE = 2000
+INDEX_FORMAT_VERSION = 2
+
+
+def tokenize(text):
+    """Split ``text`` into lowercase terms for the database full-text engines."""
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+class SearchType:
+    """A searchable model: weighted text fields and a visibility rule."""
+
+    def __init__(self, name, model, fields, visible, related=()):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.visible = visible
+        self.related = related
+
+    @property
+    def label(self):
+        return self.model._meta.label_lower
+
+    def depends_on(self, field_names):
+        """Whether changing ``field_names`` can change indexing."""
+        return bool(set(field_names) & (set(self.fields) | set(self.visible)))
+
+    def is_visible(self, obj):
+        return all(getattr(obj, field) == value for field, value in self.visible.items())
+
+    def terms(self, obj, analyzer):
+        """Return weighted term frequencies for ``obj`` as analyzed by ``analyzer``."""
+        terms = Counter()
+        for field, weight in self.fields.items():
+            for token in analyzer(getattr(obj, field) or ''):
+                terms[token] += weight
+        return terms
+
+    def source_queryset(self):
+        """Rows to index: only the columns that are read."""
+        return self.model.objects.only('pk', 'updated_at', *self.fields, *self.visible)
+
+    def results_queryset(self):
+        return self.model.objects.filter(**self.visible).select_related(*self.related)
+
+
+SEARCH_TYPES = {
+    search_type.name: search_type
+    for search_type in [
+        SearchType(
+            'monasteries',
+            Monastery,
+            {'name': 3.0, 'district': 2.0, 'short_description': 1.0, 'description': 1.0},
+            {'is_active': True},
+        ),
+        SearchType(
+            'events',
+            Event,
+            {'title': 3.0, 'short_description': 1.0, 'description': 1.0},
+            {'is_public': True, 'is_cancelled': False},
+            related=('monastery',),
+        ),
+        SearchType(
+            'archive_items',
+            ArchiveItem,
+            {
+                'title': 3.0,
+                'catalog_number': 2.0,
+                'description': 1.0,
+                'cultural_significance': 1.0,
+            },
+            {'is_public': True},
+            related=('monastery',),
+        ),
+    ]
+}
+
+SEARCH_TYPES_BY_LABEL = {search_type.label: search_type for search_type in SEARCH_TYPES.values()}
+
+
+class InvertedIndex:
+    """Postings and document lengths for one document type, ranked by BM25."""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.total_length = 0.0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, terms):
+        self.remove(doc_id)
+        if not terms:
+            return
+        for term, frequency in terms.items():
+            self.postings[term][doc_id] = frequency
+        length = sum(terms.values())
+        self.documents[doc_id] = (tuple(terms), length)
+        self.total_length += length
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        terms, length = document
+        for term in terms:
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= length
+
+    def search(self, terms):
+        """Return ``[(doc_id, score), ...]`` for documents matching any term, best first."""
+        count = len(self.documents)
+        if not count:
+            return []
+
+        average_length = self.total_length / count
+        scores = defaultdict(float)
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                length = self.documents[doc_id][1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[doc_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        # Ties broken by id so pages are stable
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class LocalizedIndex:
+    """The inverted indexes of one document type, one per analyzer language."""
+
+    def __init__(self, languages):
+        self.indexes = {language: InvertedIndex() for language in languages}
+
+    def __len__(self):
+        return max((len(index) for index in self.indexes.values()), default=0)
+
+    @property
+    def languages(self):
+        return set(self.indexes)
+
+    def add(self, doc_id, search_type, obj):
+        for language, index in self.indexes.items():
+            index.add(doc_id, search_type.terms(obj, ANALYZERS[language]))
+
+    def remove(self, doc_id):
+        for index in self.indexes.values():
+            index.remove(doc_id)
+
+    def search(self, analyzer, query):
+        return self.indexes[analyzer.language].search(analyzer(query))
+
+
+class RankedResults:
+    """
+    Ranked search hits as a lazy sequence of model instances.
+
+    Only the slice that is actually displayed is loaded from the database,
+    so this can be handed straight to ``Paginator``. Each instance gets a
+    ``search_score`` attribute.
+    """
+
+    def __init__(self, queryset, ranked):
+        self.queryset = queryset
+        self.ranked = ranked
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def count(self):
+        return len(self.ranked)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        hits = self.ranked[index]
+        objects = self.queryset.in_bulk([doc_id for doc_id, _ in hits])
+        results = []
+        for doc_id, score in hits:
+            obj = objects.get(doc_id)
+            if obj is not None:
+                obj.search_score = score
+                results.append(obj)
+        return results
+
+
+class SearchIndex:
+    """The inverted indexes for every search type, and their refresh state."""
+
+    def __init__(self, types=SEARCH_TYPES, languages=tuple(ANALYZERS)):
+        self.types = types
+        self.languages = tuple(languages)
+        self.indexes = {name: LocalizedIndex(self.languages) for name in types}
+        self.watermarks = {}
+        self.generations = None
+        self.loaded = False
+        self._lock = threading.RLock()
+
+    @property
+    def models(self):
+        return [search_type.model for search_type in self.types.values()]
+
+    def build(self):
+        """Index every visible row from the database."""
+        with self._lock:
+            self.generations = get_generations(self.models)
+            for name, search_type in self.types.items():
+                self.watermarks[name] = timezone.now()
+                self.indexes[name] = self._build_type(search_type, self.languages)
+            self.loaded = True
+
+    def _build_type(self, search_type, languages):
+        index = LocalizedIndex(languages)
+        rows = search_type.source_queryset().filter(**search_type.visible)
+        for obj in rows.iterator(chunk_size=INDEX_CHUNK_SIZE):
+            index.add(obj.pk, search_type, obj)
+        return index
+
+    def refresh(self):
+        """Apply rows changed and deleted since the last build or refresh."""
+        with self._lock:
+            self.generations = get_generations(self.models)
+            for name, search_type in self.types.items():
+                started = timezone.now()
+                since = self.watermarks[name] - REFRESH_OVERLAP
+                index = self.indexes[name]
+
+                changed = search_type.source_queryset().filter(updated_at__gte=since)
+                for obj in changed.iterator(chunk_size=INDEX_CHUNK_SIZE):
+                    if search_type.is_visible(obj):
+                        index.add(obj.pk, search_type, obj)
+                    else:
+                        index.remove(obj.pk)
+
+                deleted = Tombstone.objects.filter(
+                    model_label=search_type.label,
+                    deleted_at__gte=since,
+                ).values_list('object_id', flat=True)
+                for doc_id in deleted:
+                    index.remove(doc_id)
+
+                self.watermarks[name] = started
+
+    def ensure_current(self):
+        """Load or build the index, then catch up with changes from any process."""
+        with self._lock:
+            if not self.loaded:
+                if not self.load():
+                    self.build()
+                    return
+            if get_generations(self.models) != self.generations:
+                self.refresh()
+
+    def index_object(self, obj, update_fields=None):
+        """Re-index (or drop, if now hidden) a single saved row."""
+        search_type = SEARCH_TYPES_BY_LABEL.get(obj._meta.label_lower)
+        if search_type is None or not self.loaded:
+            return
+        if update_fields is not None and not search_type.depends_on(update_fields):
+            # e.g. a view counter increment
+            return
+        with self._lock:
+            if search_type.is_visible(obj):
+                self.indexes[search_type.name].add(obj.pk, search_type, obj)
+            else:
+                self.indexes[search_type.name].remove(obj.pk)
+
+    def remove_object(self, model, pk):
+        search_type = SEARCH_TYPES_BY_LABEL.get(model._meta.label_lower)
+        if search_type is None or not self.loaded:
+            return
+        with self._lock:
+            self.indexes[search_type.name].remove(pk)
+
+    def rank(self, type_name, query, language=None):
+        """
+        Return ``[(doc_id, score), ...]`` of ``type_name`` for ``query``, best first.
+
+        The query is analyzed for ``language`` (default: the active one).
+        """
+        self.ensure_current()
+        analyzer = get_analyzer(language)
+        if analyzer.language not in self.languages:
+            analyzer = ANALYZERS[self.languages[0]]
+        with self._lock:
+            return self.indexes[type_name].search(analyzer, query)
+
+    def search(self, type_name, query, language=None):
+        """Return :class:`RankedResults` of ``type_name`` for ``query`` (see :meth:`rank`)."""
+        ranked = self.rank(type_name, query, language)
+        return RankedResults(self.types[type_name].results_queryset(), ranked)
+
+    def save(self, path=None):
+        """Write the index to ``path`` (default ``SEARCH_INDEX_PATH``) atomically."""
+        from .snapshots import atomic_write
+
+        with self._lock:
+            payload = pickle.dumps(
+                {
+                    'version': INDEX_FORMAT_VERSION,
+                    'types': sorted(self.types),
+                    'indexes': self.indexes,
+                    'watermarks': self.watermarks,
+                },
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        path = str(path or settings.SEARCH_INDEX_PATH)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        atomic_write(path, payload)
+
+    def load(self, path=None):
+        """
+        Load an index written by :meth:`save` and catch up from its watermarks.
+
+        The file is a local artifact of ``build_search_index``; returns False
+        if it is missing or was written for a different set of types.
+        Languages added since it was saved are indexed from the database;
+        those no longer served are dropped.
+        """
+        path = str(path or settings.SEARCH_INDEX_PATH)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return False
+        if data.get('version') != INDEX_FORMAT_VERSION or data.get('types') != sorted(self.types):
+            return False
+
+        with self._lock:
+            self.indexes = data['indexes']
+            self.watermarks = data['watermarks']
+            for name, index in self.indexes.items():
+                for language in index.languages - set(self.languages):
+                    del index.indexes[language]
+                missing = [language for language in self.languages if language not in index.languages]
+                if missing:
+                    index.indexes.update(self._build_type(self.types[name], missing).indexes)
+            self.loaded = True
+            self.refresh()
+        return True
+
+
+search_index = SearchIndex()
+
+
+def analyzed_language(query, language=None):
+    """
+    Return the analyzer language the database backend must search ``query``
+    with in the in-process index, or ``None`` if the database can match it.
+
+    Latin words are analyzed the same in every language, which the database
+    engines approximate; Devanagari needs the active language's analyzer.
+    """
+    if DEVANAGARI_RE.search(query):
+        return get_analyzer(language).language
+    return None
+
+
+def search(type_name, query, language=None):
+    """
+    Return ranked results of ``type_name`` for ``query``, best first.
+
+    Uses the backend named by ``SEARCH_BACKEND``: ``'database'`` for the
+    database's own full-text engine (see ``core.fulltext``) or ``'memory'``
+    for the in-process BM25 index, which analyzes ``query`` for
+    ``language`` (default: the active language). The database backend
+    does too for Devanagari queries. Either result can be paginated.
+    """
+    if settings.SEARCH_BACKEND == 'memory':
+        return search_index.search(type_name, query, language)
+
+    from . import fulltext
+
+    return fulltext.ranked(SEARCH_TYPES[type_name].results_queryset(), query, language)
@@ -0,0 +1,144 @@
+"""
+File-serving backends for Monastery360.
+
+Django decides whether a file may be served (public item, path inside
+``MEDIA_ROOT``) and answers conditional requests; the bytes themselves are
+sent by the backend named in ``SENDFILE_BACKEND``:
+
+* ``'django'`` (default): the worker sends the file with
+  :func:`core.ranges.ranged_file_response`, which supports ranges and uses
+  ``os.sendfile`` through the WSGI server's file wrapper where available;
+* ``'nginx'``: an empty response with ``X-Accel-Redirect`` pointing at the
+  ``internal`` location ``SENDFILE_URL`` that maps to ``MEDIA_ROOT``;
+* ``'apache'``: an empty response with ``X-Sendfile`` and the file's path
+  (mod_xsendfile).
+
+With a proxy backend the worker is released as soon as the headers are
+written, and the proxy handles ``Range`` itself. Files that are not on the
+local filesystem (remote storages) are always sent by Django.
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header
+
+from .ranges import (
+    RangeNotSatisfiable,
+    file_validators,
+    ranged_file_response,
+    requested_range,
+    set_validators,
+)
+
+# One year: the longest lifetime caches honour
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _local_path(storage, name):
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+class DjangoBackend:
+    """Send the file from the worker process."""
+
+    def response(self, request, storage, name, filename, as_attachment, content_type):
+        return ranged_file_response(
+            request,
+            storage,
+            name,
+            filename=filename,
+            as_attachment=as_attachment,
+            content_type=content_type,
+        )
+
+
+class ProxyBackend:
+    """Hand the transfer to the front proxy with a response header."""
+
+    header = None
+
+    def location(self, storage, name, path):
+        raise NotImplementedError
+
+    def response(self, request, storage, name, filename, as_attachment, content_type):
+        path = _local_path(storage, name)
+        if path is None:
+            return DjangoBackend().response(request, storage, name, filename, as_attachment, content_type)
+
+        size = storage.size(name)
+        etag, last_modified = file_validators(storage, name, size)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            response.served_range = None
+            return set_validators(response, etag, last_modified)
+
+        response = HttpResponse(content_type=content_type)
+        response[self.header] = self.location(storage, name, path)
+        if disposition := content_disposition_header(as_attachment, filename):
+            response['Content-Disposition'] = disposition
+        # The proxy serves the range; work out which one for the caller
+        try:
+            byte_range = requested_range(request, size, etag, last_modified)
+        except RangeNotSatisfiable:
+            response.served_range = None
+        else:
+            response.served_range = byte_range or (0, size - 1)
+        return set_validators(response, etag, last_modified)
+
+
+class NginxBackend(ProxyBackend):
+    header = 'X-Accel-Redirect'
+
+    def location(self, storage, name, path):
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        return settings.SENDFILE_URL.rstrip('/') + '/' + quote(relative)
+
+
+class ApacheBackend(ProxyBackend):
+    header = 'X-Sendfile'
+
+    def location(self, storage, name, path):
+        return path
+
+
+BACKENDS = {
+    'django': DjangoBackend(),
+    'nginx': NginxBackend(),
+    'apache': ApacheBackend(),
+}
+
+
+def get_backend():
+    return BACKENDS[settings.SENDFILE_BACKEND]
+
+
+def sendfile(request, storage, name, filename=None, as_attachment=False, content_type=None,
+             immutable=False):
+    """
+    Serve the stored file ``name`` through the configured backend.
+
+    ``immutable`` marks content whose URL changes whenever it does (hashed
+    names), which clients may then cache for a year without revalidating;
+    anything else is cached for ``SENDFILE_MAX_AGE`` seconds and then
+    revalidated against its ETag. The response's ``served_range`` is the
+    ``(start, end)`` bytes sent, or ``None`` if there is no body.
+    """
+    filename = filename or os.path.basename(name)
+    if content_type is None:
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = get_backend().response(request, storage, name, filename, as_attachment, content_type)
+    if response.status_code in (200, 206, 304):
+        if immutable:
+            patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=settings.SENDFILE_MAX_AGE)
+    return response
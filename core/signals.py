@@ -0,0 +1,219 @@
+"""
+Signal handlers for Monastery360 core.
+
+Bumps the response-cache generation of content models whenever an
+instance is saved or deleted, so cached responses built from them are
+invalidated immediately, records a tombstone for each deletion so
+delta-sync clients learn about it, applies the change to this process's
+search index, schedules responsive derivatives of uploaded images,
+counts the references rows hold to content-addressed files, and (when
+``SNAPSHOT_AUTO_REBUILD`` is on) schedules a debounced rebuild of the
+static JSON snapshots.
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+
+from .cache import bump_generation
+
+CONTENT_MODELS = [
+    'core.Monastery',
+    'core.AudioPOI',
+    'tours.Panorama',
+    'events.Event',
+    'archives.ArchiveItem',
+]
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    """Bump the cache generation for the model that changed."""
+    bump_generation(sender)
+
+
+def record_tombstone(sender, instance, **kwargs):
+    """Remember a deleted row for delta sync."""
+    from .models import Tombstone
+
+    Tombstone.objects.create(model_label=sender._meta.label_lower, object_id=instance.pk)
+
+
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Re-index a saved row once its transaction commits."""
+    from .search import search_index
+
+    transaction.on_commit(lambda: search_index.index_object(instance, update_fields))
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drop a deleted row from the search index once its transaction commits."""
+    from .search import search_index
+
+    pk = instance.pk
+    transaction.on_commit(lambda: search_index.remove_object(sender, pk))
+
+
+def schedule_image_derivatives(sender, instance, update_fields=None, **kwargs):
+    """Generate derivatives for a saved row's images after it commits."""
+    from .images import image_fields, schedule
+
+    names = image_fields(sender)
+    if update_fields is not None:
+        names = [name for name in names if name in update_fields]
+    if any(getattr(instance, name) for name in names):
+        schedule(sender, instance.pk)
+
+
+def _content_addressed_fields(model):
+    from .storage import is_content_addressed
+
+    return [field for field in model._meta.concrete_fields if is_content_addressed(field)]
+
+
+def _release(field, name):
+    from .storage import CAS_NAME
+
+    # Legacy upload paths are not reference-counted, so they are kept
+    if CAS_NAME.match(name):
+        transaction.on_commit(lambda: field.storage.delete(name))
+
+
+def update_file_references(sender, instance, update_fields=None, **kwargs):
+    """
+    Count the stored files a row starts using and release those it stops
+    using, once it commits.
+
+    An upload stored by this save holds its own reference; re-uploading
+    the bytes the row already has drops that extra reference again.
+    """
+    from .storage import STORED_UPLOADS
+
+    fields = [
+        field for field in _content_addressed_fields(sender)
+        if update_fields is None or field.name in update_fields
+    ]
+    if not fields:
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = sender._default_manager.filter(pk=instance.pk).values(*[field.attname for field in fields]).first()
+    uploads = instance.__dict__.get(STORED_UPLOADS, ())
+    for field in fields:
+        old = previous and previous[field.attname]
+        new = getattr(instance, field.attname).name
+        if field.attname in uploads:
+            if new == old:
+                _release(field, new)
+        elif new and new != old:
+            # A stored name assigned directly: the row is one more user
+            field.storage.add_reference(new)
+        if old and old != new:
+            _release(field, old)
+
+
+def forget_stored_uploads(sender, instance, **kwargs):
+    """Reset the uploads :func:`update_file_references` saw for the next save."""
+    from .storage import STORED_UPLOADS
+
+    instance.__dict__.pop(STORED_UPLOADS, None)
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    """Release a deleted row's stored files once the deletion commits."""
+    for field in _content_addressed_fields(sender):
+        name = getattr(instance, field.attname).name
+        if name:
+            _release(field, name)
+
+
+def rebuild_snapshots(sender, **kwargs):
+    """Schedule a rebuild of the snapshots that embed ``sender``'s data."""
+    if not settings.SNAPSHOT_AUTO_REBUILD:
+        return
+
+    from .snapshots import SNAPSHOT_DEPENDENCIES, schedule_rebuild
+
+    names = SNAPSHOT_DEPENDENCIES.get(sender._meta.label_lower)
+    if names:
+        # Only rebuild from committed data
+        transaction.on_commit(lambda: schedule_rebuild(names))
+
+
+def install_search_schema(sender, using='default', **kwargs):
+    """(Re)create the database full-text and trigram tables, columns and indexes."""
+    from . import fulltext, fuzzy
+
+    fulltext.install(using)
+    fuzzy.install(using)
+
+
+def connect():
+    """Connect cache invalidation and tombstones to every content model."""
+    from .storage import track_uploads
+
+    post_migrate.connect(
+        install_search_schema,
+        sender=apps.get_app_config('core'),
+        dispatch_uid='search-schema-install',
+    )
+    for label in CONTENT_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(
+            invalidate_cached_responses,
+            sender=model,
+            dispatch_uid=f'cache-generation-save-{label}',
+        )
+        post_delete.connect(
+            invalidate_cached_responses,
+            sender=model,
+            dispatch_uid=f'cache-generation-delete-{label}',
+        )
+        post_delete.connect(
+            record_tombstone,
+            sender=model,
+            dispatch_uid=f'sync-tombstone-{label}',
+        )
+        post_save.connect(
+            update_search_index,
+            sender=model,
+            dispatch_uid=f'search-index-save-{label}',
+        )
+        post_delete.connect(
+            remove_from_search_index,
+            sender=model,
+            dispatch_uid=f'search-index-delete-{label}',
+        )
+        post_save.connect(
+            schedule_image_derivatives,
+            sender=model,
+            dispatch_uid=f'image-derivatives-save-{label}',
+        )
+        if _content_addressed_fields(model):
+            for field in _content_addressed_fields(model):
+                track_uploads(field)
+            pre_save.connect(
+                update_file_references,
+                sender=model,
+                dispatch_uid=f'stored-files-replace-{label}',
+            )
+            post_save.connect(
+                forget_stored_uploads,
+                sender=model,
+                dispatch_uid=f'stored-files-uploads-{label}',
+            )
+            post_delete.connect(
+                release_deleted_files,
+                sender=model,
+                dispatch_uid=f'stored-files-delete-{label}',
+            )
+        post_save.connect(
+            rebuild_snapshots,
+            sender=model,
+            dispatch_uid=f'snapshot-save-{label}',
+        )
+        post_delete.connect(
+            rebuild_snapshots,
+            sender=model,
+            dispatch_uid=f'snapshot-delete-{label}',
+        )
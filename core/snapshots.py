@@ -0,0 +1,356 @@
+"""
+Static JSON snapshots of the Monastery360 catalog.
+
+The front-end reads ``static/data/monasteries.json``, ``events.json``,
+``archives.json`` and ``monastery_panoramas.json``. Rather than editing
+those by hand, they are materialized from the database here, keeping the
+schema the front-end already expects.
+
+Each snapshot is written twice: under a content-hashed name
+(``events.3f9a0c1b2d4e.json``) that can be cached forever, and under its
+stable name for existing readers. ``manifest.json`` maps every snapshot to
+its current hashed file, so a client only re-fetches a snapshot when its
+hash changes. All files are written to a temporary file in the same
+directory and renamed into place, so readers never see a partial file.
+
+Snapshots are rebuilt by ``manage.py build_snapshots`` and, when
+``SNAPSHOT_AUTO_REBUILD`` is enabled, by a debounced background task that
+runs shortly after the last content change (see ``core.signals``).
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Prefetch, Q, Sum
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.formats import date_format
+
+from api.bundle import curated_panoramas_path, panorama_view
+from archives.models import ArchiveItem
+from events.models import Event
+from tours.models import Panorama
+
+from . import datafiles
+from .models import Monastery
+
+logger = logging.getLogger('monastery360.snapshots')
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+
+# Hashed files kept per snapshot, so clients holding the previous
+# manifest can still fetch what it points at
+KEEP_VERSIONS = 2
+
+
+def _file_url(field):
+    return field.url if field else None
+
+
+def build_monasteries():
+    monasteries = Monastery.objects.filter(is_active=True).annotate(
+        tour_seconds=Sum('panoramas__audio_duration', filter=Q(panoramas__is_active=True)),
+    ).order_by('name')
+    return {
+        'monasteries': [
+            {
+                'id': monastery.id,
+                'name': monastery.name,
+                'region': monastery.district,
+                'description': monastery.short_description or monastery.description,
+                'imageUrl': _file_url(monastery.image),
+                'duration': math.ceil((monastery.tour_seconds or 0) / 60),
+                'isFeatured': monastery.is_featured,
+                'panoId': monastery.pano_id or monastery.slug,
+            }
+            for monastery in monasteries
+        ]
+    }
+
+
+def _event_time(event):
+    if event.is_all_day:
+        return 'All Day'
+    start = timezone.localtime(event.start_time)
+    end = timezone.localtime(event.end_time)
+    return f"{date_format(start, 'g:i A')} - {date_format(end, 'g:i A')}"
+
+
+def build_events():
+    events = Event.objects.filter(
+        is_public=True,
+        is_cancelled=False,
+        monastery__is_active=True,
+    ).select_related('monastery').order_by('start_time', 'id')
+    return [
+        {
+            'id': event.id,
+            'title': event.title,
+            'date': date_format(timezone.localtime(event.start_time), 'F j, Y'),
+            'time': _event_time(event),
+            'location': event.monastery.name,
+            'attendees': (
+                f'{event.expected_attendance}+' if event.expected_attendance else 'Open to All'
+            ),
+            'description': event.short_description or event.description,
+            'image': _file_url(event.image),
+            'isFeatured': event.is_featured,
+            'type': event.get_event_type_display(),
+            'bookingRequired': event.requires_registration,
+        }
+        for event in events
+    ]
+
+
+def build_archives():
+    items = ArchiveItem.objects.filter(
+        is_public=True,
+        monastery__is_active=True,
+    ).select_related('monastery').order_by('monastery__name', 'catalog_number')
+    archives = []
+    for item in items:
+        kwargs = {'monastery_slug': item.monastery.slug, 'catalog_number': item.catalog_number}
+        archives.append({
+            'id': item.id,
+            'title': item.title,
+            'type': item.get_item_type_display(),
+            'century': item.estimated_age or item.historical_period,
+            'monastery': item.monastery.name,
+            'description': item.description,
+            'imageUrl': _file_url(item.image),
+            'tags': [
+                tag for tag in (
+                    item.get_material_display() if item.material != 'unknown' else '',
+                    item.language,
+                    item.script,
+                ) if tag
+            ],
+            'downloadUrl': reverse('archives:item_download', kwargs=kwargs) if item.scan else None,
+        })
+    return {'archives': archives}
+
+
+def build_panoramas():
+    """
+    Merge the database's viewable panoramas into the curated panorama config.
+
+    Panoramas without an image are left out; monasteries without a
+    viewable panorama keep their curated entry. Returns ``None`` (nothing
+    to write) when no panorama has an image, as with the demo data.
+    """
+    monasteries = Monastery.objects.filter(
+        is_active=True,
+        panoramas__is_active=True,
+    ).distinct().order_by('name').prefetch_related(
+        Prefetch(
+            'panoramas',
+            queryset=Panorama.objects.filter(is_active=True).exclude(image='').order_by('order', 'id'),
+            to_attr='active_panoramas',
+        )
+    )
+    generated = {
+        monastery.pano_id or monastery.slug: {
+            'name': monastery.name,
+            'views': [panorama_view(panorama) for panorama in monastery.active_panoramas],
+        }
+        for monastery in monasteries
+        if monastery.active_panoramas
+    }
+    if not generated:
+        return None
+
+    try:
+        curated = dict(datafiles.load(curated_panoramas_path()).data)
+    except (OSError, ValueError):
+        curated = {}
+    curated['monasteries'] = {**(curated.get('monasteries') or {}), **generated}
+    return curated
+
+
+# Snapshot name -> builder; the name is also the stable file name
+SNAPSHOTS = {
+    'monasteries': build_monasteries,
+    'events': build_events,
+    'archives': build_archives,
+    'monastery_panoramas': build_panoramas,
+}
+
+# Snapshots that embed data from each model
+SNAPSHOT_DEPENDENCIES = {
+    'core.monastery': set(SNAPSHOTS),
+    'tours.panorama': {'monasteries', 'monastery_panoramas'},
+    'events.event': {'events'},
+    'archives.archiveitem': {'archives'},
+}
+
+
+def snapshot_root():
+    return str(settings.SNAPSHOT_ROOT)
+
+
+def render(data):
+    """Serialize a snapshot to bytes; identical data gives identical bytes."""
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def atomic_write(path, content):
+    """Write ``content`` to ``path`` via a temporary file and a rename."""
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_if_changed(path, content):
+    """Atomically write ``content`` unless ``path`` already holds it."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    atomic_write(path, content)
+    return True
+
+
+def read_manifest(directory=None):
+    """Return the current manifest, or an empty one."""
+    path = os.path.join(directory or snapshot_root(), MANIFEST_NAME)
+    try:
+        with open(path, 'rb') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+
+
+def _prune(directory, name, keep):
+    """Delete old hashed versions of ``name``, keeping ``keep`` and the newest."""
+    pattern = re.compile(rf'^{re.escape(name)}\.[0-9a-f]{{{HASH_LENGTH}}}\.json$')
+    versions = sorted(
+        (entry for entry in os.scandir(directory) if pattern.match(entry.name)),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    retained = {keep}
+    for entry in versions:
+        if entry.name in retained:
+            continue
+        if len(retained) < KEEP_VERSIONS:
+            retained.add(entry.name)
+            continue
+        os.remove(entry.path)
+
+
+def build_snapshots(names=None, directory=None):
+    """
+    Regenerate snapshots (all of them by default) and the manifest.
+
+    Returns the names of the snapshots whose content changed.
+    """
+    directory = directory or snapshot_root()
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    files = manifest.get('files', {})
+    changed = []
+
+    for name in names or SNAPSHOTS:
+        data = SNAPSHOTS[name]()
+        if data is None:
+            # Nothing to generate; keep the existing (curated) file
+            continue
+        content = render(data)
+        digest = hashlib.sha256(content).hexdigest()
+        hashed_name = f'{name}.{digest[:HASH_LENGTH]}.json'
+
+        _write_if_changed(os.path.join(directory, hashed_name), content)
+        _write_if_changed(os.path.join(directory, f'{name}.json'), content)
+        _prune(directory, name, keep=hashed_name)
+
+        if files.get(name, {}).get('sha256') != digest:
+            changed.append(name)
+        files[name] = {
+            'file': hashed_name,
+            'sha256': digest,
+            'size': len(content),
+        }
+
+    if changed or not os.path.exists(os.path.join(directory, MANIFEST_NAME)):
+        manifest = {
+            'generated_at': timezone.now().isoformat(),
+            'files': dict(sorted(files.items())),
+        }
+        atomic_write(os.path.join(directory, MANIFEST_NAME), render(manifest))
+
+    return changed
+
+
+class SnapshotScheduler:
+    """
+    Debounce snapshot rebuilds onto a background thread.
+
+    Every request to rebuild restarts a short timer; when it fires, the
+    snapshots requested since the last run are rebuilt once. A burst of
+    saves (an admin bulk action, a data import) thus costs one rebuild.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._timer = None
+        self._pending = set()
+
+    def schedule(self, names):
+        with self._lock:
+            self._pending |= set(names)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            names, self._pending = self._pending, set()
+            self._timer = None
+        try:
+            changed = build_snapshots(names=[name for name in SNAPSHOTS if name in names])
+            logger.info('Rebuilt snapshots: %s', ', '.join(changed) or 'no changes')
+        except Exception:
+            logger.exception('Snapshot rebuild failed')
+        finally:
+            # This thread opened its own connections; don't leak them
+            connections.close_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def schedule_rebuild(names):
+    """Rebuild ``names`` in the background after the debounce delay."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SnapshotScheduler(settings.SNAPSHOT_DEBOUNCE_SECONDS)
+    _scheduler.schedule(names)
@@ -0,0 +1,198 @@
+"""
+Content-addressed, deduplicating storage for large uploads.
+
+Archive scans, panoramas and narration audio used to be stored under their
+upload paths, so the same thangka scan attached to two items was kept
+twice. :class:`ContentAddressedStorage` names each file after the SHA-256
+of its bytes, ``cas/3f/3f9a...c1.jpg``:
+
+* uploads are hashed while they are streamed to a temporary file, chunk
+  by chunk, and never held in memory whole;
+* identical bytes (with the same extension) get the identical name, so a
+  second upload only adds a reference to the file already stored;
+* a name never changes meaning, so its URL is cached for a year
+  (``MEDIA_IMMUTABLE_FILE_TEST`` matches ``cas/`` names).
+
+:class:`core.models.StoredFile` counts the references to each file.
+``delete()`` drops one reference and removes the file with the last one.
+Both run under a lock on the file's row, so an upload racing the removal
+of the same bytes either sees the file or writes it again.
+
+Every row using a file holds one reference. Storing an upload adds it;
+the ``core.signals`` handlers add one for a stored name assigned to a
+row directly (copied from another row, set in the admin or loaded from
+a fixture) and release the files of deleted rows and replaced uploads.
+Uploads are told apart from assigned names through the field files of
+these fields (:class:`TracksUploads`). Django never deletes files on
+its own; doing it here is safe because shared files are only removed
+with their last reference. Files stored before this storage have no
+``StoredFile`` row and are never removed.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db.models.fields.files import FieldFile, ImageFieldFile
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CAS_ROOT = 'cas'
+CAS_NAME = re.compile(rf'^{CAS_ROOT}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(?:\.\w+)?$')
+
+
+def content_name(digest, name):
+    """Storage name of a file with SHA-256 ``digest`` uploaded as ``name``."""
+    ext = os.path.splitext(name)[1].lower()
+    if not re.fullmatch(r'\.\w{1,10}', ext):
+        ext = ''
+    return f'{CAS_ROOT}/{digest[:2]}/{digest}{ext}'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` that stores files once, by SHA-256."""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is hashed in _save
+        return name
+
+    def _save(self, name, content):
+        temp_dir = self.path(os.path.join(CAS_ROOT, 'tmp'))
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix='.upload')
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            name = content_name(digest.hexdigest(), name)
+            self._add_reference(name, digest.hexdigest(), size, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def _add_reference(self, name, digest, size, temp_path):
+        StoredFile = apps.get_model('core', 'StoredFile')
+        path = self.path(name)
+        with transaction.atomic():
+            stored, created = StoredFile.objects.select_for_update().get_or_create(
+                name=name, defaults={'sha256': digest, 'size': size, 'references': 0},
+            )
+            if created or not stored.references or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, path)
+            StoredFile.objects.filter(pk=stored.pk).update(references=F('references') + 1)
+
+    def add_reference(self, name):
+        """
+        Add a reference to ``name`` if it is stored, e.g. for a second field
+        using the file or an upload whose hash is already known; returns
+        whether it was.
+        """
+        if not CAS_NAME.match(name or ''):
+            return False
+        StoredFile = apps.get_model('core', 'StoredFile')
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name, references__gt=0).first()
+            if stored is None or not self.exists(name):
+                return False
+            StoredFile.objects.filter(pk=stored.pk).update(references=F('references') + 1)
+        return True
+
+    def delete(self, name):
+        """
+        Drop one reference to ``name``, removing the file with the last.
+
+        Names without a ``StoredFile`` row (e.g. uploaded before this
+        storage) are left alone: nothing counts their references, so
+        another row or a fixture may still use them.
+        """
+        if not CAS_NAME.match(name or ''):
+            return
+
+        StoredFile = apps.get_model('core', 'StoredFile')
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is None:
+                return
+            if stored.references > 1:
+                StoredFile.objects.filter(pk=stored.pk).update(references=F('references') - 1)
+                return
+            # Kept at zero so a concurrent upload waits on this row
+            StoredFile.objects.filter(pk=stored.pk).update(references=0)
+            super().delete(name)
+
+    def discard(self, name):
+        """
+        Remove a file saved in the current transaction before it rolls back.
+
+        The rollback undoes the file's ``StoredFile`` row but not the file;
+        removing it while the row is still locked keeps concurrent uploads
+        of the same bytes waiting until it is gone.
+        """
+        super().delete(name)
+
+    def references(self, name):
+        """Number of stored references to ``name`` (0 if it is not content-addressed)."""
+        StoredFile = apps.get_model('core', 'StoredFile')
+        return StoredFile.objects.filter(name=name).values_list('references', flat=True).first() or 0
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def content_storage():
+    """Storage of the deduplicated upload fields (callable, so migrations stay portable)."""
+    return content_addressed_storage
+
+
+def is_content_addressed(field):
+    """Whether ``field`` (a model field) stores its files by content."""
+    return isinstance(getattr(field, 'storage', None), ContentAddressedStorage)
+
+
+# Instance attribute holding the attnames of the fields whose upload was
+# stored by the save in progress
+STORED_UPLOADS = '_stored_uploads'
+
+
+class TracksUploads:
+    """
+    ``FieldFile`` mixin noting on the instance which fields stored an upload.
+
+    Storing the upload added the row's reference to the file already, so
+    the ``core.signals`` handlers must not add another one for it.
+    """
+
+    def save(self, name, content, save=True):
+        super().save(name, content, save=False)
+        self.instance.__dict__.setdefault(STORED_UPLOADS, set()).add(self.field.attname)
+        if save:
+            self.instance.save()
+
+
+class TrackedFieldFile(TracksUploads, FieldFile):
+    pass
+
+
+class TrackedImageFieldFile(TracksUploads, ImageFieldFile):
+    pass
+
+
+def track_uploads(field):
+    """Make a content-addressed ``field`` note its uploads (see :class:`TracksUploads`)."""
+    if not issubclass(field.attr_class, TracksUploads):
+        image = issubclass(field.attr_class, ImageFieldFile)
+        field.attr_class = TrackedImageFieldFile if image else TrackedFieldFile
@@ -0,0 +1,183 @@
+"""
+Search-box autocomplete for Monastery360.
+
+Suggestions come from an in-memory sorted array of normalized keys: every
+label (monastery name, district, event title, archive title and catalog
+number) is indexed under each of its word suffixes, so "mon" suggests
+"Rumtek Monastery" as well as "Monastery Foundation Chronicles". A prefix
+lookup is two binary searches; the best entries in that range (by view
+count) are computed once per prefix and memoized, and the one- and
+two-character prefixes are precomputed, so a keystroke is answered
+without touching the database.
+
+The index is rebuilt when any of its models changes (their response-cache
+generations move), at most once per ``REBUILD_INTERVAL`` so that a burst
+of edits does not keep it rebuilding. View counter increments do not move
+generations (see ``core.counters``).
+"""
+
+import bisect
+import heapq
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.db.models import Q, Sum
+from django.urls import reverse
+
+from archives.models import ArchiveItem
+from events.models import Event
+
+from .cache import ModelDerived
+from .models import Monastery
+from .search import TOKEN_RE
+
+MAX_SUGGESTIONS = 20
+DEFAULT_SUGGESTIONS = 8
+
+# Prefixes up to this length are answered from a table built with the index
+PRECOMPUTED_PREFIX_LENGTH = 2
+# Memoized results for longer prefixes
+PREFIX_CACHE_SIZE = 10000
+
+# Seconds between checks for model changes, and between rebuilds
+GENERATION_CHECK_INTERVAL = 1.0
+REBUILD_INTERVAL = 5.0
+
+SUGGEST_MODELS = [Monastery, Event, ArchiveItem]
+
+
+def normalize(text):
+    """Lowercase words separated by single spaces."""
+    return ' '.join(TOKEN_RE.findall(text.casefold()))
+
+
+def _suffix_keys(label):
+    words = normalize(label).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def _monastery_entries():
+    monasteries = Monastery.objects.filter(is_active=True).annotate(
+        views=Sum('panoramas__view_count', filter=Q(panoramas__is_active=True)),
+    ).only('id', 'name', 'slug', 'district')
+
+    districts = {}
+    for monastery in monasteries:
+        views = monastery.views or 0
+        yield {
+            'type': 'monastery',
+            'label': monastery.name,
+            'url': reverse('core:monastery_detail', kwargs={'slug': monastery.slug}),
+        }, views, [monastery.name]
+        if monastery.district:
+            districts[monastery.district] = districts.get(monastery.district, 0) + views
+
+    monastery_list = reverse('core:monastery_list')
+    for district, views in districts.items():
+        yield {
+            'type': 'district',
+            'label': district,
+            'url': f"{monastery_list}?{urlencode({'district': district})}",
+        }, views, [district]
+
+
+def _event_entries():
+    events = Event.objects.filter(is_public=True, is_cancelled=False).select_related(
+        'monastery',
+    ).only('id', 'title', 'monastery__slug')
+    for event in events:
+        # Events have no view counter of their own
+        yield {
+            'type': 'event',
+            'label': event.title,
+            'url': event.get_absolute_url(),
+        }, 0, [event.title]
+
+
+def _archive_entries():
+    items = ArchiveItem.objects.filter(is_public=True).select_related('monastery').only(
+        'id', 'title', 'catalog_number', 'view_count', 'monastery__slug',
+    )
+    for item in items:
+        yield {
+            'type': 'archive_item',
+            'label': item.title,
+            'catalog_number': item.catalog_number,
+            'url': item.get_absolute_url(),
+        }, item.view_count, [item.title, item.catalog_number]
+
+
+class SuggestionIndex:
+    """Immutable prefix index; a rebuild creates a new one."""
+
+    def __init__(self, entries):
+        # Rank entries once: most viewed first, then alphabetically
+        entries = sorted(entries, key=lambda entry: (-entry[1], entry[0]['label'].casefold()))
+        self.entries = [entry for entry, _, _ in entries]
+
+        pairs = sorted(
+            (key, rank)
+            for rank, (_, _, labels) in enumerate(entries)
+            for label in labels
+            for key in _suffix_keys(label)
+        )
+        self.keys = [key for key, _ in pairs]
+        self.ranks = [rank for _, rank in pairs]
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._precomputed = {}
+        for key in set(self.keys):
+            for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+                prefix = key[:length]
+                if prefix not in self._precomputed:
+                    self._precomputed[prefix] = self._top(prefix)
+
+    def _top(self, prefix):
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+        # An entry can match through several keys; ranks dedupe it
+        return heapq.nsmallest(MAX_SUGGESTIONS, set(self.ranks[start:end]))
+
+    def suggest(self, query, limit=DEFAULT_SUGGESTIONS):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        ranks = self._precomputed.get(prefix) if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH else None
+        if ranks is None:
+            with self._lock:
+                ranks = self._cache.get(prefix)
+                if ranks is not None:
+                    self._cache.move_to_end(prefix)
+            if ranks is None:
+                ranks = self._top(prefix)
+                with self._lock:
+                    self._cache[prefix] = ranks
+                    if len(self._cache) > PREFIX_CACHE_SIZE:
+                        self._cache.popitem(last=False)
+
+        return [self.entries[rank] for rank in ranks[:limit]]
+
+
+def build_index():
+    return SuggestionIndex([*_monastery_entries(), *_event_entries(), *_archive_entries()])
+
+
+_index = ModelDerived(
+    SUGGEST_MODELS,
+    build_index,
+    check_interval=GENERATION_CHECK_INTERVAL,
+    rebuild_interval=REBUILD_INTERVAL,
+)
+
+
+def suggest(query, limit=DEFAULT_SUGGESTIONS):
+    """Return up to ``limit`` suggestions for the prefix ``query``."""
+    return _index.get().suggest(query, limit)
+
+
+def invalidate():
+    """Rebuild the index on the next lookup."""
+    _index.invalidate()
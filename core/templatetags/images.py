@@ -0,0 +1,38 @@
+"""
+Template tags for responsive images.
+
+``{% picture item.image alt=item.title sizes="(min-width: 768px) 33vw, 100vw" class="card-img-top" %}``
+renders a ``<picture>`` with an AVIF/WebP ``<source>`` per derivative
+format and the original upload as the ``<img>`` fallback, so browsers pick
+the smallest file that fills the slot. ``{% srcset item.image %}`` returns
+just the WebP ``srcset`` value.
+"""
+
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from core import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(image, format=None):
+    return images.srcset(image, format)
+
+
+@register.simple_tag
+def picture(image, alt='', sizes='100vw', **attrs):
+    if not image:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((source['type'], source['srcset'], sizes) for source in images.picture_sources(image)),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}"{}></picture>',
+        sources, image.url, alt, flatatt(attrs),
+    )
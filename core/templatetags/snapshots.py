@@ -0,0 +1,36 @@
+"""
+Template tags for the catalog JSON snapshots.
+
+``{% snapshot_url 'events' %}`` resolves to the content-hashed snapshot
+listed in the manifest, which browsers may cache indefinitely, and falls
+back to the stable file name until a manifest has been built.
+"""
+
+import os
+
+from django import template
+from django.templatetags.static import static
+
+from core.snapshots import MANIFEST_NAME, read_manifest, snapshot_root
+
+register = template.Library()
+
+_manifest_cache = {'mtime': None, 'files': {}}
+
+
+def _manifest_files():
+    """Return the manifest's file map, re-read only when it changes."""
+    try:
+        mtime = os.stat(os.path.join(snapshot_root(), MANIFEST_NAME)).st_mtime_ns
+    except OSError:
+        return {}
+    if _manifest_cache['mtime'] != mtime:
+        _manifest_cache['files'] = read_manifest().get('files', {})
+        _manifest_cache['mtime'] = mtime
+    return _manifest_cache['files']
+
+
+@register.simple_tag
+def snapshot_url(name):
+    entry = _manifest_files().get(name)
+    return static(f"data/{entry['file'] if entry else name + '.json'}")
@@ -2,12 +2,38 @@
 Tests for core models and functionality.
 """
 
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
 # from django.contrib.gis.geos import Point  # Disabled for demo
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.template import Context, Template
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import translation
+from PIL import Image
 
-from core.models import AudioPOI, Monastery
+from core.geo import encode_geohash
+from archives.models import ArchiveItem
+from core.models import AudioPOI, ImageDerivative, Monastery, StoredFile
+from core import counters, datafiles, fulltext, fuzzy, images
+from core.analysis import ANALYZERS, get_analyzer
+from core.search import InvertedIndex, SearchIndex, search, search_index, tokenize
+from core.snapshots import MANIFEST_NAME, build_snapshots
+from core.storage import ContentAddressedStorage
+from core.views import _public_media, serve_media
+from tours.models import Panorama
 
 
 class MonasteryModelTest(TestCase):
@@ -122,3 +148,1103 @@ class AudioPOIModelTest(TestCase):
         pois = AudioPOI.objects.all()
         self.assertEqual(pois[0], poi2)  # Lower order should come first
         self.assertEqual(pois[1], poi1)
+
+
+class ResponseCacheTest(TestCase):
+    """Test cases for the generation-versioned response cache."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        self.url = reverse('api:monastery_list')
+
+    def test_repeat_request_served_from_cache(self):
+        """Test that a cached response skips the database entirely."""
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+
+    def test_save_invalidates_cached_response(self):
+        """Test that saving a model bumps its generation."""
+        self.client.get(self.url)
+        self.monastery.name = 'Renamed Monastery'
+        self.monastery.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['results'][0]['name'], 'Renamed Monastery')
+
+    def test_cached_response_honours_etag(self):
+        """Test that cache hits still answer conditional requests."""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class GeohashTest(TestCase):
+    """Test cases for geohash maintenance and spatial lookups."""
+
+    def create_monastery(self, name, latitude, longitude):
+        return Monastery.objects.create(
+            name=name,
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=latitude,
+            longitude=longitude,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+
+    def test_known_geohash(self):
+        """Test encoding against a published reference value."""
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_geohash_maintained_on_save(self):
+        """Test that moving a monastery refreshes its geohash."""
+        monastery = self.create_monastery('Rumtek', 27.2886, 88.5615)
+        original = monastery.geohash
+        monastery.latitude = 27.3046
+        monastery.save(update_fields=['latitude'])
+        monastery.refresh_from_db()
+        self.assertNotEqual(monastery.geohash, original)
+        self.assertEqual(monastery.geohash, encode_geohash(27.3046, 88.5615))
+
+    def test_nearby_ranks_by_distance(self):
+        """Test nearby lookup filters by radius and sorts nearest first."""
+        self.create_monastery('Enchey', 27.3359, 88.6190)
+        self.create_monastery('Rumtek', 27.2886, 88.5615)
+        self.create_monastery('Pemayangtse', 27.3049, 88.2515)
+
+        response = self.client.get(reverse('api:nearby'), {
+            'lat': 27.3389, 'lng': 88.6065, 'radius': 10, 'kind': 'monasteries',
+        })
+        names = [row['name'] for row in response.json()['results']['monasteries']]
+        self.assertEqual(names, ['Enchey', 'Rumtek'])
+
+    def test_bbox_lookup(self):
+        """Test bounding box lookup returns only rows inside the box."""
+        self.create_monastery('Enchey', 27.3359, 88.6190)
+        self.create_monastery('Pemayangtse', 27.3049, 88.2515)
+
+        response = self.client.get(reverse('api:bbox'), {
+            'south': 27.2, 'west': 88.5, 'north': 27.4, 'east': 88.7,
+        })
+        names = [row['name'] for row in response.json()['results']['monasteries']]
+        self.assertEqual(names, ['Enchey'])
+
+
+class SnapshotTest(TestCase):
+    """Test cases for the static JSON snapshot builder."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+            pano_id='test',
+        )
+        self.directory = tempfile.mkdtemp()
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name)) as f:
+            return json.load(f)
+
+    def test_build_writes_hashed_files_and_manifest(self):
+        """Test that each snapshot has a stable and a hashed copy."""
+        changed = build_snapshots(directory=self.directory)
+        self.assertIn('monasteries', changed)
+
+        manifest = self.read(MANIFEST_NAME)
+        entry = manifest['files']['monasteries']
+        self.assertTrue(entry['file'].startswith('monasteries.'))
+        self.assertEqual(self.read(entry['file']), self.read('monasteries.json'))
+        self.assertEqual(self.read('monasteries.json')['monasteries'][0]['panoId'], 'test')
+
+    def test_panoramas_without_image(self):
+        """Test that image-less panoramas never replace the curated panorama config."""
+        Panorama.objects.create(
+            monastery=self.monastery,
+            title='Demo Hall',
+            description='Demo data has no images.',
+            location_name='Demo Hall',
+            image_alt='Demo hall',
+        )
+        changed = build_snapshots(directory=self.directory)
+        self.assertNotIn('monastery_panoramas', changed)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'monastery_panoramas.json')))
+
+        Panorama.objects.create(
+            monastery=self.monastery,
+            title='Main Hall',
+            description='The main hall.',
+            location_name='Main Hall',
+            image='tours/panoramas/main-hall.jpg',
+            image_alt='Main hall',
+        )
+        build_snapshots(directory=self.directory)
+        panoramas = self.read('monastery_panoramas.json')['monasteries']
+        self.assertEqual([view['title'] for view in panoramas['test']['views']], ['Main Hall'])
+        # Curated monasteries are kept
+        self.assertTrue(panoramas['rumtek']['views'][0]['url'])
+
+    def test_unchanged_rebuild_keeps_hash(self):
+        """Test that rebuilding identical data reports no changes."""
+        build_snapshots(directory=self.directory)
+        before = self.read(MANIFEST_NAME)['files']
+
+        self.assertEqual(build_snapshots(directory=self.directory), [])
+        self.assertEqual(self.read(MANIFEST_NAME)['files'], before)
+
+    def test_change_rotates_hashed_file(self):
+        """Test that edits produce a new hash and old versions are pruned."""
+        build_snapshots(names=['monasteries'], directory=self.directory)
+        for name in ('First', 'Second', 'Third'):
+            self.monastery.short_description = name
+            self.monastery.save()
+            self.assertEqual(
+                build_snapshots(names=['monasteries'], directory=self.directory),
+                ['monasteries'],
+            )
+
+        hashed = [name for name in os.listdir(self.directory) if name.count('.') == 2]
+        self.assertEqual(len(hashed), 2)
+        current = self.read(MANIFEST_NAME)['files']['monasteries']['file']
+        self.assertEqual(self.read(current)['monasteries'][0]['description'], 'Third')
+
+
+@override_settings(SEARCH_INDEX_PATH=os.path.join(tempfile.mkdtemp(), 'search_index.pickle'))
+class SearchIndexTest(TestCase):
+    """Test cases for the BM25 search index."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = Monastery.objects.create(
+            name='Rumtek Monastery',
+            established_year=1740,
+            description='Seat of the Karmapa.',
+            short_description='Karma Kagyu seat.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Rumtek',
+            district='East Sikkim',
+            image_alt='Rumtek',
+        )
+        self.items = [
+            ArchiveItem.objects.create(
+                monastery=self.monastery,
+                title=title,
+                description=description,
+                item_type='manuscript',
+                catalog_number=f'RUM-{number:03d}',
+                image_alt=title,
+            )
+            for number, (title, description) in enumerate([
+                ('Kangyur volume', 'Canonical Kangyur text.'),
+                ('Thangka of Tara', 'Painting of Green Tara.'),
+                ('Prayer book', 'Daily prayers, mentions the Kangyur once.'),
+            ])
+        ]
+        self.index = SearchIndex()
+        self.index.build()
+
+    def test_tokenize_keeps_devanagari_words_whole(self):
+        """Test that combining vowel signs do not split words."""
+        self.assertEqual(tokenize('हिन्दी पाण्डुलिपि, the Kangyur'), ['हिन्दी', 'पाण्डुलिपि', 'kangyur'])
+
+    def test_bm25_ranks_title_matches_first(self):
+        """Test that the more relevant document ranks higher."""
+        results = self.index.search('archive_items', 'kangyur')
+        self.assertEqual([item.id for item in results[0:10]], [self.items[0].id, self.items[2].id])
+        self.assertGreater(results[0].search_score, results[1].search_score)
+
+    def test_refresh_applies_changes_and_deletions(self):
+        """Test that saves and deletes are picked up incrementally."""
+        self.items[1].title = 'Kangyur thangka'
+        self.items[1].save()
+        deleted_id = self.items[0].id
+        self.items[0].delete()
+
+        ids = [item.id for item in self.index.search('archive_items', 'kangyur')[0:10]]
+        self.assertIn(self.items[1].id, ids)
+        self.assertNotIn(deleted_id, ids)
+
+    def test_hidden_rows_are_removed(self):
+        """Test that unpublishing an item drops it from results."""
+        self.items[0].is_public = False
+        self.items[0].save()
+        results = self.index.search('archive_items', 'kangyur')
+        self.assertEqual(len(results), 1)
+
+    def test_save_and_load(self):
+        """Test that a saved index can be loaded by another process."""
+        self.index.save()
+        loaded = SearchIndex()
+        self.assertTrue(loaded.load())
+        self.assertEqual(len(loaded.indexes['archive_items']), 3)
+
+    def test_english_stemming(self):
+        """Test that inflected English queries match."""
+        results = self.index.search('archive_items', 'prayers', language='en')
+        self.assertEqual([item.id for item in results[0:10]], [self.items[2].id])
+
+    def test_query_uses_active_language(self):
+        """Test that Nepali postpositions are stripped only for Nepali."""
+        self.items[1].title = 'गुम्बाको थाङ्का'
+        self.items[1].save()
+        self.index.build()
+
+        with translation.override('ne'):
+            results = self.index.search('archive_items', 'गुम्बा')
+            self.assertEqual([item.id for item in results[0:10]], [self.items[1].id])
+        with translation.override('en'):
+            self.assertEqual(len(self.index.search('archive_items', 'गुम्बा')), 0)
+
+    def test_load_indexes_added_languages(self):
+        """Test that a language added after saving is indexed on load."""
+        english = SearchIndex(languages=['en'])
+        english.build()
+        english.save()
+
+        loaded = SearchIndex()
+        self.assertTrue(loaded.load())
+        results = loaded.search('archive_items', 'kangyur', language='hi')
+        self.assertEqual(len(results), 2)
+
+    def test_remove_cleans_postings(self):
+        """Test that removing the last posting of a term drops the term."""
+        index = InvertedIndex()
+        index.add(1, {'tara': 1.0})
+        index.remove(1)
+        self.assertEqual(dict(index.postings), {})
+        self.assertEqual(index.total_length, 0)
+
+
+class FullTextTest(TestCase):
+    """Test cases for the database full-text search backend."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monasteries = [
+            Monastery.objects.create(
+                name=name,
+                established_year=1700,
+                description=description,
+                short_description=description,
+                latitude=27.3,
+                longitude=88.5,
+                address='Sikkim',
+                district=district,
+                image_alt=name,
+            )
+            for name, district, description in [
+                ('Rumtek Monastery', 'East Sikkim', 'Seat of the Karmapa.'),
+                ('Pemayangtse Monastery', 'West Sikkim', 'Overlooks Rabdentse, near Rumtek lore.'),
+                ('Enchey Monastery', 'East Sikkim', 'Known for the Cham dance.'),
+            ]
+        ]
+
+    def names(self, queryset):
+        return [monastery.name for monastery in queryset]
+
+    def test_matching_uses_all_terms_and_prefixes(self):
+        """Test that every term must match and partial words match."""
+        queryset = Monastery.objects.order_by('name')
+        self.assertEqual(
+            self.names(fulltext.matching(queryset, 'east monas')),
+            ['Enchey Monastery', 'Rumtek Monastery'],
+        )
+        self.assertEqual(self.names(fulltext.matching(queryset, 'cham')), ['Enchey Monastery'])
+
+    def test_ranked_prefers_title_matches(self):
+        """Test that a name match outranks a description match."""
+        results = fulltext.ranked(Monastery.objects.all(), 'rumtek')
+        self.assertEqual(self.names(results), ['Rumtek Monastery', 'Pemayangtse Monastery'])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that the index is maintained on save and delete."""
+        self.monasteries[2].description = 'Home of the annual Detor Cham.'
+        self.monasteries[2].save()
+        self.monasteries[0].delete()
+
+        queryset = Monastery.objects.all()
+        self.assertEqual(self.names(fulltext.matching(queryset, 'detor')), ['Enchey Monastery'])
+        self.assertEqual(self.names(fulltext.matching(queryset, 'karmapa')), [])
+
+    def test_default_backend(self):
+        """Test that searches use the database by default, without the analyzed index."""
+        self.assertEqual(settings.SEARCH_BACKEND, 'database')
+        with mock.patch.object(search_index, 'rank') as memory_search:
+            self.assertEqual(self.names(search('monasteries', 'karmapa')), ['Rumtek Monastery'])
+            response = self.client.get(reverse('core:search'), {'q': 'rumtek'})
+        memory_search.assert_not_called()
+        self.assertEqual(
+            self.names(response.context['results']['monasteries']),
+            ['Rumtek Monastery', 'Pemayangtse Monastery'],
+        )
+
+    def test_devanagari_variants_with_default_backend(self):
+        """Test that Devanagari spelling variants match through the analyzed index."""
+        self.monasteries[1].description = 'पहाड़ी गाँव का पुराना गुम्बा।'
+        self.monasteries[1].save()
+        with translation.override('hi'):
+            # The plural oblique form only meets the stored singular once stemmed
+            self.assertEqual(self.names(search('monasteries', 'गुम्बाओं')), ['Pemayangtse Monastery'])
+            self.assertEqual(
+                self.names(fulltext.matching(Monastery.objects.all(), 'गुम्बाओं में')),
+                ['Pemayangtse Monastery'],
+            )
+        response = self.client.get(reverse('core:monastery_list'), {'q': 'गुम्बाओं'}, HTTP_ACCEPT_LANGUAGE='hi')
+        self.assertEqual(self.names(response.context['page_obj']), ['Pemayangtse Monastery'])
+
+    def test_monastery_list_search(self):
+        """Test that the monastery list searches through the backend."""
+        response = self.client.get(reverse('core:monastery_list'), {'q': 'karmapa'})
+        self.assertEqual(self.names(response.context['page_obj']), ['Rumtek Monastery'])
+
+
+class FuzzyMatchTest(TestCase):
+    """Test cases for trigram "did you mean" matching."""
+
+    def setUp(self):
+        """Set up test data."""
+        for name, district in [
+            ('Rumtek Monastery', 'East Sikkim'),
+            ('Tashiding Monastery', 'West Sikkim'),
+            ('Enchey Monastery', 'East Sikkim'),
+        ]:
+            Monastery.objects.create(
+                name=name,
+                established_year=1700,
+                description=name,
+                short_description=name,
+                latitude=27.3,
+                longitude=88.5,
+                address='Sikkim',
+                district=district,
+                image_alt=name,
+            )
+        fuzzy._memory_indexes.invalidate()
+
+    def names(self, objects):
+        return [obj.name for obj in objects]
+
+    def test_similarity(self):
+        """Test pg_trgm-style similarity."""
+        self.assertEqual(fuzzy.similarity('rumtek', 'Rumtek'), 1.0)
+        self.assertAlmostEqual(fuzzy.similarity('rumtech', 'rumtek'), 0.5)
+        self.assertEqual(fuzzy.similarity('rumtek', ''), 0.0)
+
+    def test_misspelled_name(self):
+        """Test that a misspelling finds the monastery."""
+        self.assertEqual(self.names(fuzzy.similar('monasteries', 'Rumtech')), ['Rumtek Monastery'])
+
+    def test_word_match(self):
+        """Test that one well-spelled word of a longer name is enough."""
+        results = fuzzy.similar('monasteries', 'Tashiding Gompa')
+        self.assertEqual(self.names(results)[0], 'Tashiding Monastery')
+
+    def test_unrelated_query(self):
+        """Test that nothing is suggested for unrelated text."""
+        self.assertEqual(fuzzy.similar('monasteries', 'xyzzy'), [])
+
+    def test_monastery_list_did_you_mean(self):
+        """Test that an empty monastery search offers close names."""
+        response = self.client.get(reverse('core:monastery_list'), {'q': 'Rumtech'})
+        self.assertEqual(self.names(response.context['did_you_mean']), ['Rumtek Monastery'])
+        self.assertContains(response, 'Did you mean')
+
+
+class AnalyzerTest(TestCase):
+    """Test cases for the language analyzers."""
+
+    def test_devanagari_folding(self):
+        """Test that nukta, candrabindu and long vowel variants meet."""
+        hindi = ANALYZERS['hi']
+        self.assertEqual(hindi('ज़िंदगी'), hindi('जिंदगी'))
+        self.assertEqual(hindi('गाँव'), hindi('गांव'))
+        self.assertEqual(hindi('दीप'), hindi('दिप'))
+
+    def test_zero_width_joiners_ignored(self):
+        """Test that rendering-only characters do not split or change words."""
+        self.assertEqual(ANALYZERS['ne']('गुम्\u200dबा'), ANALYZERS['ne']('गुम्बा'))
+
+    def test_english_stems(self):
+        """Test that English inflections share a stem."""
+        english = ANALYZERS['en']
+        self.assertEqual(english('dance dances danced dancing'), ['danc'] * 4)
+        self.assertEqual(english('the monasteries'), english('monastery'))
+
+    def test_get_analyzer(self):
+        """Test analyzer selection by language code."""
+        self.assertEqual(get_analyzer('hi-in').language, 'hi')
+        self.assertEqual(get_analyzer('fr').language, 'en')
+        with translation.override('ne'):
+            self.assertEqual(get_analyzer().language, 'ne')
+
+
+class MediaServingTest(TestCase):
+    """Test cases for media file serving backends."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.media_root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.media_root, 'tours', 'panoramas'))
+        for name in ('tours/panoramas/page.jpg', 'tours/panoramas/page.0123456789ab.jpg'):
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(b'x' * 100)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_django_backend(self):
+        """Test that the worker serves media with validators and ranges."""
+        response = self.client.get('/media/tours/panoramas/page.jpg', HTTP_RANGE='bytes=90-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'x' * 10)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+        repeat = self.client.get('/media/tours/panoramas/page.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_hashed_names_are_immutable(self):
+        """Test that content-hashed names are cached for a year."""
+        response = self.client.get('/media/tours/panoramas/page.0123456789ab.jpg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_paths_outside_media_root(self):
+        """Test that traversal and missing files are not served."""
+        request = RequestFactory().get('/media/')
+        for path in ('../manage.py', 'tours/panoramas', 'tours/panoramas/missing.jpg', 'tours/../../manage.py'):
+            with self.assertRaises(Http404):
+                serve_media(request, path)
+
+    def test_private_files_not_served(self):
+        """Test that scans, tiles and images of non-public items are not served."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        items = {}
+        for number, is_public in (('PRIV-001', False), ('PUB-001', True)):
+            item = ArchiveItem.objects.create(
+                monastery=monastery,
+                title=number,
+                description='A scanned manuscript.',
+                item_type='manuscript',
+                catalog_number=number,
+                image_alt='Scan',
+                is_public=is_public,
+            )
+            item.scan.save(f'{number}.pdf', ContentFile(number.encode() * 10))
+            item.image.save(f'{number}.jpg', ContentFile(b'image of ' + number.encode()))
+            items[number] = item
+        os.makedirs(os.path.join(self.media_root, 'archives', 'scans'))
+        with open(os.path.join(self.media_root, 'archives', 'scans', 'legacy.pdf'), 'wb') as f:
+            f.write(b'x')
+
+        _public_media.invalidate()
+        request = RequestFactory().get('/media/')
+        private = items['PRIV-001']
+        for path in (private.scan.name, private.image.name, items['PUB-001'].scan.name,
+                     'archives/scans/legacy.pdf', 'tours/../archives/scans/legacy.pdf'):
+            with self.assertRaises(Http404):
+                serve_media(request, path)
+
+        response = self.client.get(items['PUB-001'].image.url)
+        self.assertEqual(b''.join(response.streaming_content), b'image of PUB-001')
+
+    @override_settings(SENDFILE_BACKEND='nginx', SENDFILE_URL='/protected-media/')
+    def test_nginx_backend(self):
+        """Test that nginx is handed the file with X-Accel-Redirect."""
+        response = self.client.get('/media/tours/panoramas/page.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/tours/panoramas/page.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    @override_settings(SENDFILE_BACKEND='apache')
+    def test_apache_backend(self):
+        """Test that Apache is handed the file path with X-Sendfile."""
+        response = self.client.get('/media/tours/panoramas/page.jpg')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'tours', 'panoramas', 'page.jpg'))
+
+
+@override_settings(
+    IMAGE_DERIVATIVE_WIDTHS=[100, 200],
+    IMAGE_DERIVATIVE_FORMATS=['webp'],
+    IMAGE_DERIVATIVE_WORKERS=0,
+)
+class ImageDerivativeTest(TestCase):
+    """Test cases for responsive image derivatives."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            district='East Sikkim',
+            image_alt='Test monastery image',
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def jpeg(self, width, height):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), (200, 120, 40)).save(buffer, 'JPEG')
+        return ContentFile(buffer.getvalue())
+
+    def upload(self, obj, field, width=300, height=150, name='photo.jpg'):
+        with self.captureOnCommitCallbacks(execute=True):
+            getattr(obj, field).save(name, self.jpeg(width, height))
+
+    def test_widths_generated_on_save(self):
+        """Test that saving an image creates hashed derivatives at each width."""
+        self.upload(self.monastery, 'image')
+        rows = ImageDerivative.objects.filter(source=self.monastery.image.name)
+        self.assertEqual([(d.width, d.height, d.format) for d in rows], [(100, 50, 'webp'), (200, 100, 'webp')])
+        for derivative in rows:
+            self.assertRegex(derivative.file.name, settings.MEDIA_IMMUTABLE_FILE_TEST)
+            with Image.open(derivative.file.path) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', (derivative.width, derivative.height)))
+
+        srcset = images.srcset(self.monastery.image)
+        self.assertIn('100w', srcset)
+        self.assertIn('200w', srcset)
+
+    def test_small_image_keeps_its_size(self):
+        """Test that images narrower than every width are not upscaled."""
+        self.upload(self.monastery, 'image', width=80, height=80)
+        widths = ImageDerivative.objects.values_list('width', flat=True)
+        self.assertEqual(list(widths), [80])
+
+    def test_identical_upload_reuses_files(self):
+        """Test that the same bytes under another name share derivative files."""
+        self.upload(self.monastery, 'image')
+        item = ArchiveItem.objects.create(
+            monastery=self.monastery, title='Scroll', description='A scroll.',
+            item_type='manuscript', catalog_number='A001', image_alt='Scroll',
+        )
+        self.upload(item, 'image', name='copy.jpg')
+        files = set(ImageDerivative.objects.values_list('file', flat=True))
+        self.assertEqual(ImageDerivative.objects.count(), 4)
+        self.assertEqual(len(files), 2)
+
+    def test_panorama_thumbnail_generated(self):
+        """Test that a panorama without a thumbnail gets one from its derivatives."""
+        panorama = Panorama.objects.create(
+            monastery=self.monastery, title='Hall', description='Hall.',
+            location_name='Hall', image_alt='Hall',
+        )
+        self.upload(panorama, 'image')
+        panorama.refresh_from_db()
+        self.assertTrue(panorama.thumbnail.name.endswith('.webp'))
+        self.assertIn('-200w.', panorama.thumbnail.name)
+
+    def test_pool_workers_open_the_files(self):
+        """Test that pooled encodes get file paths, not the images' bytes."""
+        items = []
+        for number in range(5):
+            item = ArchiveItem.objects.create(
+                monastery=self.monastery, title=f'Scroll {number}', description='A scroll.',
+                item_type='manuscript', catalog_number=f'P00{number}', image_alt='Scroll',
+            )
+            # Without running the on-commit build
+            item.image.save(f'scroll-{number}.jpg', self.jpeg(300 + number, 150), save=False)
+            items.append(item)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with mock.patch.object(executor, 'submit', wraps=executor.submit) as submit:
+                images.generate_derivatives([item.image for item in items], executor)
+        sources = [call.args[1] for call in submit.call_args_list]
+        self.assertEqual(sources, [item.image.path for item in items])
+        self.assertEqual(ImageDerivative.objects.count(), 10)
+
+    def test_srcset_in_api_and_templates(self):
+        """Test that the API and the picture tag expose the derivatives."""
+        self.upload(self.monastery, 'image')
+        response = self.client.get(reverse('api:monastery_list'), {'profile': 'card'})
+        srcset = response.json()['results'][0]['image_srcset']
+        self.assertIn('200w', srcset['image/webp'])
+
+        html = Template('{% load images %}{% picture monastery.image alt="Hall" %}').render(
+            Context({'monastery': self.monastery})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f'src="{self.monastery.image.url}"', html)
+
+
+class CounterTest(TestCase):
+    """Test cases for buffered view and download counters."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            district='East Sikkim',
+            image_alt='Test monastery image',
+        )
+        self.panoramas = [
+            Panorama.objects.create(
+                monastery=self.monastery, title=f'View {i}', description='View.',
+                location_name=f'Hall {i}', image_alt='View',
+            )
+            for i in range(2)
+        ]
+
+    def tearDown(self):
+        counters.flush()
+
+    def view_counts(self):
+        return list(Panorama.objects.order_by('pk').values_list('view_count', flat=True))
+
+    def test_increments_are_buffered_and_coalesced(self):
+        """Test that increments are written together, one update per field."""
+        first, second = self.panoramas
+        for _ in range(3):
+            first.increment_view_count()
+        second.increment_view_count()
+        self.assertEqual(self.view_counts(), [0, 0])
+        self.assertEqual(counters.pending(first, 'view_count'), 3)
+        self.assertEqual(counters.current(Panorama.objects.get(pk=first.pk), 'view_count'), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counters.flush(), 2)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.view_counts(), [3, 1])
+        self.assertEqual(counters.pending(first, 'view_count'), 0)
+
+    def test_stale_instances_do_not_lose_increments(self):
+        """Test that increments from stale copies of a row all count."""
+        copies = [Panorama.objects.get(pk=self.panoramas[0].pk) for _ in range(3)]
+        for copy in copies:
+            copy.increment_view_count()
+        counters.flush()
+        self.assertEqual(self.view_counts()[0], 3)
+
+    def test_download_count_matches_view_count(self):
+        """Test that both counters update the loaded instance and buffer the write."""
+        item = ArchiveItem.objects.create(
+            monastery=self.monastery,
+            title='Chronicle',
+            description='A chronicle.',
+            item_type='manuscript',
+            catalog_number='CNT-001',
+            image_alt='Chronicle',
+        )
+        item.increment_view_count()
+        item.increment_download_count()
+        self.assertEqual((item.view_count, item.download_count), (1, 1))
+        self.assertEqual(counters.pending(item, 'download_count'), 1)
+        stored = ArchiveItem.objects.get(pk=item.pk)
+        self.assertEqual(stored.download_count, 0)
+        self.assertEqual(counters.current(stored, 'download_count'), 1)
+
+    @override_settings(COUNTER_MAX_PENDING=2)
+    def test_flush_when_buffer_is_full(self):
+        """Test that reaching the pending limit flushes the buffer."""
+        self.panoramas[0].increment_view_count()
+        self.assertEqual(self.view_counts(), [0, 0])
+        self.panoramas[1].increment_view_count()
+        self.assertEqual(self.view_counts(), [1, 1])
+
+    @override_settings(COUNTER_FLUSH_INTERVAL=0)
+    def test_write_through(self):
+        """Test that an interval of 0 writes each increment immediately."""
+        self.panoramas[0].increment_view_count()
+        self.assertEqual(self.view_counts(), [1, 0])
+
+    @override_settings(COUNTER_BACKEND='cache')
+    def test_cache_backend(self):
+        """Test that the shared cache backend keeps and flushes deltas."""
+        self.panoramas[0].increment_view_count()
+        self.panoramas[0].increment_view_count()
+        self.assertEqual(counters.pending(self.panoramas[0], 'view_count'), 2)
+        counters.flush()
+        self.assertEqual(self.view_counts(), [2, 0])
+        self.assertEqual(counters.pending(self.panoramas[0], 'view_count'), 0)
+
+
+class DataFileTest(TestCase):
+    """Test cases for the in-memory JSON data file cache."""
+
+    def setUp(self):
+        """Write a data file."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'monasteries.json')
+        self.write({'monasteries': [{'panoId': 'rumtek', 'name': 'Rumtek'}]})
+        datafiles.clear()
+
+    def tearDown(self):
+        """Remove the data file."""
+        datafiles.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, data, mtime_ns=None):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def load(self):
+        return datafiles.load(self.path, index=datafiles.keyed('monasteries', 'panoId'))
+
+    def test_parsed_once(self):
+        """Test that an unchanged file is served from memory."""
+        first = self.load()
+        self.assertIs(self.load(), first)
+        self.assertEqual(first.index['rumtek']['name'], 'Rumtek')
+        self.assertEqual(json.loads(first.content), first.data)
+        self.assertNotIn(b'\n', first.content)
+
+    def test_index_per_caller(self):
+        """Test that loading a path without an index does not drop it for later callers."""
+        self.assertIsNone(datafiles.load(self.path).index)
+        self.assertEqual(self.load().index['rumtek']['name'], 'Rumtek')
+        self.assertIsNone(datafiles.load(self.path).index)
+
+    def test_reloaded_on_change(self):
+        """Test that a new mtime or size reparses the file."""
+        self.write({'monasteries': [{'panoId': 'rumtek', 'name': 'Rumtek'}]}, mtime_ns=10**18)
+        first = self.load()
+
+        # Same size, new mtime
+        self.write({'monasteries': [{'panoId': 'pemyan', 'name': 'Rumtek'}]}, mtime_ns=2 * 10**18)
+        second = self.load()
+        self.assertIsNot(second, first)
+        self.assertIn('pemyan', second.index)
+
+        # New size, same mtime
+        self.write({'monasteries': [{'panoId': 'pemayangtse', 'name': 'Pemayangtse'}]}, mtime_ns=2 * 10**18)
+        self.assertIn('pemayangtse', self.load().index)
+
+    def test_errors(self):
+        """Test that missing and malformed files raise."""
+        with open(self.path, 'w') as f:
+            f.write('{')
+        with self.assertRaises(ValueError):
+            self.load()
+        os.remove(self.path)
+        with self.assertRaises(OSError):
+            self.load()
+
+
+class ContentAddressedStorageTest(TestCase):
+    """Test cases for the deduplicating content-addressed storage."""
+
+    content = b'thangka scan ' * 1000
+
+    def setUp(self):
+        """Set up an empty media root."""
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.storage = ContentAddressedStorage()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_identical_uploads_are_stored_once(self):
+        """Test that identical bytes share one file and reference count."""
+        first = self.storage.save('archives/scans/a.JPG', ContentFile(self.content))
+        second = self.storage.save('archives/scans/b.jpg', ContentFile(self.content))
+        digest = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(first, f'cas/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(second, first)
+        self.assertEqual(self.storage.references(first), 2)
+        self.assertEqual(StoredFile.objects.get(name=first).size, len(self.content))
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'cas', 'tmp')), [])
+
+        other = self.storage.save('archives/scans/c.jpg', ContentFile(b'another scan'))
+        self.assertNotEqual(other, first)
+
+    def test_delete_drops_references(self):
+        """Test that the file is removed with its last reference only."""
+        name = self.storage.save('a.mp3', ContentFile(self.content))
+        self.storage.save('b.mp3', ContentFile(self.content))
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertEqual(self.storage.references(name), 0)
+
+        # Uploading the bytes again restores the file
+        self.assertEqual(self.storage.save('c.mp3', ContentFile(self.content)), name)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_served_immutable(self):
+        """Test that content-addressed names are cached for a year."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        panorama = Panorama(
+            monastery=monastery,
+            title='Main Hall Panorama',
+            description='360-degree view of the main hall.',
+            location_name='Main Hall',
+            image_alt='Panoramic view of main hall',
+        )
+        panorama.image.save('hall.jpg', ContentFile(self.content))
+        _public_media.invalidate()
+        response = self.client.get(panorama.image.url)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_rows_release_their_files(self):
+        """Test that replacing or deleting an upload releases its file."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        items = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in ('CAS-001', 'CAS-002'):
+                item = ArchiveItem.objects.create(
+                    monastery=monastery,
+                    title=f'Scan {number}',
+                    description='A scanned manuscript.',
+                    item_type='manuscript',
+                    catalog_number=number,
+                    image_alt='Scan',
+                )
+                item.scan.save('scan.pdf', ContentFile(self.content))
+                items.append(item)
+        name = items[0].scan.name
+        self.assertEqual(items[1].scan.name, name)
+        self.assertEqual(items[0].scan.storage.references(name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            items[0].scan.save('other.pdf', ContentFile(b'a different scan'))
+        self.assertEqual(items[0].scan.storage.references(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            items[1].delete()
+        self.assertFalse(items[0].scan.storage.exists(name))
+
+    def test_assigned_names_hold_references(self):
+        """Test that a stored name copied onto another row keeps the file for it."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            original = ArchiveItem.objects.create(
+                monastery=monastery,
+                title='Scan',
+                description='A scanned manuscript.',
+                item_type='manuscript',
+                catalog_number='CP-001',
+                image_alt='Scan',
+            )
+            original.scan.save('scan.pdf', ContentFile(self.content))
+            copy = ArchiveItem.objects.create(
+                monastery=monastery,
+                title='Copy',
+                description='The same manuscript.',
+                item_type='manuscript',
+                catalog_number='CP-002',
+                image_alt='Scan',
+                scan=original.scan.name,
+            )
+        name = original.scan.name
+        self.assertEqual(self.storage.references(name), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            original.delete()
+        self.assertTrue(self.storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_reupload_does_not_leak_references(self):
+        """Test that uploading a row's own bytes again keeps one reference."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        item = ArchiveItem.objects.create(
+            monastery=monastery,
+            title='Scan',
+            description='A scanned manuscript.',
+            item_type='manuscript',
+            catalog_number='RU-001',
+            image_alt='Scan',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            item.scan.save('scan.pdf', ContentFile(self.content))
+        name = item.scan.name
+        with self.captureOnCommitCallbacks(execute=True):
+            item.scan.save('again.pdf', ContentFile(self.content))
+        self.assertEqual(self.storage.references(name), 1)
+
+        # An upload assigned to the field is stored by the save itself
+        with self.captureOnCommitCallbacks(execute=True):
+            item.scan = ContentFile(self.content, name='form.pdf')
+            item.save()
+        self.assertEqual(item.scan.name, name)
+        self.assertEqual(self.storage.references(name), 1)
+        item.title = 'Renamed'
+        item.save()
+        self.assertEqual(self.storage.references(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_legacy_files_are_kept(self):
+        """Test that files stored before content addressing are never removed."""
+        monastery = Monastery.objects.create(
+            name='Test Monastery',
+            established_year=1800,
+            description='A test monastery.',
+            short_description='Test monastery.',
+            latitude=27.3389,
+            longitude=88.5937,
+            address='Test Address',
+            district='East Sikkim',
+            image_alt='Test image',
+        )
+        legacy = 'archives/scans/legacy.pdf'
+        os.makedirs(os.path.join(self.media_root, 'archives', 'scans'))
+        with open(os.path.join(self.media_root, legacy), 'wb') as f:
+            f.write(self.content)
+
+        items = [
+            ArchiveItem.objects.create(
+                monastery=monastery,
+                title=f'Scan {number}',
+                description='A scanned manuscript.',
+                item_type='manuscript',
+                catalog_number=number,
+                image_alt='Scan',
+                scan=legacy,
+            )
+            for number in ('LEG-001', 'LEG-002')
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            items[0].scan.save('other.pdf', ContentFile(b'a different scan'))
+        with self.captureOnCommitCallbacks(execute=True):
+            items[1].delete()
+        self.storage.delete(legacy)
+        self.assertTrue(self.storage.exists(legacy))
+
+
+class SearchViewTest(TestCase):
+    """Test cases for the global search page."""
+
+    def setUp(self):
+        """Set up twelve matching monasteries."""
+        for number in range(12):
+            Monastery.objects.create(
+                name=f'Rumtek Retreat {number}',
+                established_year=1800,
+                description='A retreat centre.',
+                short_description='Retreat.',
+                latitude=27.3389,
+                longitude=88.5937,
+                address='Test Address',
+                district='East Sikkim',
+                image_alt='Test image',
+            )
+
+    def test_results_paginated_per_type(self):
+        """Test that each result type is split into its own pages."""
+        response = self.client.get(reverse('core:search'), {'q': 'rumtek'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['results']['total_results'], 12)
+        section, = response.context['sections']
+        self.assertEqual(section['name'], 'monasteries')
+        self.assertEqual(len(section['page']), 10)
+        self.assertContains(response, 'monasteries_page=2')
+
+        response = self.client.get(reverse('core:search'), {'q': 'rumtek', 'monasteries_page': 2})
+        self.assertEqual(response.status_code, 200)
+        section, = response.context['sections']
+        self.assertEqual(section['page'].number, 2)
+        self.assertEqual(len(section['page']), 2)
+
+    def test_did_you_mean(self):
+        """Test that a misspelled search links to the close names."""
+        response = self.client.get(reverse('core:search'), {'q': 'Rumtk Retreet'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['results']['total_results'], 0)
+        self.assertTrue(response.context['results']['did_you_mean'])
+        self.assertContains(response, 'Did you mean')
+        self.assertContains(response, '?q=Rumtek%20Retreat%20')
+
+    def test_empty_query(self):
+        """Test that the search page renders without a query."""
+        response = self.client.get(reverse('core:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['sections'], [])
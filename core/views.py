@@ -5,9 +5,16 @@ Handles the main website views including homepage, monastery details,
 and error pages.
 """
 
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
 from django.core.paginator import Paginator
-from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.db.models import Count
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 
@@ -15,7 +22,13 @@ from archives.models import ArchiveItem
 from events.models import Event
 from tours.models import Panorama
 
+from . import fulltext, fuzzy
+from .cache import ModelDerived, cache_response
 from .models import AudioPOI, Monastery
+from .search import SEARCH_TYPES, search as search_results
+from .sendfile import sendfile
+
+SEARCH_PAGE_SIZE = 10
 
 
 def home(request):
@@ -25,6 +38,7 @@ def home(request):
     return render(request, 'core/home_standalone.html')
 
 
+@cache_response(Monastery, AudioPOI, Panorama, Event, ArchiveItem)
 def monastery_detail(request, slug):
     """
     Detailed view of a monastery including all related content.
@@ -78,11 +92,7 @@ def monastery_list(request):
     # Search functionality
     search_query = request.GET.get('q', '').strip()
     if search_query:
-        monasteries = monasteries.filter(
-            Q(name__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(district__icontains=search_query)
-        )
+        monasteries = fulltext.matching(monasteries, search_query)
 
     # District filtering
     district_filter = request.GET.get('district', '').strip()
@@ -108,13 +118,19 @@ def monastery_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
+    # Offer close spellings when a search finds nothing
+    did_you_mean = []
+    if search_query and not paginator.count:
+        did_you_mean = fuzzy.similar('monasteries', search_query)
+
     context = {
         'page_obj': page_obj,
         'search_query': search_query,
+        'did_you_mean': did_you_mean,
         'district_filter': district_filter,
         'districts': districts,
         'order_by': order_by,
-        'total_count': monasteries.count(),
+        'total_count': paginator.count,
         'page_title': 'All Monasteries - Monastery360',
         'page_description': 'Browse all Buddhist monasteries in Sikkim with detailed information, virtual tours, and historical archives.',
     }
@@ -129,48 +145,59 @@ def monastery_map(request):
     return render(request, 'core/monastery_map.html')
 
 
+# Headings of the search result sections, by search type
+SEARCH_SECTION_TITLES = {
+    'monasteries': 'Monasteries',
+    'events': 'Events',
+    'archive_items': 'Archive Items',
+}
+
+
+def _page_url(request, param, number):
+    """The current URL with ``param`` set to page ``number``."""
+    query = request.GET.copy()
+    query[param] = number
+    return f'?{query.urlencode()}'
+
+
 def search(request):
     """
     Global search across monasteries, events, and archive items.
+
+    Results are ranked by relevance and paginated separately per type
+    (``?monasteries_page=``, ``?events_page=``, ``?archive_items_page=``).
+    When nothing matches, ``did_you_mean`` lists close spellings.
     """
     query = request.GET.get('q', '').strip()
     results = {}
+    sections = []
 
     if query and len(query) >= 2:
-        # Search monasteries
-        monasteries = Monastery.objects.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(district__icontains=query),
-            is_active=True
-        )[:5]
-
-        # Search events
-        events = Event.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query),
-            is_public=True,
-            is_cancelled=False
-        ).select_related('monastery')[:5]
-
-        # Search archive items
-        archive_items = ArchiveItem.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(cultural_significance__icontains=query),
-            is_public=True
-        ).select_related('monastery')[:5]
-
-        results = {
-            'monasteries': monasteries,
-            'events': events,
-            'archive_items': archive_items,
-            'total_results': len(monasteries) + len(events) + len(archive_items),
-        }
+        total = 0
+        for name in SEARCH_TYPES:
+            param = f'{name}_page'
+            paginator = Paginator(search_results(name, query), SEARCH_PAGE_SIZE)
+            page = paginator.get_page(request.GET.get(param))
+            results[name] = page
+            total += paginator.count
+            if paginator.count:
+                sections.append({
+                    'name': name,
+                    'title': SEARCH_SECTION_TITLES.get(name, name),
+                    'page': page,
+                    'page_links': [
+                        (number, _page_url(request, param, number) if number != paginator.ELLIPSIS else None)
+                        for number in paginator.get_elided_page_range(page.number)
+                    ] if paginator.num_pages > 1 else [],
+                })
+        results['total_results'] = total
+        if not total:
+            results['did_you_mean'] = fuzzy.did_you_mean(query)
 
     context = {
         'query': query,
         'results': results,
+        'sections': sections,
         'page_title': f'Search Results for "{query}"' if query else 'Search - Monastery360',
         'page_description': 'Search monasteries, events, and historical archives across Sikkim.',
     }
@@ -178,6 +205,61 @@ def search(request):
     return render(request, 'core/search.html', context)
 
 
+# Upload directories whose files are all public. Anything else under
+# MEDIA_ROOT (scans, tile pyramids, the IIIF cache, content-addressed
+# uploads) is only served here when a public row uses it as an image or
+# audio file; scans and tiles have their own views, which check access.
+PUBLIC_MEDIA_PREFIXES = (
+    'monasteries/images/',
+    'events/images/',
+    'tours/',
+    'audio/pois/',
+    'derivatives/',
+)
+
+
+def _load_public_media():
+    names = set(
+        ArchiveItem.objects.filter(is_public=True, monastery__is_active=True)
+        .values_list('image', flat=True)
+    )
+    for values in Panorama.objects.values_list('image', 'thumbnail', 'narration_audio'):
+        names.update(values)
+    names.update(AudioPOI.objects.values_list('audio_file', flat=True))
+    names.discard('')
+    return frozenset(names)
+
+
+# Checked on every media request outside the public directories
+_public_media = ModelDerived([ArchiveItem, Monastery, Panorama, AudioPOI], _load_public_media)
+
+
+def is_public_media(path):
+    """Whether the normalized media ``path`` may be served to anyone."""
+    return path.startswith(PUBLIC_MEDIA_PREFIXES) or path in _public_media.get()
+
+
+def serve_media(request, path):
+    """
+    Serve a public uploaded file from ``MEDIA_ROOT`` through ``SENDFILE_BACKEND``.
+
+    Only files in ``PUBLIC_MEDIA_PREFIXES`` or used by a public row are
+    served. Names matching ``MEDIA_IMMUTABLE_FILE_TEST`` carry a content
+    hash and are cached without revalidation.
+    """
+    path = posixpath.normpath(path)
+    if path.startswith(('/', '../')) or path == '..' or not is_public_media(path):
+        raise Http404('File not found')
+    try:
+        if not os.path.isfile(default_storage.path(path)):
+            raise Http404('File not found')
+    except (SuspiciousFileOperation, NotImplementedError):
+        raise Http404('File not found')
+
+    immutable = re.search(settings.MEDIA_IMMUTABLE_FILE_TEST, path) is not None
+    return sendfile(request, default_storage, path, immutable=immutable)
+
+
 def custom_404(request, exception):
     """Custom 404 error page."""
     context = {
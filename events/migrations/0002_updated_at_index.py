@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['updated_at', 'id'], name='events_even_updated_ffcd3d_idx'),
+        ),
+    ]
@@ -210,6 +210,7 @@ class Event(models.Model):
             models.Index(fields=['event_type']),
             models.Index(fields=['is_public']),
             models.Index(fields=['monastery', 'start_time']),
+            models.Index(fields=['updated_at', 'id']),
         ]
 
     def __str__(self):
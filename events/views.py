@@ -11,6 +11,7 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 
+from core import fulltext
 from core.models import Monastery
 
 from .models import Event
@@ -37,9 +38,8 @@ def event_list(request):
     search_query = request.GET.get('q', '').strip()
     if search_query:
         events = events.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(monastery__name__icontains=search_query)
+            Q(pk__in=fulltext.matching(Event.objects.all(), search_query).values('pk')) |
+            Q(monastery__in=fulltext.matching(Monastery.objects.all(), search_query).values('pk'))
         )
 
     # Filter by monastery
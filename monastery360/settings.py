@@ -115,6 +115,25 @@ DATABASES = {
     )
 }
 
+# Cache
+# Local memory suits a single node; point CACHE_URL at a shared backend
+# (e.g. filecache:///var/tmp/monastery360 or redis://host:6379/1) when
+# running several instances so generation counters are shared.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://monastery360'),
+}
+
+# Upper bound for cached responses; model changes invalidate them sooner
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=60 * 15)
+
+# View/download counters (see core.counters): buffered per process
+# ('memory') or in the shared cache ('cache'), written every
+# COUNTER_FLUSH_INTERVAL seconds (0 writes each hit) or once
+# COUNTER_MAX_PENDING counters are pending
+COUNTER_BACKEND = env('COUNTER_BACKEND', default='memory')
+COUNTER_FLUSH_INTERVAL = env.float('COUNTER_FLUSH_INTERVAL', default=10.0)
+COUNTER_MAX_PENDING = env.int('COUNTER_MAX_PENDING', default=1000)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -155,10 +174,55 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Static JSON snapshots of the catalog (see core.snapshots)
+SNAPSHOT_ROOT = env('SNAPSHOT_ROOT', default=str(BASE_DIR / 'static' / 'data'))
+SNAPSHOT_AUTO_REBUILD = env.bool('SNAPSHOT_AUTO_REBUILD', default=False)
+SNAPSHOT_DEBOUNCE_SECONDS = env.float('SNAPSHOT_DEBOUNCE_SECONDS', default=5.0)
+
+# Full-text search: 'database' (PostgreSQL tsvector / SQLite FTS5) or
+# 'memory' (in-process BM25 index, saved by `manage.py build_search_index`).
+# 'database' still answers Devanagari queries from the in-process index,
+# analyzed for the active language (see core.analysis).
+SEARCH_BACKEND = env('SEARCH_BACKEND', default='database')
+SEARCH_TEXT_CONFIG = env('SEARCH_TEXT_CONFIG', default='english')
+SEARCH_INDEX_PATH = env('SEARCH_INDEX_PATH', default=str(BASE_DIR / 'search_index.pickle'))
+# Minimum trigram similarity (0-1) for "did you mean" suggestions
+FUZZY_THRESHOLD = env.float('FUZZY_THRESHOLD', default=0.3)
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# How media and archive scans are sent: 'django' (the worker, using
+# sendfile where the WSGI server supports it), 'nginx' (X-Accel-Redirect to
+# the internal location SENDFILE_URL, aliased to MEDIA_ROOT) or 'apache'
+# (X-Sendfile)
+SENDFILE_BACKEND = env('SENDFILE_BACKEND', default='django')
+SENDFILE_URL = env('SENDFILE_URL', default='/protected-media/')
+SENDFILE_MAX_AGE = env.int('SENDFILE_MAX_AGE', default=3600)
+# Media names carrying a content hash (including content-addressed uploads
+# under cas/, see core.storage) are cached for a year
+MEDIA_IMMUTABLE_FILE_TEST = r'(?:\.[0-9a-f]{12,}|^cas/[0-9a-f]{2}/[0-9a-f]{64})\.\w+$'
+
+# Responsive derivatives of uploaded images (see core.images): widths in
+# pixels, formats best first (AVIF is skipped where Pillow cannot encode
+# it), encoder quality, and encoder processes (0 encodes in the request)
+IMAGE_DERIVATIVE_WIDTHS = env.list('IMAGE_DERIVATIVE_WIDTHS', cast=int, default=[320, 640, 1024, 1600])
+IMAGE_DERIVATIVE_FORMATS = env.list('IMAGE_DERIVATIVE_FORMATS', default=['avif', 'webp'])
+IMAGE_DERIVATIVE_QUALITY = env.int('IMAGE_DERIVATIVE_QUALITY', default=70)
+IMAGE_DERIVATIVE_WORKERS = env.int('IMAGE_DERIVATIVE_WORKERS', default=2)
+
+# Build deep-zoom tiles of archive scans in a background thread when a scan
+# changes; turn off to build them only with `manage.py build_scan_tiles`
+SCAN_TILES_AUTO_BUILD = env.bool('SCAN_TILES_AUTO_BUILD', default=True)
+
+# IIIF Image API: largest width/height served, and the on-disk cache of
+# rendered derivatives (keep it under MEDIA_ROOT for the nginx/apache
+# SENDFILE_BACKENDs), evicted least recently used beyond the byte limit
+IIIF_MAX_SIZE = env.int('IIIF_MAX_SIZE', default=4096)
+IIIF_CACHE_DIR = env('IIIF_CACHE_DIR', default=str(MEDIA_ROOT / 'iiif'))
+IIIF_CACHE_MAX_BYTES = env.int('IIIF_CACHE_MAX_BYTES', default=2 * 1024 ** 3)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -244,6 +308,9 @@ if not DEBUG:
 
     # Static files compression and caching
     STORAGES = {
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+        },
         "staticfiles": {
             "BACKEND": "whitenoise.storage.CompressedStaticFilesStorage",
         },
@@ -254,3 +321,5 @@ WHITENOISE_USE_FINDERS = True
 WHITENOISE_AUTOREFRESH = True
 WHITENOISE_SKIP_COMPRESS_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'zip', 'gz', 'tgz', 'bz2', 'tbz', 'xz', 'br']
 WHITENOISE_MANIFEST_STRICT = False
+# Content-hashed snapshots (e.g. data/events.3f9a0c1b2d4e.json) never change
+WHITENOISE_IMMUTABLE_FILE_TEST = r'^.+\.[0-9a-f]{12}\.json$'
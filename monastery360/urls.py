@@ -5,14 +5,19 @@ This file defines the main URL patterns and includes patterns from individual ap
 It also handles static and media file serving during development.
 """
 
+import os
+import re
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.sitemaps.views import sitemap
 from django.http import HttpResponse
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.views.generic import TemplateView
 
+from core.views import serve_media
+
 
 # Simple robots.txt view
 def robots_txt(request):
@@ -58,9 +63,14 @@ urlpatterns = [
     ), name='offline'),
 ]
 
-# Serve media and static files
-# In production, this should be handled by a web server (nginx/apache) or cloud storage
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve public media files (see core.views.PUBLIC_MEDIA_PREFIXES). Django
+# authorizes and validates; with SENDFILE_BACKEND set to nginx or apache the
+# proxy sends the bytes.
+# Media on a remote storage (absolute MEDIA_URL) is served from there.
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', serve_media, name='media'),
+    ]
 
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='panorama',
+            index=models.Index(fields=['updated_at', 'id'], name='tours_panor_updated_522a7d_idx'),
+        ),
+    ]
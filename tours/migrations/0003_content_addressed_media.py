@@ -0,0 +1,24 @@
+# Generated by Django 4.2.5 on 2026-10-17 04:52
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0002_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='panorama',
+            name='image',
+            field=models.ImageField(help_text='360-degree panoramic image file', storage=core.storage.content_storage, upload_to='tours/panoramas/'),
+        ),
+        migrations.AlterField(
+            model_name='panorama',
+            name='narration_audio',
+            field=models.FileField(blank=True, help_text='Audio narration for this panorama', storage=core.storage.content_storage, upload_to='tours/audio/'),
+        ),
+    ]
@@ -7,7 +7,9 @@ This module defines models for virtual tours and panoramic experiences.
 from django.db import models
 from django.urls import reverse
 
+from core import counters
 from core.models import Monastery
+from core.storage import content_storage
 
 
 class Panorama(models.Model):
@@ -41,6 +43,7 @@ class Panorama(models.Model):
     # 360-degree panoramic image
     image = models.ImageField(
         upload_to='tours/panoramas/',
+        storage=content_storage,
         help_text="360-degree panoramic image file"
     )
     image_alt = models.CharField(
@@ -58,6 +61,7 @@ class Panorama(models.Model):
     # Narration audio
     narration_audio = models.FileField(
         upload_to='tours/audio/',
+        storage=content_storage,
         blank=True,
         help_text="Audio narration for this panorama"
     )
@@ -114,6 +118,9 @@ class Panorama(models.Model):
     class Meta:
         ordering = ['monastery', 'order', 'title']
         unique_together = ['monastery', 'location_name']
+        indexes = [
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.monastery.name} - {self.title}"
@@ -129,9 +136,9 @@ class Panorama(models.Model):
         )
 
     def increment_view_count(self):
-        """Increment the view count for analytics."""
+        """Increment the view count for analytics (buffered, see ``core.counters``)."""
+        counters.increment(self, 'view_count')
         self.view_count += 1
-        self.save(update_fields=['view_count'])
 
     @property
     def has_audio(self):
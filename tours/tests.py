@@ -2,13 +2,16 @@
 Tests for tours models and functionality.
 """
 
-from django.test import TestCase
+from django.http import Http404
+from django.test import RequestFactory, TestCase
 
 # from django.contrib.gis.geos import Point  # Disabled for demo
 from django.urls import reverse
 
+from core import counters
 from core.models import Monastery
 from tours.models import Panorama
+from tours.views import monastery_detail_by_pano
 
 
 class PanoramaModelTest(TestCase):
@@ -66,5 +69,22 @@ class PanoramaModelTest(TestCase):
         panorama = Panorama.objects.create(**self.panorama_data)
         initial_count = panorama.view_count
         panorama.increment_view_count()
+        counters.flush()
         panorama.refresh_from_db()
         self.assertEqual(panorama.view_count, initial_count + 1)
+
+
+class MonasteryByPanoTest(TestCase):
+    """Test cases for the monastery page looked up by pano_id."""
+
+    def test_known_pano_id(self):
+        """Test that a pano_id from monasteries.json renders its monastery."""
+        response = self.client.get(reverse('tours:monastery_detail_by_pano', args=['rumtek']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['monastery']['panoId'], 'rumtek')
+
+    def test_unknown_pano_id(self):
+        """Test that an unknown pano_id is a 404."""
+        request = RequestFactory().get('/tours/pano/missing/')
+        with self.assertRaises(Http404):
+            monastery_detail_by_pano(request, 'missing')
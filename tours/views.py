@@ -5,11 +5,14 @@ Handles virtual tour functionality including panorama viewing
 and interactive tour experiences.
 """
 
+import os
+
+from django.conf import settings
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
-from django.urls import reverse
 
+from core import datafiles
 from core.models import Monastery
 
 from .models import Panorama
@@ -115,88 +118,17 @@ def monastery_tour(request, slug):
     # Get audio POIs
     audio_pois = monastery.audio_pois.filter(is_active=True).order_by('order')
 
-    # Prepare data for JavaScript tour navigation
-    panorama_data = []
-    for panorama in panoramas:
-        panorama_data.append({
-            'id': panorama.id,
-            'title': panorama.title,
-            'description': panorama.description,
-            'location_name': panorama.location_name,
-            'image_url': panorama.image.url if panorama.image else None,
-            'narration_audio_url': panorama.narration_audio.url if panorama.narration_audio else None,
-            'audio_duration': panorama.audio_duration,
-            'audio_transcript': panorama.audio_transcript,
-            'initial_yaw': panorama.initial_yaw,
-            'initial_pitch': panorama.initial_pitch,
-            'hotspots_data': panorama.hotspots_data,
-            'order': panorama.order,
-        })
-
-    # Prepare audio POI data - guard against POIs without coordinates
-    poi_data = []
-    for poi in audio_pois:
-        # AudioPOI model uses latitude/longitude fields (no 'location' attribute)
-        if getattr(poi, 'latitude', None) is not None and getattr(poi, 'longitude', None) is not None:
-            poi_data.append({
-                'id': poi.id,
-                'title': poi.title,
-                'description': poi.description,
-                'latitude': poi.latitude,
-                'longitude': poi.longitude,
-                'audio_url': poi.audio_file.url if poi.audio_file else None,
-                'audio_duration': poi.audio_duration,
-                'audio_transcript': poi.audio_transcript,
-                'order': poi.order,
-            })
-
+    # Panorama, POI and archive data for the viewer is loaded client-side
+    # from the tour bundle API (api:tour_bundle)
     context = {
         'monastery': monastery,
         'panoramas': panoramas,
         'audio_pois': audio_pois,
-        'panorama_data_json': panorama_data,
-        'poi_data_json': poi_data,
-        # include a small serialized list of archive items for the monastery tour page
-        'archive_items': [],
-    }
-
-    # build archive items with safe URL and image fallbacks
-    archive_qs = monastery.archive_items.filter(is_public=True)[:6]
-    archive_list = []
-    for a in archive_qs:
-        # safe detail url
-        try:
-            detail = a.get_absolute_url()
-        except Exception:
-            try:
-                detail = reverse('archives:item_detail', kwargs={'monastery_slug': monastery.slug, 'catalog_number': a.catalog_number})
-            except Exception:
-                detail = f"/archives/portal/?item={a.catalog_number}"
-
-        image_url = None
-        try:
-            image_url = a.image.url if a.image else None
-        except Exception:
-            image_url = None
-
-        archive_list.append({
-            'id': a.id,
-            'title': a.title,
-            'description': a.description,
-            'image_url': image_url,
-            'catalog_number': a.catalog_number,
-            'item_type': a.item_type,
-            'detail_url': detail,
-        })
-
-    context['archive_items'] = archive_list
-    # add a few remaining context values
-    context.update({
         'first_panorama': panoramas.first(),
         'page_title': f'Virtual Tour - {monastery.name}',
         'page_description': f'Take an immersive virtual tour of {monastery.name} with 360-degree panoramas and audio guides.',
         'canonical_url': request.build_absolute_uri(),
-    })
+    }
 
     return render(request, 'tours/monastery_tour.html', context)
 
@@ -245,55 +177,28 @@ def test_view(request):
     return HttpResponse("Test view is working! URL routing is fine.")
 
 
+def _monasteries_json_path():
+    return os.path.join(settings.BASE_DIR, 'static', 'data', 'monasteries.json')
+
+
 def monastery_detail_by_pano(request, pano_id):
     """
     Monastery detail page accessed by pano_id.
     Serves our new monastery_detail.html template.
     """
-    import json
-    import os
-
-    from django.conf import settings
-    from django.http import HttpResponse
+    try:
+        monasteries = datafiles.load(_monasteries_json_path(), index=datafiles.keyed('monasteries', 'panoId'))
+    except (OSError, ValueError, KeyError) as e:
+        raise Http404(f"Monastery data not available: {e}")
 
-    # Debug: Let's first check if the view is being called
-    print(f"DEBUG: monastery_detail_by_pano called with pano_id: {pano_id}")
+    monastery = monasteries.index.get(pano_id)
+    if monastery is None:
+        raise Http404("Monastery not found.")
 
-    # Load monastery data from JSON file
-    json_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'monasteries.json')
-    print(f"DEBUG: Looking for JSON file at: {json_path}")
+    context = {
+        'monastery': monastery,
+        'page_title': f'{monastery["name"]} - Virtual Tour',
+        'page_description': monastery['description'],
+    }
 
-    try:
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-
-        print(f"DEBUG: Loaded JSON data with {len(data.get('monasteries', []))} monasteries")
-
-        # Find monastery by pano_id
-        monastery = None
-        for m in data['monasteries']:
-            if m['panoId'] == pano_id:
-                monastery = m
-                break
-
-        if not monastery:
-            print(f"DEBUG: No monastery found with pano_id: {pano_id}")
-            available_pano_ids = [m['panoId'] for m in data['monasteries']]
-            print(f"DEBUG: Available pano_ids: {available_pano_ids}")
-            from django.http import Http404
-            raise Http404(f"Monastery not found. Available IDs: {available_pano_ids}")
-
-        print(f"DEBUG: Found monastery: {monastery['name']}")
-
-        context = {
-            'monastery': monastery,
-            'page_title': f'{monastery["name"]} - Virtual Tour',
-            'page_description': monastery['description'],
-        }
-
-        return render(request, 'tours/monastery_detail.html', context)
-
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
-        print(f"DEBUG: Exception occurred: {e}")
-        from django.http import Http404
-        raise Http404(f"Monastery data not available: {e}")
+    return render(request, 'tours/monastery_detail.html', context)